@@ -1,80 +1,315 @@
 from __future__ import annotations
-from fastapi import FastAPI
-from fastapi.responses import JSONResponse
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import Response
 import sqlite3
-from typing import Dict, Any
+from typing import Callable, Dict, Any, List, Optional, Sequence, Tuple
+from urllib.parse import urlencode
 
 from db import (
+    JOB_FIELDS,
     init_db,
-    get_conn,
-    get_active_jobs_ordered,
+    pool_stats,
+    get_active_jobs_page,
+    search_jobs,
+    get_data_version,
     get_jobs_count,
-    get_active_jobs_by_country,
     get_jobs_count_by_country,
+    get_job_stats,
+    get_jobs_near,
 )
+from utils.gazetteer import geocode
 
-app = FastAPI(title="Jobs API", version="1.0.0")
-
-
-def row_to_dict(row: sqlite3.Row) -> Dict[str, Any]:
-    return {
-        "url": row["url"],
-        "title": row["title"],
-        "company": row["company"],
-        "description": row["description"],
-        "city": row["city"],
-        "state": row["state"],
-        "country": row["country"],
-        "salary": row["salary"],
-        "category": row["category"],
-        "priority": row["priority"],
-        "active": row["active"],
-        "source": row["source"],
-        "created_at": row["created_at"],
-        "updated_at": row["updated_at"],
-    }
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # schema criado/migrado uma vez no startup, fora do caminho das requisições
+    init_db()
+    yield
+
+
+app = FastAPI(title="Jobs API", version="1.0.0", lifespan=lifespan)
+
+MAX_PAGE_LIMIT = 500
+# /jobs com filtro e sem ?limit= pagina com este tamanho (sem filtro, sem limit = tudo)
+DEFAULT_FILTERED_LIMIT = 100
+MAX_SEARCH_LIMIT = 100
+MAX_NEAR_RADIUS_KM = 500
+
+# Cache de respostas: os dados só mudam quando main.py / main_canada.py rodam
+# (eles sobem a data_version no banco). A versão é relida no máximo a cada
+# CACHE_VERSION_TTL_SEC segundos. Limitado em entradas e em bytes; respostas
+# maiores que CACHE_MAX_ENTRY_BYTES são servidas sem entrar no cache.
+CACHE_MAX_ENTRIES = int(os.getenv("JOBBOT_CACHE_MAX_ENTRIES", "256"))
+CACHE_MAX_BYTES = int(os.getenv("JOBBOT_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+CACHE_MAX_ENTRY_BYTES = int(os.getenv("JOBBOT_CACHE_MAX_ENTRY_BYTES", str(8 * 1024 * 1024)))
+CACHE_VERSION_TTL_SEC = float(os.getenv("JOBBOT_CACHE_VERSION_TTL", "2"))
+
+
+class ResponseCache:
+    """Respostas JSON já serializadas (bytes + ETag), por endpoint + query string."""
+
+    def __init__(
+        self,
+        max_entries: int,
+        version_ttl: float,
+        max_bytes: int = CACHE_MAX_BYTES,
+        max_entry_bytes: int = CACHE_MAX_ENTRY_BYTES,
+    ):
+        self.max_entries = max_entries
+        self.version_ttl = version_ttl
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = min(max_entry_bytes, max_bytes)
+        self._entries: "OrderedDict[str, Tuple[bytes, str]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._version: Optional[int] = None
+        self._version_checked = 0.0
+
+    def _current_version(self) -> int:
+        now = time.monotonic()
+        if self._version is None or now - self._version_checked >= self.version_ttl:
+            version = get_data_version()
+            with self._lock:
+                if version != self._version:
+                    self._entries.clear()
+                    self._bytes = 0
+                    self._version = version
+                self._version_checked = now
+        return self._version
+
+    def get(self, key: str, build: Callable[[], Any]) -> Tuple[bytes, str]:
+        version = self._current_version()
+        with self._lock:
+            hit = self._entries.get(key)
+            if hit is not None:
+                self._entries.move_to_end(key)
+                return hit
+
+        body = json.dumps(build(), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        etag = f'"{version}-{hashlib.sha1(body).hexdigest()[:16]}"'
+        if len(body) > self.max_entry_bytes:
+            return body, etag
+        with self._lock:
+            if version == self._version:
+                old = self._entries.pop(key, None)
+                if old is not None:
+                    self._bytes -= len(old[0])
+                self._entries[key] = (body, etag)
+                self._bytes += len(body)
+                while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                    _, (evicted, _) = self._entries.popitem(last=False)
+                    self._bytes -= len(evicted)
+        return body, etag
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self._version = None
+
+
+_cache = ResponseCache(CACHE_MAX_ENTRIES, CACHE_VERSION_TTL_SEC)
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [t.strip() for t in if_none_match.split(",")]
+    return "*" in tags or any(t.removeprefix("W/") == etag for t in tags)
+
+
+def cached_json(request: Request, build: Callable[[], Any]) -> Response:
+    """Serve do cache (ou monta com build()); responde 304 se o If-None-Match bater."""
+    # urlencode escapa os valores: ?city=a%26limit%3D5 não vira a mesma chave que ?city=a&limit=5
+    key = request.url.path + "?" + urlencode(sorted(request.query_params.multi_items()))
+    body, etag = _cache.get(key, build)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def row_to_dict(row: sqlite3.Row, fields: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+    return {k: row[k] for k in (fields or JOB_FIELDS)}
+
+
+def _parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """'title,company,url' -> ['title', 'company', 'url'] (400 se tiver campo desconhecido)."""
+    if not fields:
+        return None
+    names = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in names if f not in JOB_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"campos inválidos: {', '.join(unknown)}")
+    return names or None
+
+
+def _jobs_page(
+    country: Optional[str],
+    limit: Optional[int],
+    cursor: Optional[str],
+    fields: Optional[str],
+    filters: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    cols = _parse_fields(fields)
+    try:
+        rows, next_cursor = get_active_jobs_page(limit=limit, cursor=cursor, country=country, fields=cols, filters=filters)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    items = [row_to_dict(r, cols) for r in rows]
+    return {"count": len(items), "items": items, "next_cursor": next_cursor}
+
+
+@app.get("/health")
+def health():
+    """GET /health -> ok + métricas do pool de conexões (checkouts, espera média/máxima)."""
+    return {"ok": True, "db_pool": pool_stats()}
 
 
 @app.get("/jobs")
-def list_jobs():
+def list_jobs(
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_LIMIT),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    state: Optional[str] = None,
+    city: Optional[str] = None,
+    category: Optional[str] = None,
+    source: Optional[str] = None,
+    company: Optional[str] = None,
+    min_priority: Optional[int] = None,
+    updated_since: Optional[str] = None,
+):
     """
     GET /jobs
-      - Retorna TODAS as vagas ativas (sem paginação),
-        ordenadas por priority DESC, created_at DESC.
+      - Vagas ativas ordenadas por priority DESC, created_at DESC.
+      - ?limit=N pagina o resultado; a próxima página vem com ?cursor=<next_cursor>.
+        Sem limit e sem filtro, retorna TODAS as vagas (compatibilidade).
+      - ?fields=title,company,url devolve só esses campos (ex.: listas sem description).
+      - Filtros (combináveis): state (sigla ou nome), city, category, source, company
+        (igualdade, sem diferenciar maiúsculas), min_priority, updated_since (data ISO).
+        Com filtro, a resposta é sempre paginada (limit padrão DEFAULT_FILTERED_LIMIT).
+        Ex.: /jobs?state=FL&category=housekeeping&limit=50
+      - Resposta com ETag; If-None-Match igual devolve 304.
     """
-    init_db()
-    rows = get_active_jobs_ordered()
-    items = [row_to_dict(r) for r in rows]
-    return JSONResponse({"count": len(items), "items": items})
+    filters = {
+        "state": state, "city": city, "category": category, "source": source, "company": company,
+        "min_priority": min_priority, "updated_since": updated_since,
+    }
+    if limit is None and any(v is not None for v in filters.values()):
+        limit = DEFAULT_FILTERED_LIMIT
+    return cached_json(request, lambda: _jobs_page(None, limit, cursor, fields, filters))
+
+
+@app.get("/jobs/search")
+def search(
+    request: Request,
+    q: str = Query(..., min_length=1),
+    limit: int = Query(20, ge=1, le=MAX_SEARCH_LIMIT),
+    country: Optional[str] = None,
+    fields: Optional[str] = None,
+):
+    """
+    GET /jobs/search?q=housekeeper orlando
+      - Busca full-text em title, company, description e city (vagas ativas).
+      - Ranking: relevância (bm25) combinada com priority.
+      - Aceita country (ex.: CA) e fields como /jobs.
+    """
+    def build() -> Dict[str, Any]:
+        cols = _parse_fields(fields)
+        try:
+            rows = search_jobs(q, limit=limit, country=country, fields=cols)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except sqlite3.OperationalError as e:
+            raise HTTPException(status_code=503, detail=f"busca indisponível: {e}")
+        items = [row_to_dict(r, cols) for r in rows]
+        return {"count": len(items), "items": items}
+
+    return cached_json(request, build)
+
+
+@app.get("/jobs/near")
+def near(
+    request: Request,
+    lat: Optional[float] = Query(None, ge=-90, le=90),
+    lon: Optional[float] = Query(None, ge=-180, le=180),
+    city: Optional[str] = None,
+    state: Optional[str] = None,
+    country: Optional[str] = None,
+    radius_km: float = Query(50, gt=0, le=MAX_NEAR_RADIUS_KM),
+    limit: int = Query(50, ge=1, le=MAX_PAGE_LIMIT),
+    fields: Optional[str] = None,
+):
+    """
+    GET /jobs/near?lat=28.54&lon=-81.38&radius_km=80
+      - Vagas ativas a até radius_km do ponto, da mais próxima para a mais distante
+        (empate: priority); cada item traz distance_km.
+      - Em vez de lat/lon: ?city=Orlando&state=FL (EUA/Canadá, gazetteer offline).
+      - Só entram vagas cuja cidade foi encontrada no gazetteer.
+      - Aceita fields como /jobs.
+    """
+    if lat is None or lon is None:
+        if not city:
+            raise HTTPException(status_code=400, detail="informe lat e lon, ou city")
+        coords = geocode(city, state or "", country or "")
+        if coords is None:
+            raise HTTPException(status_code=404, detail=f"cidade não encontrada: {city}")
+        lat, lon = coords
+
+    def build() -> Dict[str, Any]:
+        cols = _parse_fields(fields)
+        try:
+            items = get_jobs_near(lat, lon, radius_km=radius_km, limit=limit, fields=cols)
+        except sqlite3.OperationalError as e:
+            raise HTTPException(status_code=503, detail=f"busca por raio indisponível: {e}")
+        return {"count": len(items), "center": {"lat": lat, "lon": lon}, "items": items}
+
+    return cached_json(request, build)
 
 
 @app.get("/jobs/count")
-def jobs_count():
+def jobs_count(request: Request):
     """GET /jobs/count -> {"count": <vagas_ativas>}"""
-    init_db()
-    with get_conn() as conn:
-        total = get_jobs_count(conn, only_active=True)
-    return {"count": total}
+    return cached_json(request, lambda: {"count": get_jobs_count(only_active=True)})
+
+
+@app.get("/jobs/stats")
+def jobs_stats(request: Request, country: Optional[str] = None):
+    """
+    GET /jobs/stats -> contagens das vagas ativas por country, state, category e source
+      {"total": n, "country": {"US": n, ...}, "state": {...}, "category": {...}, "source": {...}}
+      - ?country=CA restringe ao país.
+      - Lido da tabela de resumo job_stats (atualizada no fim de cada pipeline).
+    """
+    return cached_json(request, lambda: get_job_stats(country))
 
 
 @app.get("/jobs/canada")
-def list_jobs_canada():
+def list_jobs_canada(
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_LIMIT),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+):
     """
     GET /jobs/canada
-      - Retorna TODAS as vagas ativas com country = 'CA',
-        ordenadas por priority DESC, created_at DESC.
+      - Vagas ativas com country = 'CA', ordenadas por priority DESC, created_at DESC.
+      - Aceita limit, cursor e fields como /jobs.
     """
-    init_db()
-    rows = get_active_jobs_by_country("CA")
-    items = [row_to_dict(r) for r in rows]
-    return JSONResponse({"count": len(items), "items": items})
+    return cached_json(request, lambda: _jobs_page("CA", limit, cursor, fields))
 
 
 @app.get("/jobs/canada/count")
-def jobs_count_canada():
+def jobs_count_canada(request: Request):
     """
     GET /jobs/canada/count -> {"count": <vagas_ativas_no_Canada>}
     """
-    init_db()
-    total = get_jobs_count_by_country("CA", only_active=True)
-    return {"count": total}
+    return cached_json(request, lambda: {"count": get_jobs_count_by_country("CA", only_active=True)})
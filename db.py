@@ -1,10 +1,27 @@
 from __future__ import annotations
+import base64
+import json
+import math
+import os
+import queue
+import re
 import sqlite3
-from typing import Iterable, Dict, Any, List, Optional
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Iterable, Iterator, Dict, Any, List, Optional, Sequence, Tuple
 from pathlib import Path
 
+from utils.gazetteer import geocode, haversine_km
+from utils.geo import STATE_NAME_TO_ABBR, state_name_to_abbr
+
 DB_PATH = Path("jobs.db")
 
+# Versão do schema gravada em PRAGMA user_version.
+# Aumente sempre que mudar DDL_TARGET, colunas ou CREATE_INDEXES.
+SCHEMA_VERSION = 11
+
 DDL_TARGET = """
 CREATE TABLE IF NOT EXISTS jobs (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -21,33 +38,344 @@ CREATE TABLE IF NOT EXISTS jobs (
     active INTEGER DEFAULT 1,
     source TEXT,
     created_at TEXT DEFAULT (datetime('now')),
-    updated_at TEXT DEFAULT (datetime('now'))
+    updated_at TEXT DEFAULT (datetime('now')),
+    content_hash TEXT,               -- hash do conteúdo (normalize.compute_content_hash)
+    last_seen_at TEXT,               -- última vez que a vaga foi coletada
+    last_seen_run INTEGER,           -- runs.id da última execução que coletou a vaga
+    canonical_id INTEGER,            -- vaga canônica quando esta é duplicata de outra fonte (dedup.py)
+    lat REAL,                        -- coordenadas da cidade (utils.gazetteer), NULL se desconhecida
+    lon REAL
 );
 """
 
+# colunas adicionadas depois do schema original (ALTER TABLE em bancos antigos)
+EXTRA_COLUMNS = [
+    ("content_hash", "TEXT"),
+    ("last_seen_at", "TEXT"),
+    ("last_seen_run", "INTEGER"),
+    ("canonical_id", "INTEGER"),
+    ("lat", "REAL"),
+    ("lon", "REAL"),
+]
+
+# tabelas auxiliares (além de jobs)
+CREATE_TABLES = [
+    # contadores globais; data_version sobe a cada execução dos pipelines (invalida o cache da API)
+    "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL DEFAULT 0);",
+    # uma linha por execução de pipeline; o id carimba jobs.last_seen_run
+    """
+    CREATE TABLE IF NOT EXISTS runs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        pipeline TEXT,
+        started_at TEXT DEFAULT (datetime('now')),
+        finished_at TEXT
+    );
+    """,
+    # contagens por faceta das vagas não duplicadas (refresh_job_stats, no fim de cada pipeline)
+    """
+    CREATE TABLE IF NOT EXISTS job_stats (
+        country TEXT NOT NULL,
+        state TEXT NOT NULL,
+        category TEXT NOT NULL,
+        source TEXT NOT NULL,
+        active INTEGER NOT NULL,
+        n INTEGER NOT NULL,
+        PRIMARY KEY (country, state, category, source, active)
+    ) WITHOUT ROWID;
+    """,
+    # dedup.py: assinatura MinHash de cada vaga ativa (recalculada quando content_hash muda)
+    """
+    CREATE TABLE IF NOT EXISTS job_minhash (
+        job_id INTEGER PRIMARY KEY,
+        content_hash TEXT,
+        signature BLOB
+    );
+    """,
+    # dedup.py: bandas LSH; todas as vagas de cada (banda, bucket), para uma vaga
+    # desativada não levar junto as candidatas da mesma fonte
+    """
+    CREATE TABLE IF NOT EXISTS job_lsh (
+        band INTEGER NOT NULL,
+        bucket INTEGER NOT NULL,
+        job_id INTEGER NOT NULL,
+        source TEXT NOT NULL,
+        PRIMARY KEY (band, bucket, job_id)
+    ) WITHOUT ROWID;
+    """,
+]
+
 CREATE_INDEXES = [
     "CREATE INDEX IF NOT EXISTS idx_jobs_active_priority ON jobs(active, priority DESC);",
+    # paginação keyset: cada página é um range scan na ordem de listagem; canonical_id e
+    # updated_at no fim deixam filtrar duplicatas e ?updated_since= só pelo índice
+    "CREATE INDEX IF NOT EXISTS idx_jobs_active_listing ON jobs(active, priority DESC, created_at DESC, id DESC, canonical_id, updated_at);",
+    "CREATE INDEX IF NOT EXISTS idx_jobs_country_active_listing ON jobs(country, active, priority DESC, created_at DESC, id DESC, canonical_id, updated_at);",
+    # varredura de vagas que sumiram (deactivate_unseen)
+    "CREATE INDEX IF NOT EXISTS idx_jobs_source_active_run ON jobs(source, active, last_seen_run);",
+    "CREATE INDEX IF NOT EXISTS idx_jobs_country_active_run ON jobs(country, active, last_seen_run);",
+    # contagens só de vagas canônicas (cobre active = 1 AND canonical_id IS NULL)
+    "CREATE INDEX IF NOT EXISTS idx_jobs_active_canonical ON jobs(active, canonical_id);",
+    "CREATE INDEX IF NOT EXISTS idx_job_lsh_job ON job_lsh(job_id);",
+    # filtros de /jobs (state, city, ...): parciais sobre as vagas listáveis, já na ordem
+    # da listagem, então filtro + ORDER BY + cursor viram um range scan sem sort
+    *(
+        f"CREATE INDEX IF NOT EXISTS idx_jobs_list_{col} ON jobs({col} COLLATE NOCASE, priority DESC, created_at DESC, id DESC, updated_at)"
+        " WHERE active = 1 AND canonical_id IS NULL;"
+        for col in ("state", "city", "category", "source", "company")
+    ),
+    # /jobs/near: vagas listáveis de um ponto (lat, lon), na ordem da listagem
+    "CREATE INDEX IF NOT EXISTS idx_jobs_geo_point ON jobs(lat, lon, priority DESC, created_at DESC, id DESC)"
+    " WHERE active = 1 AND canonical_id IS NULL;",
+    # membros de um grupo de duplicatas (religação no dedup)
+    "CREATE INDEX IF NOT EXISTS idx_jobs_canonical ON jobs(canonical_id) WHERE canonical_id IS NOT NULL;",
+]
+
+# índices substituídos por outros de CREATE_INDEXES (removidos na migração)
+DROP_INDEXES = ["idx_jobs_active_order", "idx_jobs_country_active_order"]
+
+# Busca full-text (FTS5, external content) sobre jobs, sincronizada por triggers.
+FTS_COLUMNS = ("title", "company", "description", "city")
+
+FTS_DDL = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS jobs_fts USING fts5(
+        {", ".join(FTS_COLUMNS)},
+        content='jobs', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    );
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS jobs_fts_ai AFTER INSERT ON jobs BEGIN
+        INSERT INTO jobs_fts (rowid, title, company, description, city)
+        VALUES (new.id, new.title, new.company, new.description, new.city);
+    END;
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS jobs_fts_ad AFTER DELETE ON jobs BEGIN
+        INSERT INTO jobs_fts (jobs_fts, rowid, title, company, description, city)
+        VALUES ('delete', old.id, old.title, old.company, old.description, old.city);
+    END;
+    """,
+    # só dispara quando uma coluna indexada muda (o "touch" de last_seen_* não reindexa)
+    """
+    CREATE TRIGGER IF NOT EXISTS jobs_fts_au AFTER UPDATE OF title, company, description, city ON jobs BEGIN
+        INSERT INTO jobs_fts (jobs_fts, rowid, title, company, description, city)
+        VALUES ('delete', old.id, old.title, old.company, old.description, old.city);
+        INSERT INTO jobs_fts (rowid, title, company, description, city)
+        VALUES (new.id, new.title, new.company, new.description, new.city);
+    END;
+    """,
 ]
 
+# Busca por raio (/jobs/near). As coordenadas vêm do gazetteer, então muitas vagas
+# caem no mesmo ponto (a cidade): o R*Tree indexa os pontos distintos (geo_points),
+# e as vagas de cada ponto saem em ordem de priority por idx_jobs_geo_point.
+# Pontos sem vagas listáveis ficam no índice (são poucos e só custam uma busca vazia).
+GEO_LISTED = "new.lat IS NOT NULL AND new.lon IS NOT NULL AND new.active = 1 AND new.canonical_id IS NULL"
+# NOT EXISTS em vez de INSERT OR IGNORE: dentro de um trigger disparado pelo UPSERT
+# (INSERT ... ON CONFLICT DO UPDATE) o OR IGNORE é ignorado e o ponto repetido aborta
+GEO_ADD_POINT = """
+    INSERT INTO geo_points (lat, lon) SELECT new.lat, new.lon
+    WHERE NOT EXISTS (SELECT 1 FROM geo_points WHERE lat = new.lat AND lon = new.lon);
+"""
+# triggers recriados na migração (a definição mudou)
+GEO_TRIGGERS = ("jobs_geo_ai", "jobs_geo_au")
+
+GEO_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS jobs_geo USING rtree(id, min_lat, max_lat, min_lon, max_lon);",
+    """
+    CREATE TABLE IF NOT EXISTS geo_points (
+        id INTEGER PRIMARY KEY,
+        lat REAL NOT NULL,
+        lon REAL NOT NULL,
+        UNIQUE (lat, lon)
+    );
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS geo_points_ai AFTER INSERT ON geo_points BEGIN
+        INSERT INTO jobs_geo VALUES (new.id, new.lat, new.lat, new.lon, new.lon);
+    END;
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS jobs_geo_ai AFTER INSERT ON jobs WHEN {GEO_LISTED} BEGIN
+        {GEO_ADD_POINT}
+    END;
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS jobs_geo_au AFTER UPDATE OF lat, lon, active, canonical_id ON jobs WHEN {GEO_LISTED} BEGIN
+        {GEO_ADD_POINT}
+    END;
+    """,
+]
+
+# Ranking da busca: bm25 (menor = melhor) com pesos por coluna, menos um bônus por priority.
+SEARCH_BM25_WEIGHTS = (10.0, 5.0, 1.0, 2.0)  # title, company, description, city
+SEARCH_PRIORITY_WEIGHT = float(os.getenv("JOBBOT_SEARCH_PRIORITY_WEIGHT", "0.0005"))
+
+# campos públicos de uma vaga (ordem da resposta da API)
+JOB_FIELDS = (
+    "url", "title", "company", "description", "city", "state", "country", "salary",
+    "category", "priority", "active", "source", "created_at", "updated_at",
+)
+
+# Tamanho do pool de leitura e espera máxima no checkout (ver read_conn()/write_conn())
+POOL_SIZE = int(os.getenv("JOBBOT_DB_POOL_SIZE", "4"))
+POOL_TIMEOUT_SEC = float(os.getenv("JOBBOT_DB_POOL_TIMEOUT", "10"))
+
+
 def get_conn() -> sqlite3.Connection:
+    """Conexão nova e exclusiva do chamador (init_db, scripts). Prefira read_conn()/write_conn()."""
     conn = sqlite3.connect(str(DB_PATH))
     conn.row_factory = sqlite3.Row
     conn.execute("PRAGMA journal_mode=WAL;")
     conn.execute("PRAGMA synchronous=NORMAL;")
     return conn
 
+
+def _connect(path: Path, readonly: bool) -> sqlite3.Connection:
+    if readonly:
+        conn = sqlite3.connect(f"{path.resolve().as_uri()}?mode=ro", uri=True, check_same_thread=False)
+    else:
+        conn = sqlite3.connect(str(path), check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL;")
+        conn.execute("PRAGMA synchronous=NORMAL;")
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+class ConnectionPool:
+    """
+    Pool limitado de conexões SQLite reaproveitadas entre threads.
+
+    As conexões são abertas sob demanda até `size`; acima disso o checkout
+    espera uma conexão voltar (até POOL_TIMEOUT_SEC). stats() expõe o tempo
+    de espera no checkout.
+    """
+
+    def __init__(self, path: Path, size: int, readonly: bool):
+        self.path = path
+        self.size = max(1, size)
+        self.readonly = readonly
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._opened = 0
+        self._checkouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def _acquire(self) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            can_open = self._opened < self.size
+            if can_open:
+                self._opened += 1
+        if can_open:
+            try:
+                return _connect(self.path, self.readonly)
+            except Exception:
+                with self._lock:
+                    self._opened -= 1
+                raise
+        try:
+            return self._idle.get(timeout=POOL_TIMEOUT_SEC)
+        except queue.Empty:
+            raise TimeoutError(f"pool {self.path} sem conexão livre após {POOL_TIMEOUT_SEC}s")
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        start = time.perf_counter()
+        conn = self._acquire()
+        waited = time.perf_counter() - start
+        with self._lock:
+            self._checkouts += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self._idle.put(conn)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "size": self.size,
+                "open": self._opened,
+                "idle": self._idle.qsize(),
+                "checkouts": self._checkouts,
+                "wait_total_ms": round(self._wait_total * 1000, 3),
+                "wait_avg_ms": round(self._wait_total * 1000 / self._checkouts, 3) if self._checkouts else 0.0,
+                "wait_max_ms": round(self._wait_max * 1000, 3),
+            }
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+        with self._lock:
+            self._opened = 0
+
+
+_pools: Dict[Tuple[str, bool], ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def _pool(readonly: bool) -> ConnectionPool:
+    key = (str(DB_PATH), readonly)
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                # leitura: várias conexões mode=ro; escrita: uma única conexão (SQLite tem um writer)
+                pool = ConnectionPool(DB_PATH, POOL_SIZE if readonly else 1, readonly)
+                _pools[key] = pool
+    return pool
+
+
+def read_conn():
+    """Conexão read-only (mode=ro) emprestada do pool: `with read_conn() as conn: ...`."""
+    return _pool(readonly=True).connection()
+
+
+def write_conn():
+    """A conexão de escrita compartilhada (uma por banco), serializada entre threads."""
+    return _pool(readonly=False).connection()
+
+
+def pool_stats() -> Dict[str, Dict[str, Any]]:
+    return {
+        ("read" if readonly else "write"): pool.stats()
+        for (path, readonly), pool in list(_pools.items())
+        if path == str(DB_PATH)
+    }
+
+
+def close_pools() -> None:
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
+
 def _table_columns(conn: sqlite3.Connection, table: str) -> List[str]:
     cur = conn.execute(f"PRAGMA table_info({table});")
     return [row["name"] for row in cur.fetchall()]
 
-def _migrate_to_target_schema(conn: sqlite3.Connection) -> None:
+def _migrate_to_target_schema(conn: sqlite3.Connection) -> bool:
+    """Recria a tabela jobs se faltar coluna do schema base. Retorna True se recriou."""
     cols = set(_table_columns(conn, "jobs"))
     needed = {
         "id","url","title","company","description","city","state","country","salary",
         "category","priority","active","source","created_at","updated_at"
     }
     if cols >= needed:
-        return
+        return False
 
     conn.execute("""
         CREATE TABLE jobs_new (
@@ -105,60 +433,358 @@ def _migrate_to_target_schema(conn: sqlite3.Connection) -> None:
 
     conn.execute("DROP TABLE jobs;")
     conn.execute("ALTER TABLE jobs_new RENAME TO jobs;")
+    return True
+
+def _ensure_columns(conn: sqlite3.Connection) -> None:
+    cols = set(_table_columns(conn, "jobs"))
+    for name, ddl in EXTRA_COLUMNS:
+        if name not in cols:
+            conn.execute(f"ALTER TABLE jobs ADD COLUMN {name} {ddl};")
+
+def _table_exists(conn: sqlite3.Connection, name: str) -> bool:
+    row = conn.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (name,)).fetchone()
+    return row is not None
+
+def _ensure_fts(conn: sqlite3.Connection, rebuild: bool = False) -> None:
+    """Cria jobs_fts + triggers; reindexa se o índice for novo ou a tabela jobs foi recriada."""
+    try:
+        created = not _table_exists(conn, "jobs_fts")
+        for ddl in FTS_DDL:
+            conn.execute(ddl)
+        if created or rebuild:
+            conn.execute("INSERT INTO jobs_fts (jobs_fts) VALUES ('rebuild');")
+    except sqlite3.OperationalError as e:
+        # SQLite sem FTS5: o resto funciona, só /jobs/search fica indisponível
+        print(f"[db] FTS5 indisponível, busca desativada: {e}")
 
-def init_db() -> None:
-    with get_conn() as conn:
+def _ensure_geo(conn: sqlite3.Connection, rebuild: bool = False) -> None:
+    """Cria jobs_geo/geo_points + triggers; repopula se o índice for novo ou a tabela jobs foi recriada."""
+    try:
+        created = not _table_exists(conn, "jobs_geo")
+        for name in GEO_TRIGGERS:
+            conn.execute(f"DROP TRIGGER IF EXISTS {name};")
+        for ddl in GEO_DDL:
+            conn.execute(ddl)
+        if created or rebuild:
+            conn.execute(f"""
+                INSERT OR IGNORE INTO geo_points (lat, lon)
+                SELECT DISTINCT lat, lon FROM jobs AS new WHERE {GEO_LISTED}
+            """)
+    except sqlite3.OperationalError as e:
+        # SQLite sem R*Tree: o resto funciona, só /jobs/near fica indisponível
+        print(f"[db] R*Tree indisponível, busca por raio desativada: {e}")
+
+
+def _backfill_coordinates(conn: sqlite3.Connection) -> int:
+    """Preenche lat/lon das vagas antigas (uma consulta ao gazetteer por cidade distinta)."""
+    places = conn.execute("""
+        SELECT DISTINCT city, state, country FROM jobs WHERE lat IS NULL AND city IS NOT NULL
+    """).fetchall()
+    updates = []
+    for city, state, country in places:
+        coords = geocode(city, state, country)
+        if coords:
+            updates.append((coords[0], coords[1], city, state, country))
+    conn.executemany("""
+        UPDATE jobs SET lat = ?, lon = ?
+        WHERE lat IS NULL AND city = ? AND state IS ? AND country IS ?
+    """, updates)
+    return len(updates)
+
+
+def schema_version(conn: sqlite3.Connection) -> int:
+    return int(conn.execute("PRAGMA user_version;").fetchone()[0])
+
+
+def init_db(force: bool = False) -> None:
+    """
+    Cria/migra o schema. A versão aplicada fica em PRAGMA user_version, então
+    com o banco já em SCHEMA_VERSION isto custa um único PRAGMA.
+    force=True refaz todos os passos (idempotentes) mesmo assim.
+    """
+    conn = get_conn()
+    try:
+        if not force and schema_version(conn) >= SCHEMA_VERSION:
+            return
         conn.execute(DDL_TARGET)
-        for ddl in CREATE_INDEXES:
+        # job_lsh antigo guardava só uma vaga por (banda, bucket, source): recria
+        # (dedup.py refaz o índice inteiro pela DEDUP_VERSION)
+        if _table_exists(conn, "job_lsh"):
+            lsh_pk = [r["name"] for r in conn.execute("PRAGMA table_info(job_lsh);") if r["pk"]]
+            if "source" in lsh_pk:
+                conn.execute("DROP TABLE job_lsh;")
+        for ddl in CREATE_TABLES:
             conn.execute(ddl)
         try:
-            _migrate_to_target_schema(conn)
+            rebuilt = _migrate_to_target_schema(conn)
+            _ensure_columns(conn)
+            # country passou a ser gravado em maiúsculas (filtros usam country = ?, indexado)
+            conn.execute("""
+                UPDATE jobs SET country = UPPER(TRIM(country))
+                WHERE country IS NOT UPPER(TRIM(country))
+            """)
+            # estados dos EUA gravados como sigla ("Florida" -> "FL"), ver normalize._fill_defaults
+            conn.executemany(
+                "UPDATE jobs SET state = ? WHERE state = ? COLLATE NOCASE AND country IN ('US', 'USA', 'UNITED STATES')",
+                [(abbr, name) for name, abbr in STATE_NAME_TO_ABBR.items()],
+            )
+            for name in DROP_INDEXES:
+                conn.execute(f"DROP INDEX IF EXISTS {name};")
             for ddl in CREATE_INDEXES:
                 conn.execute(ddl)
-            conn.commit()
-        except sqlite3.OperationalError:
-            pass
+            _ensure_fts(conn, rebuild=rebuilt)
+            _ensure_geo(conn, rebuild=rebuilt)
+            _backfill_coordinates(conn)
+            refresh_job_stats(conn)
+        except sqlite3.OperationalError as e:
+            print(f"[db] falha ao migrar schema: {e}")
+            conn.rollback()
+            return
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION};")
+        conn.commit()
+    finally:
+        conn.close()
+
+
+JOB_COLUMNS = (
+    "url", "title", "company", "description", "city", "state", "country", "salary",
+    "category", "priority", "active", "source", "content_hash", "lat", "lon",
+)
+
+UPSERT_SQL = """
+    INSERT INTO jobs (url, title, company, description, city, state, country, salary,
+                      category, priority, active, source, content_hash, lat, lon, last_seen_at, last_seen_run)
+    VALUES (:url, :title, :company, :description, :city, :state, :country, :salary,
+            :category, :priority, :active, :source, :content_hash, :lat, :lon, datetime('now'), :run_id)
+    ON CONFLICT(url) DO UPDATE SET
+        title=excluded.title,
+        company=excluded.company,
+        description=excluded.description,
+        city=excluded.city,
+        state=excluded.state,
+        country=excluded.country,
+        salary=excluded.salary,
+        category=excluded.category,
+        priority=excluded.priority,
+        active=excluded.active,
+        source=excluded.source,
+        content_hash=excluded.content_hash,
+        lat=excluded.lat,
+        lon=excluded.lon,
+        last_seen_at=excluded.last_seen_at,
+        last_seen_run=COALESCE(excluded.last_seen_run, jobs.last_seen_run),
+        updated_at=datetime('now');
+"""
+
+# vaga coletada de novo sem mudança: só marca que foi vista (updated_at fica intacto)
+TOUCH_SQL = """
+    UPDATE jobs
+    SET last_seen_at = datetime('now'),
+        last_seen_run = COALESCE(:run_id, last_seen_run)
+    WHERE url = :url;
+"""
+
+# sem mudança de conteúdo, mas com coordenadas novas (lat/lon ficam fora do content_hash:
+# mudam quando o gazetteer é regerado)
+TOUCH_RELOCATE_SQL = """
+    UPDATE jobs
+    SET last_seen_at = datetime('now'),
+        last_seen_run = COALESCE(:run_id, last_seen_run),
+        lat = :lat,
+        lon = :lon
+    WHERE url = :url;
+"""
+
+# máximo de parâmetros por SELECT ... IN (...) (o limite antigo do SQLite é 999)
+_MAX_VARS = 500
+
+
+def _job_params(job: Dict[str, Any], run_id: Optional[int] = None) -> Dict[str, Any]:
+    params = {k: job.get(k) for k in JOB_COLUMNS}
+    if params["country"]:
+        params["country"] = params["country"].strip().upper()
+    params["run_id"] = run_id
+    return params
+
 
 def upsert_job(job: Dict[str, Any]) -> None:
     if not job or not job.get("url"):
         return
-    with get_conn() as conn:
+    with write_conn() as conn, conn:
+        conn.execute(UPSERT_SQL, _job_params(job))
+
+
+def _existing_rows(conn: sqlite3.Connection, urls: List[str]) -> Dict[str, sqlite3.Row]:
+    found: Dict[str, sqlite3.Row] = {}
+    for i in range(0, len(urls), _MAX_VARS):
+        chunk = urls[i:i + _MAX_VARS]
+        placeholders = ",".join("?" for _ in chunk)
+        cur = conn.execute(
+            f"SELECT url, content_hash, active, lat, lon FROM jobs WHERE url IN ({placeholders})", chunk
+        )
+        for row in cur.fetchall():
+            found[row["url"]] = row
+    return found
+
+
+def _upsert_batch(conn: sqlite3.Connection, batch: Dict[str, Dict[str, Any]], counts: Dict[str, int]) -> None:
+    existing = _existing_rows(conn, list(batch))
+    to_write: List[Dict[str, Any]] = []
+    to_touch: List[Dict[str, Any]] = []
+    to_relocate: List[Dict[str, Any]] = []
+    for url, params in batch.items():
+        old = existing.get(url)
+        if old is None:
+            counts["inserted"] += 1
+            to_write.append(params)
+        elif (
+            params["content_hash"]
+            and old["content_hash"] == params["content_hash"]
+            and bool(old["active"]) == bool(params["active"])
+        ):
+            counts["unchanged"] += 1
+            if (old["lat"], old["lon"]) == (params["lat"], params["lon"]):
+                to_touch.append(params)
+            else:
+                to_relocate.append(params)
+        else:
+            counts["updated"] += 1
+            to_write.append(params)
+    with conn:
+        if to_write:
+            conn.executemany(UPSERT_SQL, to_write)
+        if to_touch:
+            conn.executemany(TOUCH_SQL, to_touch)
+        if to_relocate:
+            conn.executemany(TOUCH_RELOCATE_SQL, to_relocate)
+
+
+def upsert_jobs(
+    jobs: Iterable[Dict[str, Any]],
+    batch_size: int = 500,
+    *,
+    run_id: Optional[int] = None,
+) -> Dict[str, int]:
+    """
+    Upsert em lote: uma única conexão, uma transação (executemany) por lote.
+    Vagas com o mesmo content_hash não são reescritas: só last_seen_at é atualizado
+    (e lat/lon, se o gazetteer deu coordenadas diferentes).
+    Com run_id, toda vaga tocada recebe last_seen_run = run_id (ver deactivate_unseen).
+    Retorna {"inserted": n, "updated": n, "unchanged": n}.
+    """
+    counts = {"inserted": 0, "updated": 0, "unchanged": 0}
+    with write_conn() as conn:
+        batch: Dict[str, Dict[str, Any]] = {}
+        for job in jobs:
+            if not job or not job.get("url"):
+                continue
+            batch[job["url"]] = _job_params(job, run_id)  # url repetida no lote: vale a última
+            if len(batch) >= batch_size:
+                _upsert_batch(conn, batch, counts)
+                batch = {}
+        if batch:
+            _upsert_batch(conn, batch, counts)
+    return counts
+
+
+def start_run(pipeline: str) -> int:
+    """Registra uma execução de pipeline e devolve o run_id."""
+    with write_conn() as conn, conn:
+        cur = conn.execute("INSERT INTO runs (pipeline) VALUES (?)", (pipeline,))
+        return int(cur.lastrowid)
+
+
+def finish_run(run_id: int) -> None:
+    with write_conn() as conn, conn:
+        conn.execute("UPDATE runs SET finished_at = datetime('now') WHERE id = ?", (run_id,))
+
+
+def deactivate_unseen(run_id: int, *, source: Optional[str] = None, country: Optional[str] = None) -> int:
+    """
+    Desativa as vagas ativas (de um source e/ou country) que a execução run_id
+    não coletou. Um único UPDATE indexado; retorna quantas vagas sumiram.
+    """
+    if not source and not country:
+        raise ValueError("deactivate_unseen precisa de source ou country")
+    where = ["active = 1", "(last_seen_run IS NULL OR last_seen_run <> ?)"]
+    params: List[Any] = [run_id]
+    if source:
+        where.append("source = ?")
+        params.append(source)
+    if country:
+        where.append("country = ?")
+        params.append(country.upper())
+    with write_conn() as conn, conn:
+        cur = conn.execute(f"""
+            UPDATE jobs SET active = 0, updated_at = datetime('now')
+            WHERE {" AND ".join(where)}
+        """, params)
+        return cur.rowcount
+
+
+def count_unseen(run_id: int) -> Dict[str, int]:
+    """source -> vagas ativas que a execução run_id não coletou (relatório; não desativa nada)."""
+    with read_conn() as conn:
+        rows = conn.execute("""
+            SELECT source, COUNT(*) AS n FROM jobs
+            WHERE active = 1 AND (last_seen_run IS NULL OR last_seen_run <> ?)
+            GROUP BY source
+        """, (run_id,)).fetchall()
+    return {(row["source"] or "unknown"): row["n"] for row in rows}
+
+
+def deactivate_stale(source: str, *, days: int) -> int:
+    """
+    Desativa as vagas ativas de um source que nenhuma execução coletou nos
+    últimos `days` dias (fontes que são janela de busca, como o Adzuna, onde
+    "não veio agora" não quer dizer "sumiu"). Retorna quantas foram desativadas.
+    """
+    with write_conn() as conn, conn:
+        cur = conn.execute("""
+            UPDATE jobs SET active = 0, updated_at = datetime('now')
+            WHERE source = ? AND active = 1
+              AND (last_seen_at IS NULL OR last_seen_at < datetime('now', ?))
+        """, (source, f"-{int(days)} days"))
+        return cur.rowcount
+
+
+def get_data_version() -> int:
+    """Versão dos dados (muda quando um pipeline termina de gravar)."""
+    with read_conn() as conn:
+        row = conn.execute("SELECT value FROM meta WHERE key = 'data_version'").fetchone()
+    return int(row["value"]) if row else 0
+
+
+def bump_data_version() -> int:
+    """Chamado pelos pipelines depois de gravar; retorna a nova versão."""
+    with write_conn() as conn, conn:
         conn.execute("""
-            INSERT INTO jobs (url, title, company, description, city, state, country, salary,
-                              category, priority, active, source)
-            VALUES (:url, :title, :company, :description, :city, :state, :country, :salary,
-                    :category, :priority, :active, :source)
-            ON CONFLICT(url) DO UPDATE SET
-                title=excluded.title,
-                company=excluded.company,
-                description=excluded.description,
-                city=excluded.city,
-                state=excluded.state,
-                country=excluded.country,
-                salary=excluded.salary,
-                category=excluded.category,
-                priority=excluded.priority,
-                active=excluded.active,
-                source=excluded.source,
-                updated_at=datetime('now');
-        """, job)
-        conn.commit()
+            INSERT INTO meta (key, value) VALUES ('data_version', 1)
+            ON CONFLICT(key) DO UPDATE SET value = value + 1
+        """)
+        row = conn.execute("SELECT value FROM meta WHERE key = 'data_version'").fetchone()
+    return int(row["value"])
+
 
 def bulk_mark_inactive(urls_to_keep: Iterable[str]) -> None:
-    urls = list(urls_to_keep)
-    with get_conn() as conn:
-        if urls:
-            placeholders = ",".join("?" for _ in urls)
-            conn.execute(f"""
-                UPDATE jobs SET active=0, updated_at=datetime('now')
-                WHERE url NOT IN ({placeholders});
-            """, urls)
-        else:
-            conn.execute("UPDATE jobs SET active=0, updated_at=datetime('now');")
-        conn.commit()
+    """
+    Desativa todas as vagas cuja URL não está em urls_to_keep.
+    As URLs vão para uma tabela temporária (sem limite de parâmetros do SQLite);
+    os pipelines usam deactivate_unseen, que dispensa a lista.
+    """
+    with write_conn() as conn, conn:
+        conn.execute("CREATE TEMP TABLE IF NOT EXISTS keep_urls (url TEXT PRIMARY KEY);")
+        conn.execute("DELETE FROM keep_urls;")
+        conn.executemany("INSERT OR IGNORE INTO keep_urls (url) VALUES (?);", ((u,) for u in urls_to_keep))
+        conn.execute("""
+            UPDATE jobs SET active=0, updated_at=datetime('now')
+            WHERE active = 1
+              AND url NOT IN (SELECT url FROM keep_urls);
+        """)
+
 
 def get_active_jobs_ordered() -> List[sqlite3.Row]:
-    with get_conn() as conn:
+    with read_conn() as conn:
         cur = conn.execute("""
             SELECT url, title, company, description, city, state, country, salary,
                    category, priority, active, source, created_at, updated_at
@@ -168,93 +794,323 @@ def get_active_jobs_ordered() -> List[sqlite3.Row]:
         """)
         return cur.fetchall()
     
+def encode_cursor(row: sqlite3.Row) -> str:
+    """Cursor opaco com a chave de ordenação (priority, created_at, id) da última linha."""
+    key = [row["_cursor_priority"], row["_cursor_created_at"], row["_cursor_id"]]
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[Any, Any, int]:
+    """Inverso de encode_cursor. Levanta ValueError se o cursor for inválido."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        priority, created_at, job_id = json.loads(raw)
+    except Exception as exc:
+        raise ValueError(f"cursor inválido: {cursor!r}") from exc
+    return priority, created_at, int(job_id)
+
+
+# filtros de igualdade de /jobs (sem diferenciar maiúsculas; cada um tem idx_jobs_list_<col>)
+TEXT_FILTERS = ("state", "city", "category", "source", "company")
+
+
+def _parse_since(value: str) -> str:
+    """Data/hora ISO -> 'YYYY-MM-DD HH:MM:SS' em UTC (formato de updated_at). ValueError se inválida."""
+    try:
+        dt = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    except ValueError as exc:
+        raise ValueError(f"updated_since inválido: {value!r}") from exc
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _active_jobs_page_sql(
+    *,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    country: Optional[str] = None,
+    fields: Optional[Sequence[str]] = None,
+    filters: Optional[Dict[str, Any]] = None,
+) -> Tuple[str, List[Any]]:
+    """SQL + parâmetros de get_active_jobs_page (separado para o EXPLAIN de scripts/bench.py plan)."""
+    cols = list(fields) if fields else list(JOB_FIELDS)
+    unknown = [c for c in cols if c not in JOB_FIELDS]
+    if unknown:
+        raise ValueError(f"campos inválidos: {', '.join(unknown)}")
+    filters = {k: v for k, v in (filters or {}).items() if v is not None and v != ""}
+    unknown = [k for k in filters if k not in TEXT_FILTERS + ("min_priority", "updated_since")]
+    if unknown:
+        raise ValueError(f"filtros inválidos: {', '.join(unknown)}")
+
+    where = ["active = 1", "canonical_id IS NULL"]
+    params: List[Any] = []
+    if country:
+        where.append("country = ?")
+        params.append(country.upper())
+    for col in TEXT_FILTERS:
+        if col not in filters:
+            continue
+        value = filters[col].strip()
+        if col == "state":
+            value = state_name_to_abbr(value) or value  # "florida" -> "FL"
+        where.append(f"{col} = ? COLLATE NOCASE")
+        params.append(value)
+    if "min_priority" in filters:
+        where.append("priority >= ?")
+        params.append(int(filters["min_priority"]))
+    if "updated_since" in filters:
+        where.append("updated_at >= ?")
+        params.append(_parse_since(filters["updated_since"]))
+    if cursor:
+        where.append("(priority, created_at, id) < (?, ?, ?)")
+        params.extend(decode_cursor(cursor))
+
+    sql = f"""
+        SELECT {", ".join(cols)},
+               priority AS _cursor_priority, created_at AS _cursor_created_at, id AS _cursor_id
+        FROM jobs
+        WHERE {" AND ".join(where)}
+        ORDER BY priority DESC, created_at DESC, id DESC
+    """
+    if limit is not None:
+        sql += " LIMIT ?"
+        params.append(limit + 1)  # uma a mais para saber se existe próxima página
+    return sql, params
+
+
+def get_active_jobs_page(
+    *,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    country: Optional[str] = None,
+    fields: Optional[Sequence[str]] = None,
+    filters: Optional[Dict[str, Any]] = None,
+) -> Tuple[List[sqlite3.Row], Optional[str]]:
+    """
+    Página de vagas ativas ordenadas por priority DESC, created_at DESC, id DESC.
+    Duplicatas entre fontes (canonical_id preenchido, ver dedup.py) ficam de fora.
+
+    - limit=None devolve tudo (sem next_cursor).
+    - cursor: valor de next_cursor da página anterior.
+    - fields: subconjunto de JOB_FIELDS a selecionar (None = todos).
+    - filters: state, city, category, source, company (igualdade sem diferenciar
+      maiúsculas; state aceita sigla ou nome do estado), min_priority,
+      updated_since (data/hora ISO).
+    Retorna (linhas, next_cursor). Levanta ValueError para campo/filtro inválido.
+    """
+    sql, params = _active_jobs_page_sql(limit=limit, cursor=cursor, country=country, fields=fields, filters=filters)
+    with read_conn() as conn:
+        rows = conn.execute(sql, params).fetchall()
+
+    next_cursor = None
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1])
+    return rows, next_cursor
+
+
+def fts_query(text: str) -> str:
+    """
+    Texto livre -> expressão MATCH segura: cada palavra entre aspas (AND implícito)
+    e a última como prefixo ("house clean" -> '"house" "clean"*').
+    """
+    words = re.findall(r"\w+", text or "", flags=re.UNICODE)
+    if not words:
+        raise ValueError("busca vazia")
+    terms = [f'"{w}"' for w in words]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+def search_jobs(
+    q: str,
+    *,
+    limit: int = 20,
+    country: Optional[str] = None,
+    fields: Optional[Sequence[str]] = None,
+) -> List[sqlite3.Row]:
+    """
+    Busca full-text nas vagas ativas (title, company, description, city),
+    ordenada por bm25 combinado com priority. Levanta ValueError se q for vazio.
+    """
+    cols = list(fields) if fields else list(JOB_FIELDS)
+    unknown = [c for c in cols if c not in JOB_FIELDS]
+    if unknown:
+        raise ValueError(f"campos inválidos: {', '.join(unknown)}")
+
+    bm25 = f"bm25(jobs_fts, {', '.join(str(w) for w in SEARCH_BM25_WEIGHTS)})"
+    where = ["jobs_fts MATCH ?", "j.active = 1", "j.canonical_id IS NULL"]
+    params: List[Any] = [fts_query(q)]
+    if country:
+        where.append("j.country = ?")
+        params.append(country.upper())
+    params.extend([SEARCH_PRIORITY_WEIGHT, limit])
+
+    sql = f"""
+        SELECT {", ".join("j." + c for c in cols)}
+        FROM jobs_fts
+        JOIN jobs j ON j.id = jobs_fts.rowid
+        WHERE {" AND ".join(where)}
+        ORDER BY {bm25} - COALESCE(j.priority, 0) * ?
+        LIMIT ?
+    """
+    with read_conn() as conn:
+        return conn.execute(sql, params).fetchall()
+
+
+KM_PER_DEGREE = 111.32
+
+
+def get_jobs_near(
+    lat: float,
+    lon: float,
+    *,
+    radius_km: float = 50.0,
+    limit: int = 50,
+    fields: Optional[Sequence[str]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Vagas ativas (sem duplicatas) a até radius_km de (lat, lon), da mais próxima
+    para a mais distante (no mesmo ponto: priority DESC, created_at DESC). Cada
+    item traz distance_km.
+
+    1) R*Tree: pontos (cidades) dentro da caixa em volta do círculo; distância
+       exata (haversine) e ordenação em Python, só sobre os pontos.
+    2) Percorre os pontos do mais próximo ao mais distante, lendo as vagas de
+       cada um por idx_jobs_geo_point, até juntar `limit`: o custo depende de
+       quantos pontos há no raio, não de quantas vagas.
+    """
+    cols = list(fields) if fields else list(JOB_FIELDS)
+    unknown = [c for c in cols if c not in JOB_FIELDS]
+    if unknown:
+        raise ValueError(f"campos inválidos: {', '.join(unknown)}")
+
+    dlat = radius_km / KM_PER_DEGREE
+    dlon = dlat / max(math.cos(math.radians(lat)), 0.01)  # graus de longitude encolhem com a latitude
+    select = f"""
+        SELECT {", ".join(cols)} FROM jobs
+        WHERE lat = ? AND lon = ? AND active = 1 AND canonical_id IS NULL
+        ORDER BY priority DESC, created_at DESC, id DESC
+        LIMIT ?
+    """
+    items: List[Dict[str, Any]] = []
+    with read_conn() as conn:
+        points = conn.execute("""
+            SELECT p.lat, p.lon
+            FROM jobs_geo g JOIN geo_points p ON p.id = g.id
+            WHERE g.max_lat >= ? AND g.min_lat <= ? AND g.max_lon >= ? AND g.min_lon <= ?
+        """, (lat - dlat, lat + dlat, lon - dlon, lon + dlon)).fetchall()
+        nearest = sorted(
+            (d, p_lat, p_lon)
+            for p_lat, p_lon in points
+            if (d := haversine_km(lat, lon, p_lat, p_lon)) <= radius_km
+        )
+        for distance, p_lat, p_lon in nearest:
+            for row in conn.execute(select, (p_lat, p_lon, limit - len(items))):
+                item = {c: row[c] for c in cols}
+                item["distance_km"] = round(distance, 1)
+                items.append(item)
+            if len(items) >= limit:
+                break
+    return items
+
+
 def get_active_jobs_by_country(country_code: str) -> List[sqlite3.Row]:
     """
     Retorna vagas ativas filtrando pelo campo country (US, CA, etc).
     """
-    with get_conn() as conn:
+    with read_conn() as conn:
         cur = conn.execute("""
             SELECT url, title, company, description, city, state, country, salary,
                    category, priority, active, source, created_at, updated_at
             FROM jobs
             WHERE active = 1
-              AND UPPER(country) = UPPER(?)
+              AND canonical_id IS NULL
+              AND country = ?
             ORDER BY priority DESC, created_at DESC
-        """, (country_code,))
+        """, (country_code.upper(),))
         return cur.fetchall()
 
 
-def get_jobs_count_by_country(country_code: str, only_active: bool = True) -> int:
-    """
-    Conta vagas por país (ex: 'CA' para Canadá).
-    """
-    with get_conn() as conn:
-        if only_active:
-            row = conn.execute("""
-                SELECT COUNT(*) AS c
-                FROM jobs
-                WHERE active = 1
-                  AND UPPER(country) = UPPER(?)
-            """, (country_code,)).fetchone()
-        else:
-            row = conn.execute("""
-                SELECT COUNT(*) AS c
-                FROM jobs
-                WHERE UPPER(country) = UPPER(?)
-            """, (country_code,)).fetchone()
-
-        return int(row["c"] if isinstance(row, sqlite3.Row) else row[0])
+STAT_FACETS = ("country", "state", "category", "source")
 
 
-def get_jobs_count(conn: Optional[sqlite3.Connection] = None, only_active: bool = True) -> int:
-    close_after = False
+def refresh_job_stats(conn: Optional[sqlite3.Connection] = None) -> int:
+    """
+    Recalcula job_stats (contagens por country/state/category/source/active das
+    vagas não duplicadas) num único INSERT ... GROUP BY. Chamado no fim de cada
+    pipeline, antes de bump_data_version; retorna o número de linhas do resumo.
+    """
     if conn is None:
-        conn = get_conn()
-        close_after = True
-    try:
-        if only_active:
-            row = conn.execute("SELECT COUNT(*) AS c FROM jobs WHERE active = 1").fetchone()
-        else:
-            row = conn.execute("SELECT COUNT(*) AS c FROM jobs").fetchone()
-        return int(row["c"] if isinstance(row, sqlite3.Row) else row[0])
-    finally:
-        if close_after:
-            conn.close()
+        with write_conn() as pooled, pooled:
+            return refresh_job_stats(pooled)
+    conn.execute("DELETE FROM job_stats")
+    cur = conn.execute("""
+        INSERT INTO job_stats (country, state, category, source, active, n)
+        SELECT COALESCE(country, ''), COALESCE(state, ''), COALESCE(category, ''), COALESCE(source, ''),
+               COALESCE(active, 0), COUNT(*)
+        FROM jobs
+        WHERE canonical_id IS NULL
+        GROUP BY 1, 2, 3, 4, 5
+    """)
+    return cur.rowcount
 
-def get_active_jobs_by_country(country_code: str) -> List[sqlite3.Row]:
-        """
-        Retorna vagas ativas filtrando pelo campo country (US, CA, etc).
-        """
-        with get_conn() as conn:
-            cur = conn.execute("""
-                SELECT url, title, company, description, city, state, country, salary,
-                    category, priority, active, source, created_at, updated_at
-                FROM jobs
-                WHERE active = 1
-                AND UPPER(country) = UPPER(?)
-                ORDER BY priority DESC, created_at DESC
-            """, (country_code,))
-            return cur.fetchall()
+
+def get_job_stats(country: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Contagens por faceta das vagas ativas (sem duplicatas), lidas do job_stats:
+    {"total": n, "country": {"US": n, ...}, "state": {...}, "category": {...}, "source": {...}}.
+    """
+    where = ["active = 1"]
+    params: List[Any] = []
+    if country:
+        where.append("country = ?")
+        params.append(country.upper())
+    with read_conn() as conn:
+        rows = conn.execute(f"""
+            SELECT country, state, category, source, n FROM job_stats WHERE {" AND ".join(where)}
+        """, params).fetchall()
+    stats: Dict[str, Any] = {"total": 0}
+    for facet in STAT_FACETS:
+        stats[facet] = {}
+    for row in rows:
+        stats["total"] += row["n"]
+        for facet in STAT_FACETS:
+            stats[facet][row[facet]] = stats[facet].get(row[facet], 0) + row["n"]
+    for facet in STAT_FACETS:
+        stats[facet] = dict(sorted(stats[facet].items(), key=lambda kv: (-kv[1], kv[0])))
+    return stats
 
 
 def get_jobs_count_by_country(country_code: str, only_active: bool = True) -> int:
     """
     Conta vagas por país (ex: 'CA' para Canadá).
+    Vagas ativas: do resumo job_stats; todas: COUNT(*) indexado.
     """
-    with get_conn() as conn:
+    with read_conn() as conn:
         if only_active:
             row = conn.execute("""
-                SELECT COUNT(*) AS c
-                FROM jobs
-                WHERE active = 1
-                  AND UPPER(country) = UPPER(?)
-            """, (country_code,)).fetchone()
+                SELECT COALESCE(SUM(n), 0) AS c
+                FROM job_stats
+                WHERE country = ? AND active = 1
+            """, (country_code.upper(),)).fetchone()
         else:
             row = conn.execute("""
                 SELECT COUNT(*) AS c
                 FROM jobs
-                WHERE UPPER(country) = UPPER(?)
-            """, (country_code,)).fetchone()
+                WHERE country = ?
+            """, (country_code.upper(),)).fetchone()
 
         return int(row["c"] if isinstance(row, sqlite3.Row) else row[0])
 
+
+def get_jobs_count(conn: Optional[sqlite3.Connection] = None, only_active: bool = True) -> int:
+    if conn is None:
+        with read_conn() as pooled:
+            return get_jobs_count(pooled, only_active=only_active)
+    if only_active:
+        row = conn.execute("SELECT COALESCE(SUM(n), 0) AS c FROM job_stats WHERE active = 1").fetchone()
+    else:
+        row = conn.execute("SELECT COUNT(*) AS c FROM jobs").fetchone()
+    return int(row["c"] if isinstance(row, sqlite3.Row) else row[0])
@@ -0,0 +1,354 @@
+# dedup.py
+"""
+Detecção de vagas duplicadas entre fontes (ex.: a mesma vaga da Marriott vinda
+do Adzuna e do Workday da Marriott, com URLs diferentes).
+
+- Cada vaga ativa vira um conjunto de shingles (palavras de title/company +
+  trigramas de palavras da description).
+- Assinatura MinHash de NUM_PERM posições via one-permutation hashing (um hash
+  por shingle, em vez de NUM_PERM), guardada em job_minhash.
+- LSH com BANDS bandas de ROWS linhas (job_lsh): só vagas que colidem em alguma
+  banda são comparadas. O bucket inclui o local (país/estado/cidade normalizados),
+  então só vagas do mesmo local podem colidir, e cada vaga compara no máximo
+  MAX_CANDIDATES candidatas.
+- Candidatas de OUTRA fonte, do mesmo local e com similaridade estimada
+  >= SIMILARITY_THRESHOLD viram duplicatas: jobs.canonical_id aponta para a vaga
+  mais antiga do grupo (menor id). /jobs e as contagens mostram só as canônicas.
+  Uma vaga entra em UM grupo só (o da candidata mais parecida), e nunca num grupo
+  que já tem vaga da mesma fonte: grupos não se fundem entre si.
+- Vagas sem cidade ou sem description de verdade (placeholder) nunca são
+  ligadas: title + company sozinhos não distinguem vagas de lojas diferentes.
+
+Incremental: refresh_duplicates() só processa vagas ativas novas ou cujo
+content_hash mudou desde a última assinatura; quando a vaga alterada é canônica,
+as duplicatas dela são reavaliadas também. Rodar: python dedup.py
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import re
+import sqlite3
+from array import array
+from typing import Any, Dict, List, Optional, Set
+
+from db import write_conn
+from utils.gazetteer import COUNTRY_CODES, name_key
+
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SIMILARITY_THRESHOLD = float(os.getenv("JOBBOT_DEDUP_THRESHOLD", "0.8"))
+# candidatas comparadas por vaga (somando as bandas)
+MAX_CANDIDATES = int(os.getenv("JOBBOT_DEDUP_MAX_CANDIDATES", "200"))
+# mude quando shingles/buckets mudarem: refresh_duplicates() refaz o índice inteiro
+DEDUP_VERSION = 3
+# limite de parâmetros por IN (...)
+_IN_CHUNK = 500
+
+# hash de 64 bits: os bits baixos escolhem a posição, os 56 altos são o valor
+_VALUE_BITS = 56
+_EMPTY = (1 << 64) - 1
+
+WORD_RE = re.compile(r"\w+", re.UNICODE)
+# palavras que variam entre fontes para a mesma empresa ("Marriott International, Inc.")
+COMPANY_STOPWORDS = {"inc", "llc", "ltd", "corp", "corporation", "co", "company", "the", "international", "group"}
+# descriptions preenchidas por normalize.DEFAULTS ou placeholders dos scrapers não contam
+PLACEHOLDER_DESCRIPTIONS = {"candidate-se para saber mais detalhes.", "job description not available."}
+# cidade/estado preenchidos por normalize.DEFAULTS (já em name_key)
+PLACEHOLDER_PLACES = {"", "nao informado"}
+
+
+def _words(text: Optional[str]) -> List[str]:
+    return WORD_RE.findall((text or "").lower())
+
+
+def location_key(job: Dict[str, Any]) -> Optional[str]:
+    """'US|fl|orlando': país/estado/cidade normalizados; None sem cidade."""
+    city = name_key(job.get("city") or "")
+    if city in PLACEHOLDER_PLACES:
+        return None
+    state = name_key(job.get("state") or "")
+    if state in PLACEHOLDER_PLACES:
+        state = ""
+    country = (job.get("country") or "").strip().upper()
+    return f"{COUNTRY_CODES.get(country, country)}|{state}|{city}"
+
+
+def shingles(job: Dict[str, Any]) -> Set[str]:
+    """Shingles de title/company/description; vazio se a description for placeholder."""
+    desc = (job.get("description") or "").strip()
+    if desc.lower() in PLACEHOLDER_DESCRIPTIONS:
+        return set()
+    words = _words(desc)
+    desc_shingles = {"d:" + " ".join(words[i:i + 3]) for i in range(max(0, len(words) - 2))}
+    if not desc_shingles:
+        return set()
+    out = desc_shingles
+    out.update("t:" + w for w in _words(job.get("title")))
+    out.update("c:" + w for w in _words(job.get("company")) if w not in COMPANY_STOPWORDS)
+    return out
+
+
+def _hash64(shingle: str) -> int:
+    return int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def minhash(job: Dict[str, Any]) -> Optional[array]:
+    """
+    Assinatura one-permutation: cada shingle cai numa das NUM_PERM posições e
+    cada posição guarda o menor valor. Posições vazias copiam a próxima cheia
+    (densificação por rotação). None se a vaga não tiver description de verdade.
+    """
+    sig = array("Q", [_EMPTY]) * NUM_PERM
+    for sh in shingles(job):
+        h = _hash64(sh)
+        pos = h & (NUM_PERM - 1)
+        value = h >> (64 - _VALUE_BITS)
+        if value < sig[pos]:
+            sig[pos] = value
+    empty = [v == _EMPTY for v in sig]
+    if all(empty):
+        return None
+    for i in range(NUM_PERM):
+        if not empty[i]:
+            continue
+        step = 1
+        while empty[(i + step) % NUM_PERM]:
+            step += 1
+        sig[i] = sig[(i + step) % NUM_PERM] + (step << _VALUE_BITS)
+    return sig
+
+
+def similarity(a: array, b: array) -> float:
+    """Estimativa de Jaccard: fração de posições iguais."""
+    return sum(1 for x, y in zip(a, b) if x == y) / NUM_PERM
+
+
+def band_buckets(sig: array, location: str) -> List[int]:
+    """Uma chave (inteiro de 64 bits com sinal, cabe no SQLite) por banda, já com o local."""
+    prefix = location.encode("utf-8") + b"\0"
+    out = []
+    for band in range(BANDS):
+        chunk = sig[band * ROWS:(band + 1) * ROWS].tobytes()
+        out.append(int.from_bytes(hashlib.blake2b(prefix + chunk, digest_size=8).digest(), "little", signed=True))
+    return out
+
+
+def _load_sig(blob: Optional[bytes]) -> Optional[array]:
+    if not blob:
+        return None
+    sig = array("Q")
+    sig.frombytes(blob)
+    return sig
+
+
+def _matches(
+    conn: sqlite3.Connection, job_id: int, source: str, location: str, sig: array, buckets: List[int]
+) -> Dict[int, float]:
+    """
+    Raiz (vaga canônica) -> maior similaridade, das vagas de outras fontes, no
+    mesmo local, parecidas com esta.
+    """
+    candidates: Set[int] = set()
+    for band, bucket in enumerate(buckets):
+        remaining = MAX_CANDIDATES - len(candidates)
+        if remaining <= 0:
+            break
+        for row in conn.execute(
+            "SELECT job_id FROM job_lsh WHERE band = ? AND bucket = ? AND source <> ? AND job_id <> ?"
+            " ORDER BY job_id LIMIT ?",
+            (band, bucket, source, job_id, remaining),
+        ):
+            candidates.add(row[0])
+    if not candidates:
+        return {}
+
+    ids = sorted(candidates)
+    roots: Dict[int, float] = {}
+    for start in range(0, len(ids), _IN_CHUNK):
+        chunk = ids[start:start + _IN_CHUNK]
+        placeholders = ",".join("?" for _ in chunk)
+        for row in conn.execute(f"""
+            SELECT m.job_id, m.signature, j.canonical_id, j.city, j.state, j.country
+            FROM job_minhash m JOIN jobs j ON j.id = m.job_id
+            WHERE m.job_id IN ({placeholders}) AND j.active = 1
+        """, chunk):
+            # o bucket já inclui o local; a checagem explícita cobre colisão de hash
+            if location_key(dict(row)) != location:
+                continue
+            other = _load_sig(row["signature"])
+            if other is None:
+                continue
+            score = similarity(sig, other)
+            if score >= SIMILARITY_THRESHOLD:
+                root = row["canonical_id"] or row["job_id"]
+                roots[root] = max(score, roots.get(root, 0.0))
+    return roots
+
+
+def _group_has_source(conn: sqlite3.Connection, root: int, source: str) -> bool:
+    # duas consultas (e não "id = ? OR canonical_id = ?"): cada uma usa seu índice
+    return (
+        conn.execute("SELECT 1 FROM jobs WHERE id = ? AND source = ?", (root, source)).fetchone() is not None
+        or conn.execute(
+            "SELECT 1 FROM jobs WHERE canonical_id = ? AND source = ? LIMIT 1", (root, source)
+        ).fetchone() is not None
+    )
+
+
+def _best_root(conn: sqlite3.Connection, source: str, roots: Dict[int, float]) -> Optional[int]:
+    """Grupo mais parecido que ainda não tem vaga desta fonte (None se nenhum serve)."""
+    for root, _score in sorted(roots.items(), key=lambda kv: (-kv[1], kv[0])):
+        if not _group_has_source(conn, root, source):
+            return root
+    return None
+
+
+def _link(conn: sqlite3.Connection, job_id: int, root: int) -> None:
+    """
+    Põe job_id (sem duplicatas próprias, ver _release_members) no grupo de root;
+    a menor id vira a canônica do grupo.
+    """
+    if root < job_id:
+        conn.execute("UPDATE jobs SET canonical_id = ? WHERE id = ?", (root, job_id))
+        return
+    # job_id é mais antiga: vira a canônica do grupo
+    conn.execute("UPDATE jobs SET canonical_id = ? WHERE canonical_id = ?", (job_id, root))
+    conn.execute("UPDATE jobs SET canonical_id = ? WHERE id = ?", (job_id, root))
+    conn.execute("UPDATE jobs SET canonical_id = NULL WHERE id = ?", (job_id,))
+
+
+def _reset_if_outdated(conn: sqlite3.Connection) -> None:
+    """Índice gerado com outra DEDUP_VERSION: apaga assinaturas e ligações para refazer tudo."""
+    row = conn.execute("SELECT value FROM meta WHERE key = 'dedup_version'").fetchone()
+    if row is not None and row[0] == DEDUP_VERSION:
+        return
+    conn.execute("DELETE FROM job_lsh")
+    conn.execute("DELETE FROM job_minhash")
+    conn.execute("UPDATE jobs SET canonical_id = NULL WHERE canonical_id IS NOT NULL")
+    conn.execute(
+        "INSERT INTO meta (key, value) VALUES ('dedup_version', ?)"
+        " ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+        (DEDUP_VERSION,),
+    )
+
+
+def _release_members(conn: sqlite3.Connection, job_id: int) -> List[int]:
+    """
+    A vaga mudou: ela sai do grupo em que estava, e as duplicatas que apontavam
+    para ela perdem a ligação e a assinatura. Retorna as ids soltas, que
+    refresh_duplicates() reprocessa no mesmo refresh.
+    """
+    members = [r[0] for r in conn.execute("SELECT id FROM jobs WHERE canonical_id = ?", (job_id,))]
+    if members:
+        conn.execute("""
+            DELETE FROM job_minhash WHERE job_id IN (SELECT id FROM jobs WHERE canonical_id = ?)
+        """, (job_id,))
+        conn.execute("UPDATE jobs SET canonical_id = NULL WHERE canonical_id = ?", (job_id,))
+    conn.execute("UPDATE jobs SET canonical_id = NULL WHERE id = ? AND canonical_id IS NOT NULL", (job_id,))
+    return members
+
+
+_PENDING_SQL = """
+    SELECT j.id, j.title, j.company, j.description, j.city, j.state, j.country,
+           j.source, j.content_hash
+    FROM jobs j LEFT JOIN job_minhash m ON m.job_id = j.id
+    WHERE {where} AND j.active = 1
+      AND (m.job_id IS NULL OR m.content_hash IS NOT j.content_hash)
+"""
+
+
+def _index_job(conn: sqlite3.Connection, row: sqlite3.Row, stats: Dict[str, int]) -> List[int]:
+    """Assina uma vaga, atualiza o LSH e a liga a um grupo; retorna as duplicatas soltas."""
+    job_id, source = row["id"], row["source"] or ""
+    conn.execute("DELETE FROM job_lsh WHERE job_id = ?", (job_id,))
+    released = _release_members(conn, job_id)
+    job = dict(row)
+    location = location_key(job)
+    sig = minhash(job) if location else None
+    root: Optional[int] = None
+    if sig is not None:
+        buckets = band_buckets(sig, location)
+        root = _best_root(conn, source, _matches(conn, job_id, source, location, sig, buckets))
+        conn.executemany(
+            "INSERT OR IGNORE INTO job_lsh (band, bucket, job_id, source) VALUES (?, ?, ?, ?)",
+            [(band, bucket, job_id, source) for band, bucket in enumerate(buckets)],
+        )
+    if root is not None:
+        _link(conn, job_id, root)
+        stats["duplicates"] += 1
+    conn.execute(
+        "INSERT OR REPLACE INTO job_minhash (job_id, content_hash, signature) VALUES (?, ?, ?)",
+        (job_id, row["content_hash"], sig.tobytes() if sig is not None else None),
+    )
+    stats["indexed"] += 1
+    return released
+
+
+def refresh_duplicates(batch_size: int = 1000) -> Dict[str, int]:
+    """
+    Atualiza assinaturas/LSH das vagas ativas novas ou alteradas e religa as
+    duplicatas. Retorna {"indexed", "duplicates", "removed"}.
+    """
+    stats = {"indexed": 0, "duplicates": 0, "removed": 0}
+    with write_conn() as conn:
+        with conn:
+            _reset_if_outdated(conn)
+            # vagas inativas saem do índice; duplicatas de uma canônica inativa são recalculadas
+            conn.execute("DELETE FROM job_lsh WHERE job_id IN (SELECT id FROM jobs WHERE active = 0)")
+            cur = conn.execute("DELETE FROM job_minhash WHERE job_id IN (SELECT id FROM jobs WHERE active = 0)")
+            stats["removed"] = cur.rowcount
+            conn.execute("""
+                DELETE FROM job_minhash WHERE job_id IN (
+                    SELECT d.id FROM jobs d JOIN jobs c ON c.id = d.canonical_id
+                    WHERE d.active = 1 AND c.active = 0
+                )
+            """)
+            conn.execute("""
+                UPDATE jobs SET canonical_id = NULL
+                WHERE canonical_id IN (SELECT id FROM jobs WHERE active = 0)
+            """)
+
+        # duplicatas soltas por uma canônica que mudou e ainda não reprocessadas
+        released: Set[int] = set()
+        last_id = 0
+        while True:
+            # em ordem de id (keyset): vagas antigas entram no índice antes das novas
+            rows = conn.execute(
+                _PENDING_SQL.format(where="j.id > ?") + " ORDER BY j.id LIMIT ?", (last_id, batch_size)
+            ).fetchall()
+            if not rows:
+                break
+            last_id = rows[-1]["id"]
+            with conn:
+                for row in rows:
+                    released.discard(row["id"])
+                    released.update(_index_job(conn, row, stats))
+
+        # soltas que o keyset não pegou (ou pegou com o estado de antes da soltura)
+        while released:
+            ids = sorted(released)[:_IN_CHUNK]
+            released.difference_update(ids)
+            placeholders = ",".join("?" for _ in ids)
+            rows = conn.execute(
+                _PENDING_SQL.format(where=f"j.id IN ({placeholders})") + " ORDER BY j.id", ids
+            ).fetchall()
+            with conn:
+                for row in rows:
+                    released.discard(row["id"])
+                    released.update(_index_job(conn, row, stats))
+    return stats
+
+
+if __name__ == "__main__":
+    from db import bump_data_version, init_db, refresh_job_stats
+
+    init_db()
+    result = refresh_duplicates()
+    refresh_job_stats()
+    bump_data_version()
+    print(
+        f"🔗 dedup: {result['indexed']} vagas indexadas, {result['duplicates']} duplicatas ligadas, "
+        f"{result['removed']} inativas removidas do índice"
+    )
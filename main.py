@@ -1,17 +1,53 @@
 # main.py
 from __future__ import annotations
-from typing import Dict, Any, List, Tuple
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Callable, Iterable, Iterator, List, Tuple
 from urllib.parse import urlparse
 
 from scrapers.greenhouse import fetch_greenhouse
 from scrapers.mchire import fetch_mchire
-from scrapers.workday import fetch_workday  # aceita (tenant_host, tenant, site)
-from scrapers.adzuna import fetch_adzuna, fetch_adzuna_bulk  # Adzuna
+from scrapers.workday import iter_workday  # aceita (tenant_host, tenant, site)
+from scrapers.adzuna import iter_adzuna_bulk, write_quota_report  # Adzuna
+from scrapers.http_cache import cache_stats
 
 from sources import SOURCES
-from normalize import normalize_job, apply_defaults
-from db import init_db, upsert_job, get_active_jobs_ordered
-from utils.geo import looks_like_us_city_state
+from normalize import normalize_batch
+from dedup import refresh_duplicates
+from db import (
+    init_db,
+    upsert_jobs,
+    get_active_jobs_ordered,
+    bump_data_version,
+    start_run,
+    finish_run,
+    deactivate_unseen,
+    deactivate_stale,
+    count_unseen,
+    refresh_job_stats,
+)
+
+# Concorrência da coleta: limite global de fontes simultâneas e limite por host
+# (ex.: várias fontes Adzuna batem no mesmo api.adzuna.com).
+MAX_WORKERS = int(os.getenv("JOBBOT_MAX_WORKERS", "8"))
+MAX_PER_HOST = int(os.getenv("JOBBOT_MAX_PER_HOST", "2"))
+
+# Streaming coleta → gravação: coletores entregam lotes de CHUNK_SIZE vagas brutas
+# numa fila de até QUEUE_CHUNKS lotes (memória limitada, não importa o tamanho da fonte).
+CHUNK_SIZE = int(os.getenv("JOBBOT_CHUNK_SIZE", "200"))
+QUEUE_CHUNKS = int(os.getenv("JOBBOT_QUEUE_CHUNKS", "16"))
+
+ADZUNA_HOST = "api.adzuna.com"
+
+# tipos de fonte que trazem a listagem inteira: só neles "não veio nesta execução"
+# quer dizer "saiu do ar" (Workday avisa com IncompleteListing quando não leu tudo)
+FULL_LISTING_SOURCES = {"greenhouse", "workday"}
+# Adzuna é uma janela de busca (páginas, max_days_old, orçamento diário): vaga que
+# não veio não sumiu; expira quando fica ADZUNA_EXPIRE_DAYS dias sem ser vista
+ADZUNA_EXPIRE_DAYS = int(os.getenv("JOBBOT_ADZUNA_EXPIRE_DAYS", "30"))
 
 
 def workday_url_to_parts(url: str) -> Tuple[str, str, str]:
@@ -23,10 +59,10 @@ def workday_url_to_parts(url: str) -> Tuple[str, str, str]:
     return host, tenant, site
 
 
-def collect_from_source(src: Dict[str, Any]) -> List[Dict[str, Any]]:
+def collect_from_source(src: Dict[str, Any]) -> Iterable[Dict[str, Any]]:
     """
     Dispara o scraper correto conforme src['type'].
-    Retorna uma lista de dicts "raw" (formato do scraper).
+    Retorna dicts "raw" (formato do scraper): lista, ou gerador para fontes grandes (Workday).
     """
     t = src.get("type")
     try:
@@ -47,7 +83,7 @@ def collect_from_source(src: Dict[str, Any]) -> List[Dict[str, Any]]:
 
         if t == "workday":
             host, tenant, site = workday_url_to_parts(src["url"])
-            return fetch_workday(tenant_host=host, tenant=tenant, site=site)
+            return iter_workday(tenant_host=host, tenant=tenant, site=site)
 
         # opcionais
         if t == "ihg":
@@ -80,91 +116,141 @@ def collect_from_source(src: Dict[str, Any]) -> List[Dict[str, Any]]:
     return []
 
 
-def is_us_job(norm: Dict[str, Any], fallback_loc: str = "") -> bool:
+def source_host(src: Dict[str, Any]) -> str:
+    """Host que a fonte consulta; usado para limitar requisições simultâneas por host."""
+    t = src.get("type") or ""
+    if t == "greenhouse":
+        return "boards-api.greenhouse.io"
+    if t.startswith("adzuna"):
+        return ADZUNA_HOST
+    return urlparse(src.get("url") or "").netloc or t
+
+
+def collect_concurrently(
+    tasks: List[Dict[str, Any]],
+    *,
+    max_workers: int = MAX_WORKERS,
+    max_per_host: int = MAX_PER_HOST,
+    chunk_size: int = CHUNK_SIZE,
+    queue_chunks: int = QUEUE_CHUNKS,
+) -> Iterator[Tuple[str, Dict[str, Any], Any]]:
     """
-    Heurística para EUA:
-    - Se country já é US/USA/United States → aprova.
-    - Senão, verifica city/state/strings no fallback.
+    Executa o 'collect' de cada tarefa em paralelo (thread pool) e gera eventos
+    na ordem em que chegam:
+    - ("chunk", tarefa, [até chunk_size vagas brutas])
+    - ("done", tarefa, segundos) quando a tarefa termina; tarefa["complete"] fica
+      False se a coleta levantou exceção (ex.: IncompleteListing do Workday).
+
+    Cada tarefa é um dict com: name, host, collect (callable sem argumentos que
+    devolve um iterável; geradores são consumidos aos poucos).
+    A fila entre coletores e consumidor é limitada: se a gravação atrasar, os
+    coletores esperam (backpressure).
+    O tempo medido é só o da coleta (não conta a espera pelo limite do host nem pela fila).
     """
-    country = (norm.get("country") or "").replace(".", "").strip().upper()
-    if country in ("US", "USA", "UNITED STATES"):
-        return True
+    host_limits: Dict[str, threading.Semaphore] = {}
+    for task in tasks:
+        host_limits.setdefault(task["host"], threading.Semaphore(max(1, max_per_host)))
+    events: "queue.Queue[Tuple[str, Dict[str, Any], Any]]" = queue.Queue(maxsize=max(1, queue_chunks))
+    cancelled = threading.Event()
+
+    def run(task: Dict[str, Any]) -> None:
+        blocked = 0.0
+        start = time.perf_counter()
+        task["complete"] = False
+
+        def put(chunk: List[Dict[str, Any]]) -> None:
+            nonlocal blocked
+            t0 = time.perf_counter()
+            events.put(("chunk", task, chunk))
+            blocked += time.perf_counter() - t0
+
+        try:
+            with host_limits[task["host"]]:
+                start = time.perf_counter()
+                chunk: List[Dict[str, Any]] = []
+                try:
+                    for raw in task["collect"]() or []:
+                        if cancelled.is_set():
+                            break
+                        chunk.append(raw)
+                        if len(chunk) >= chunk_size:
+                            put(chunk)
+                            chunk = []
+                    else:
+                        task["complete"] = True
+                except Exception as e:
+                    print(f"❌ {task['name']}: falha ao coletar - {e}")
+                if chunk and not cancelled.is_set():
+                    put(chunk)
+        finally:
+            events.put(("done", task, time.perf_counter() - start - blocked))
 
-    city = (norm.get("city") or "").strip()
-    state = (norm.get("state") or "").strip()
-    fb = fallback_loc or ", ".join([city, state, country]).strip(", ")
-    return looks_like_us_city_state(city, state, country, fb)
+    with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="collect") as pool:
+        for task in tasks:
+            pool.submit(run, task)
+        remaining = len(tasks)
+        try:
+            while remaining:
+                event = events.get()
+                if event[0] == "done":
+                    remaining -= 1
+                yield event
+        finally:
+            # consumidor saiu antes do fim: drena a fila para nenhum coletor ficar preso no put
+            cancelled.set()
+            while remaining:
+                if events.get()[0] == "done":
+                    remaining -= 1
 
 
 def _process_and_save(
     name: str,
-    raw_jobs: List[Dict[str, Any]],
+    raw_jobs: Iterable[Dict[str, Any]],
     *,
     source_type: str,
     default_company: str = "",
-) -> int:
-    """Normaliza, filtra EUA, aplica defaults e salva. Retorna quantos foram salvos."""
-    normalized_items: List[tuple[Dict[str, Any], Dict[str, Any]]] = []
-    for raw in raw_jobs:
-        try:
-            norm = normalize_job(raw, source_type=source_type, default_company=default_company)
-            if not norm:
-                continue
-            if not norm.get("url") or not norm.get("title"):
-                # url e title são obrigatórios
-                continue
-            normalized_items.append((norm, raw))
-        except Exception as e:
-            print(f"[{name}] erro ao normalizar item: {e}")
-
-    # filtro EUA usando fallback de possíveis chaves de localização brutas
-    filtered: List[Dict[str, Any]] = []
-    for norm, raw in normalized_items:
-        fallback_loc = ""
-        for k in ("location", "locations", "city", "state", "country"):
-            v = raw.get(k)
-            if isinstance(v, str) and v.strip():
-                fallback_loc = v
-                break
-        try:
-            if is_us_job(norm, fallback_loc=fallback_loc):
-                filtered.append(norm)
-        except Exception as e:
-            print(f"[{name}] erro no filtro EUA: {e}")
+    run_id: int | None = None,
+) -> Dict[str, int]:
+    """
+    Normaliza, filtra EUA, aplica defaults (uma passada, normalize_batch) e salva
+    (carimbando run_id). Retorna as contagens do upsert: {"inserted", "updated", "unchanged"}.
+    """
+    ready = normalize_batch(raw_jobs, source_type, default_company, name=name)
+    try:
+        return upsert_jobs(ready, run_id=run_id)
+    except Exception as e:
+        print(f"[{name}] erro ao salvar no DB: {e}")
+        return {"inserted": 0, "updated": 0, "unchanged": 0}
 
-    # salvar aplicando defaults
-    saved = 0
-    for job in filtered:
-        try:
-            job = apply_defaults(job)
-            upsert_job(job)
-            saved += 1
-        except Exception as e:
-            print(f"[{name}] erro ao salvar no DB: {e}")
 
-    return saved
+def _adzuna_collector(terms: List[str]) -> Callable[[], Iterable[Dict[str, Any]]]:
+    def collect() -> Iterable[Dict[str, Any]]:
+        return iter_adzuna_bulk(
+            terms,
+            where=None,           # país já é US na URL da API
+            pages=6,              # mais páginas para volume
+            results_per_page=50,  # máximo Adzuna
+            max_days_old=60,      # janela maior para aumentar volume
+        )
+    return collect
 
 
 def main():
     print("🟣 JobBot iniciando coleta...")
     init_db()
+    run_start = time.perf_counter()
+    run_id = start_run("us")
 
-    # 1) Rodar fontes fixas
+    # 1) Fontes fixas
+    tasks: List[Dict[str, Any]] = []
     for src in SOURCES:
-        name = src.get("name") or src.get("company") or src.get("type")
-        try:
-            raw_jobs = collect_from_source(src) or []
-        except Exception as e:
-            print(f"❌ {name}: falha ao coletar - {e}")
-            raw_jobs = []
-
-        saved = _process_and_save(
-            name,
-            raw_jobs,
-            source_type=src.get("type", ""),
-            default_company=src.get("company", ""),
-        )
-        print(f"✅ {name}: {len(raw_jobs)} vagas (brutas) | salvas EUA: {saved}")
+        tasks.append({
+            "name": src.get("name") or src.get("company") or src.get("type"),
+            "host": source_host(src),
+            "source_type": src.get("type", ""),
+            "default_company": src.get("company", ""),
+            "collect": lambda src=src: collect_from_source(src),
+        })
 
     # 2) Batches Adzuna (volume)
     BATCH_A = [
@@ -193,21 +279,107 @@ def main():
     ]
 
     for label, terms in batches:
-        try:
-            raw_jobs = fetch_adzuna_bulk(
-                terms,
-                where=None,           # país já é US na URL da API
-                pages=6,              # mais páginas para volume
-                results_per_page=50,  # máximo Adzuna
-                max_days_old=60,      # janela maior para aumentar volume
-                jitter_sec=0.2,
+        tasks.append({
+            "name": label,
+            "host": ADZUNA_HOST,
+            "source_type": "adzuna",
+            "default_company": "",
+            "collect": _adzuna_collector(terms),
+        })
+
+    # Coleta em paralelo, gravação em streaming: cada lote é salvo assim que chega
+    # (o DB fica só na thread principal)
+    timings: List[Tuple[str, float]] = []
+    changes: List[Tuple[str, Dict[str, int]]] = []
+    # source -> todas as fontes desse tipo leram a listagem inteira e trouxeram vagas?
+    # (só então dá para desativar as que sumiram)
+    sweepable: Dict[str, bool] = {}
+    run_sources: set[str] = set()  # tipos de fonte desta execução (relatório de vagas que sumiram)
+    progress: Dict[int, Dict[str, Any]] = {}  # id(tarefa) -> vagas brutas e contagens acumuladas
+    for kind, task, payload in collect_concurrently(tasks):
+        name = task["name"]
+        entry = progress.setdefault(id(task), {"raw": 0, "counts": {"inserted": 0, "updated": 0, "unchanged": 0}})
+        if kind == "chunk":
+            entry["raw"] += len(payload)
+            counts = _process_and_save(
+                name,
+                payload,
+                source_type=task["source_type"],
+                default_company=task["default_company"],
+                run_id=run_id,
             )
-            saved = _process_and_save(label, raw_jobs, source_type="adzuna", default_company="")
-            print(f"✅ {label}: {len(raw_jobs)} vagas (brutas) | salvas EUA: {saved}")
+            for key, value in counts.items():
+                entry["counts"][key] += value
+            continue
+
+        elapsed = payload
+        counts = entry["counts"]
+        timings.append((name, elapsed))
+        changes.append((name, counts))
+        source = (task["source_type"] or "unknown").lower()  # o handler de normalize grava source = tipo da fonte
+        run_sources.add(source)
+        if source in FULL_LISTING_SOURCES:
+            sweepable[source] = sweepable.get(source, True) and task["complete"] and sum(counts.values()) > 0
+        print(f"✅ {name}: {entry['raw']} vagas (brutas) | salvas EUA: {sum(counts.values())} | {elapsed:.1f}s")
+
+    # 3) Tempo por fonte (mais lentas primeiro)
+    print(f"⏱️  coleta total: {time.perf_counter() - run_start:.1f}s")
+    for name, elapsed in sorted(timings, key=lambda x: x[1], reverse=True):
+        print(f"   {elapsed:7.1f}s  {name}")
+    hc = cache_stats()
+    print(f"🗄️  cache HTTP: {hc['not_modified']} 304, {hc['same_body']} corpo igual, {hc['parsed']} parseadas")
+    try:
+        write_quota_report()
+    except Exception as e:
+        print(f"⚠️ erro ao gravar relatório de cota do Adzuna: {e}")
+
+    # 4) Mudanças por fonte
+    print("🔁 novas / alteradas / sem mudança:")
+    for name, counts in changes:
+        print(f"   {counts['inserted']:6d} {counts['updated']:6d} {counts['unchanged']:6d}  {name}")
+
+    # 5) Vagas que sumiram, por source: todas são contadas; só são desativadas nas
+    # sources em que todas as fontes leram a listagem inteira (Adzuna expira por idade)
+    try:
+        unseen = count_unseen(run_id)
+    except Exception as e:
+        print(f"⚠️ erro ao contar vagas que sumiram: {e}")
+        unseen = {}
+    for source in sorted(run_sources):
+        missing = unseen.get(source, 0)
+        if not sweepable.get(source):
+            reason = "listagem parcial" if source not in FULL_LISTING_SOURCES else "alguma fonte veio vazia ou incompleta"
+            print(f"   {source}: {missing} vagas não vieram nesta execução, mantidas ({reason})")
+            continue
+        try:
+            gone = deactivate_unseen(run_id, source=source)
+            print(f"🧹 {source}: {gone} vagas sumiram e foram desativadas")
         except Exception as e:
-            print(f"[adzuna] erro: {e}")
+            print(f"⚠️ erro ao desativar vagas de {source}: {e}")
+    try:
+        gone = deactivate_stale("adzuna", days=ADZUNA_EXPIRE_DAYS)
+        print(f"🧹 adzuna: {gone} vagas sem aparecer há {ADZUNA_EXPIRE_DAYS}+ dias desativadas")
+    except Exception as e:
+        print(f"⚠️ erro ao expirar vagas do Adzuna: {e}")
+    finish_run(run_id)
+
+    # liga duplicatas entre fontes (só vagas novas/alteradas)
+    try:
+        dd = refresh_duplicates()
+        print(f"🔗 dedup: {dd['indexed']} vagas indexadas, {dd['duplicates']} duplicatas ligadas")
+    except Exception as e:
+        print(f"⚠️ erro ao atualizar duplicatas: {e}")
+
+    # contagens por faceta (/jobs/count, /jobs/stats) depois do dedup
+    try:
+        refresh_job_stats()
+    except Exception as e:
+        print(f"⚠️ erro ao atualizar job_stats: {e}")
+
+    # invalida o cache de respostas da API
+    bump_data_version()
 
-    # 3) Snapshot
+    # 6) Snapshot
     try:
         rows = get_active_jobs_ordered()
         print(f"📦 vagas ativas agora: {len(rows)}")
@@ -1,18 +1,44 @@
 # main_canada.py
 from __future__ import annotations
 
+import argparse
+import os
 import re
 import time
-from typing import Dict, Any, List, Optional
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional, Tuple
 from urllib.parse import urljoin
 
-import requests
-from bs4 import BeautifulSoup
-
-from db import init_db, upsert_job, get_conn
+from scrapers import http_client
+from scrapers.parsing import anchors
+from db import init_db, upsert_jobs, bump_data_version, start_run, finish_run, deactivate_unseen, refresh_job_stats
+from normalize import compute_content_hash
+from priority import compute_priority
+from utils.gazetteer import geocode
+from dedup import refresh_duplicates
+from utils.ratelimit import AdaptiveDelay
+from utils.state import load_state, update_state
 
 BASE_URL = "https://www.jobbank.gc.ca/jobsearch/jobsearch"
 
+# Limite de segurança de páginas
+MAX_PAGES = 200
+# páginas buscadas ao mesmo tempo (1 = sequencial)
+CRAWL_CONCURRENCY = int(os.getenv("JOBBOT_CANADA_CONCURRENCY", "3"))
+# intervalo inicial entre requisições; o AdaptiveDelay ajusta conforme latência e 429/503
+CRAWL_DELAY_SEC = float(os.getenv("JOBBOT_CANADA_DELAY", "0.5"))
+THROTTLE_STATUSES = {429, 503}
+
+# Modo da coleta: "full" varre até o fim e desativa o que sumiu; "incremental" para
+# quando as páginas (sort=M, mais recentes primeiro) só trazem vagas já conhecidas;
+# "auto" faz full se o último full tiver mais de FULL_CRAWL_EVERY_DAYS dias.
+CRAWL_MODE = os.getenv("JOBBOT_CANADA_MODE", "auto")
+FULL_CRAWL_EVERY_DAYS = float(os.getenv("JOBBOT_CANADA_FULL_EVERY_DAYS", "7"))
+# incremental: páginas seguidas sem nenhuma vaga nova antes de parar
+KNOWN_PAGES_TO_STOP = int(os.getenv("JOBBOT_CANADA_KNOWN_PAGES", "2"))
+CRAWL_STATE = "jobbank_crawl"
+
 # Mesmo filtro que você usa na URL:
 # https://www.jobbank.gc.ca/jobsearch/jobsearch?page=1&sort=M&fskl=101020&fskl=101010
 COMMON_PARAMS = {
@@ -118,26 +144,43 @@ def parse_job_summary(text: str) -> Optional[Dict[str, Any]]:
     }
 
 
-def fetch_jobbank_page(page: int) -> List[Dict[str, Any]]:
+def fetch_jobbank_page(page: int, delay: Optional[AdaptiveDelay] = None) -> List[Dict[str, Any]]:
     """
     Busca uma página de resultados do Job Bank e devolve uma lista de jobs.
 
     NÃO depende de <span property="title">.
     Usa o texto do <a> e extrai o título/cargo via regex.
+    Com `delay`, espera a vez antes da requisição e informa latência/429/503 depois.
     """
     params = COMMON_PARAMS.copy()
     params["page"] = str(page)
 
-    resp = requests.get(BASE_URL, params=params, headers=HEADERS, timeout=30)
+    if delay:
+        delay.wait()
+    start = time.perf_counter()
+    resp = http_client.get(BASE_URL, params=params, headers=HEADERS, timeout=30)
+    if delay:
+        delay.observe(time.perf_counter() - start, throttled=_was_throttled(resp))
     resp.raise_for_status()
+    return parse_jobbank_html(resp.text)
+
 
-    soup = BeautifulSoup(resp.text, "html.parser")
+def _was_throttled(resp) -> bool:
+    """429/503 na resposta final ou em algum retry feito pelo http_client."""
+    if resp.status_code in THROTTLE_STATUSES:
+        return True
+    retries = getattr(resp.raw, "retries", None)
+    history = getattr(retries, "history", None) or ()
+    return any(h.status in THROTTLE_STATUSES for h in history)
 
+
+def parse_jobbank_html(html: str) -> List[Dict[str, Any]]:
+    """Extrai os jobs do HTML de uma página de resultados (só os <a> de jobposting são montados)."""
     jobs: List[Dict[str, Any]] = []
     seen_urls: set[str] = set()
 
     # Mesmo jeito que funcionava antes: pega todos <a> de jobposting
-    for a in soup.select('a[href*="/jobsearch/jobposting/"]'):
+    for a in anchors(html, "/jobsearch/jobposting/"):
         href = a.get("href")
         if not href:
             continue
@@ -171,7 +214,7 @@ def fetch_jobbank_page(page: int) -> List[Dict[str, Any]]:
                 "country": "CA",
                 "salary": "",
                 "category": "jobbank_canada",
-                "priority": 30,
+                "priority": compute_priority(description, "", "jobbank_gc_ca"),
                 "active": 1,
                 "source": "jobbank_gc_ca",
             }
@@ -189,7 +232,7 @@ def fetch_jobbank_page(page: int) -> List[Dict[str, Any]]:
             "country": "CA",
             "salary": parsed["salary"],
             "category": "jobbank_canada",
-            "priority": 30,
+            "priority": compute_priority(parsed["title"], parsed["company"], "jobbank_gc_ca"),
             "active": 1,
             "source": "jobbank_gc_ca",
         }
@@ -198,84 +241,188 @@ def fetch_jobbank_page(page: int) -> List[Dict[str, Any]]:
     return jobs
 
 
-def deactivate_old_canada_jobs(urls_to_keep: List[str]) -> None:
+def deactivate_old_canada_jobs(run_id: int) -> int:
     """
-    Marca como inativas todas as vagas do país 'CA' cuja URL
-    NÃO esteja em urls_to_keep. Não mexe nas vagas dos EUA.
+    Marca como inativas as vagas do país 'CA' que a execução run_id
+    não coletou. Não mexe nas vagas dos EUA.
     """
-    with get_conn() as conn:
-        if urls_to_keep:
-            placeholders = ",".join("?" for _ in urls_to_keep)
-            sql = f"""
-                UPDATE jobs
-                SET active = 0,
-                    updated_at = datetime('now')
-                WHERE country = 'CA'
-                  AND url NOT IN ({placeholders});
-            """
-            conn.execute(sql, urls_to_keep)
+    return deactivate_unseen(run_id, country="CA")
+
+
+def crawl_jobbank(
+    run_id: int,
+    *,
+    max_pages: int = MAX_PAGES,
+    concurrency: int = CRAWL_CONCURRENCY,
+    stop_after_known: int = 0,
+) -> Tuple[Dict[str, int], bool]:
+    """
+    Busca as páginas do Job Bank com até `concurrency` requisições em andamento,
+    espaçadas por um AdaptiveDelay, e grava cada página no banco assim que chega
+    (sem acumular tudo em memória).
+
+    As páginas são processadas na ordem; o crawl para na primeira página vazia,
+    com erro ou sem nenhuma URL nova. Com stop_after_known=N (modo incremental),
+    para também após N páginas seguidas em que todas as vagas já estavam no banco.
+
+    Retorna (contagens do upsert, completo). completo = o crawl terminou do jeito
+    normal (página vazia, sem URLs novas, max_pages ou stop_after_known) e toda
+    página foi gravada; com erro de busca ou de gravação, False (as vagas não
+    vistas não podem ser desativadas).
+    """
+    delay = AdaptiveDelay(initial=CRAWL_DELAY_SEC)
+    seen_urls: set[str] = set()
+    counts = {"inserted": 0, "updated": 0, "unchanged": 0}
+    pages_done = 0
+    known_streak = 0
+    complete = False
+    save_failed = False
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="jobbank") as pool:
+        in_flight: Dict[int, Future] = {}
+        next_page = 1
+
+        def submit_more() -> None:
+            nonlocal next_page
+            while len(in_flight) < max(1, concurrency) and next_page <= max_pages:
+                in_flight[next_page] = pool.submit(fetch_jobbank_page, next_page, delay)
+                next_page += 1
+
+        submit_more()
+        page = 1
+        while page in in_flight:
+            fut = in_flight.pop(page)
+            try:
+                page_jobs = fut.result()
+            except Exception as e:
+                print(f"❌ Erro ao buscar página {page}: {e}")
+                break
+
+            if not page_jobs:
+                print(f"⚠️ Nenhuma vaga encontrada na página {page}, parando.")
+                complete = True
+                break
+
+            fresh: List[Dict[str, Any]] = []
+            for job in page_jobs:
+                if job["url"] in seen_urls:
+                    continue
+                seen_urls.add(job["url"])
+                job["lat"], job["lon"] = geocode(job["city"], job["state"], "CA") or (None, None)
+                job["content_hash"] = compute_content_hash(job)
+                fresh.append(job)
+
+            if not fresh:
+                print(f"⚠️ Página {page} sem URLs novas, parando.")
+                complete = True
+                break
+
+            try:
+                page_counts = upsert_jobs(fresh, run_id=run_id)
+            except Exception as e:
+                print(f"⚠️ Erro ao salvar página {page}: {e}")
+                page_counts = {}
+                save_failed = True
+            for key in counts:
+                counts[key] += page_counts.get(key, 0)
+
+            pages_done += 1
+            print(
+                f"📄 Página {page}: {len(fresh)} vagas, {page_counts.get('inserted', 0)} inéditas "
+                f"(intervalo atual {delay.delay:.2f}s)."
+            )
+            # upsert conta como "inserted" só URL que ainda não estava em jobs;
+            # página que não foi gravada não diz nada (não entra na sequência)
+            if page_counts:
+                known_streak = known_streak + 1 if not page_counts.get("inserted") else 0
+            if stop_after_known and known_streak >= stop_after_known:
+                print(f"⏹️  {known_streak} páginas seguidas só com vagas conhecidas, parando.")
+                complete = True
+                break
+            page += 1
+            submit_more()
         else:
-            conn.execute("""
-                UPDATE jobs
-                SET active = 0,
-                    updated_at = datetime('now')
-                WHERE country = 'CA';
-            """)
-        conn.commit()
+            # chegou em max_pages
+            complete = True
 
+        # páginas além do ponto de parada não são mais necessárias
+        for fut in in_flight.values():
+            fut.cancel()
 
-def main():
-    print("🍁 JobBot Canada iniciando coleta (Job Bank)...")
+    print(f"📦 Job Bank: {pages_done} páginas, {len(seen_urls)} vagas coletadas.")
+    return counts, complete and not save_failed
+
+
+def resolve_mode(mode: str = CRAWL_MODE) -> str:
+    """'auto' vira 'full' se o último crawl completo for mais velho que FULL_CRAWL_EVERY_DAYS."""
+    if mode in ("full", "incremental"):
+        return mode
+    last_full = load_state(CRAWL_STATE).get("last_full")
+    if not last_full:
+        return "full"
+    try:
+        age = datetime.now() - datetime.fromisoformat(last_full)
+    except ValueError:
+        return "full"
+    return "full" if age >= timedelta(days=FULL_CRAWL_EVERY_DAYS) else "incremental"
+
+
+def _mark_full_crawl() -> None:
+    def mutate(state: Dict[str, Any]) -> None:
+        state["last_full"] = datetime.now().isoformat(timespec="seconds")
+    update_state(CRAWL_STATE, mutate)
+
+
+def main(mode: str = CRAWL_MODE):
+    mode = resolve_mode(mode)
+    print(f"🍁 JobBot Canada iniciando coleta (Job Bank, modo {mode})...")
     init_db()
+    run_id = start_run("canada")
 
-    all_jobs: List[Dict[str, Any]] = []
-    seen_urls: set[str] = set()
+    stop_after_known = KNOWN_PAGES_TO_STOP if mode == "incremental" else 0
+    counts, complete = crawl_jobbank(run_id, stop_after_known=stop_after_known)
+
+    print(
+        f"✅ Vagas Job Bank salvas/atualizadas: {sum(counts.values())} "
+        f"(novas: {counts['inserted']}, atualizadas: {counts['updated']}, "
+        f"sem mudança: {counts['unchanged']})"
+    )
 
-    # Limite de segurança de páginas
-    MAX_PAGES = 200
-
-    page = 1
-    while page <= MAX_PAGES:
-        print(f"➡️  Página {page}...")
-        try:
-            page_jobs = fetch_jobbank_page(page)
-        except Exception as e:
-            print(f"❌ Erro ao buscar página {page}: {e}")
-            break
-
-        if not page_jobs:
-            print("⚠️ Nenhuma vaga encontrada nessa página, parando.")
-            break
-
-        added_this_page = 0
-        for job in page_jobs:
-            if job["url"] in seen_urls:
-                continue
-            seen_urls.add(job["url"])
-            all_jobs.append(job)
-            added_this_page += 1
-
-        print(f"📄 Página {page}: {added_this_page} vagas novas.")
-        time.sleep(1.0)
-        page += 1
-
-    print(f"📦 Total de vagas Job Bank coletadas (antes de salvar): {len(all_jobs)}")
-
-    saved = 0
-    for job in all_jobs:
-        try:
-            upsert_job(job)
-            saved += 1
-        except Exception as e:
-            print(f"⚠️ Erro ao salvar vaga {job.get('url')}: {e}")
-
-    print(f"✅ Vagas Job Bank salvas/atualizadas: {saved}")
-
-    deactivate_old_canada_jobs(list(seen_urls))
-    print("🧹 Vagas antigas do Canadá marcadas como inativas.")
+    # só o crawl completo (que terminou sem erro) vê todas as vagas ativas; no
+    # incremental, não desativa nada
+    if mode != "full":
+        print("ℹ️ Modo incremental: desativação fica para o próximo crawl completo.")
+    elif not complete:
+        # também não marca last_full: o próximo 'auto' tenta o crawl completo de novo
+        print("⚠️ Crawl interrompido por erro; vagas antigas do Canadá mantidas.")
+    elif sum(counts.values()):
+        gone = deactivate_old_canada_jobs(run_id)
+        print(f"🧹 Vagas antigas do Canadá marcadas como inativas: {gone}")
+        _mark_full_crawl()
+    else:
+        print("⚠️ Nada salvo nesta execução; vagas antigas do Canadá mantidas.")
+    finish_run(run_id)
+
+    # liga duplicatas entre fontes (só vagas novas/alteradas)
+    try:
+        dd = refresh_duplicates()
+        print(f"🔗 dedup: {dd['indexed']} vagas indexadas, {dd['duplicates']} duplicatas ligadas")
+    except Exception as e:
+        print(f"⚠️ erro ao atualizar duplicatas: {e}")
+
+    # contagens por faceta (/jobs/count, /jobs/stats) depois do dedup
+    try:
+        refresh_job_stats()
+    except Exception as e:
+        print(f"⚠️ erro ao atualizar job_stats: {e}")
+
+    # invalida o cache de respostas da API
+    bump_data_version()
 
     print("🏁 JobBot Canada finalizado.")
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Coleta de vagas do Job Bank (Canadá).")
+    parser.add_argument("--mode", choices=["auto", "full", "incremental"], default=CRAWL_MODE)
+    main(parser.parse_args().mode)
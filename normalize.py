@@ -1,153 +1,153 @@
 # normalize.py
 from __future__ import annotations
-from typing import Dict, Any
-from utils.geo import US_STATE_ABBR, extract_city_state_country, pick_us_piece
+import hashlib
+import json
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional
+from priority import DEFAULT_PRIORITY, compute_priority
+from utils.gazetteer import geocode
+from utils.geo import US_STATE_ABBR, extract_city_state_country, looks_like_us_city_state, pick_us_piece, state_name_to_abbr
 
 
 def _basic_clean(s: str | None) -> str:
     return (s or "").strip()
 
 
-def normalize_job(
-    raw: Dict[str, Any],
-    *,
-    source_type: str | None = None,
-    default_company: str = "",
-) -> Dict[str, Any] | None:
-    """
-    Converte o dict 'raw' de cada scraper para um formato unificado:
-    {
-      source, url, title, company, description,
-      city, state, country, salary, category, priority, active
+# Cada handler converte o dict 'raw' de um tipo de fonte para o formato unificado:
+# {
+#   source, url, title, company, description,
+#   city, state, country, salary, category, active
+# }
+# e devolve None quando falta url/title. A priority vem do priority.ENGINE
+# (tabela de regras), aplicada por _score.
+Handler = Callable[[Dict[str, Any], str], Optional[Dict[str, Any]]]
+
+
+# === ADZUNA ===========================================================
+def _normalize_adzuna(raw: Dict[str, Any], default_company: str) -> Dict[str, Any] | None:
+    loc = (raw.get("location") or {})
+    area = loc.get("area") or []  # e.g. ["USA","Florida","Orlando"]
+    country_code = (loc.get("country") or "").upper()
+
+    # heurística simples: penúltimo = state, último = city
+    city = ""
+    state = ""
+    if len(area) >= 2:
+        city = _basic_clean(area[-1])
+        state = _basic_clean(area[-2])
+
+    comp = raw.get("company")
+    company = ""
+    if isinstance(comp, dict):
+        company = comp.get("display_name") or comp.get("name") or ""
+    else:
+        company = comp or ""
+
+    title = _basic_clean(raw.get("title"))
+    url = _basic_clean(raw.get("redirect_url"))
+    if not url or not title:
+        return None  # url e title são essenciais
+
+    return {
+        "source": "adzuna",
+        "url": url,
+        "title": title,
+        "company": company or default_company,
+        "description": _basic_clean(raw.get("description")),
+        "city": city,
+        "state": state,
+        "country": "US" if country_code in ("US", "USA", "UNITED STATES") else country_code,
+        "salary": "",
+        "category": (raw.get("category", {}) or {}).get("label") or "other",
+        "active": True,
     }
-    """
-    st = (source_type or "").lower()
 
-    # === ADZUNA ===========================================================
-    if st == "adzuna":
-        loc = (raw.get("location") or {})
-        area = loc.get("area") or []  # e.g. ["USA","Florida","Orlando"]
-        country_code = (loc.get("country") or "").upper()
-
-        # heurística simples: penúltimo = state, último = city
-        city = ""
-        state = ""
-        if len(area) >= 2:
-            city = _basic_clean(area[-1])
-            state = _basic_clean(area[-2])
-
-        comp = raw.get("company")
-        company = ""
-        if isinstance(comp, dict):
-            company = comp.get("display_name") or comp.get("name") or ""
-        else:
-            company = comp or ""
-
-        title = _basic_clean(raw.get("title"))
-        url = _basic_clean(raw.get("redirect_url"))
-        if not url or not title:
-            return None  # url e title são essenciais
-
-        return {
-            "source": "adzuna",
-            "url": url,
-            "title": title,
-            "company": company or default_company,
-            "description": _basic_clean(raw.get("description")),
-            "city": city,
-            "state": state,
-            "country": "US" if country_code in ("US", "USA", "UNITED STATES") else country_code,
-            "salary": "",
-            "category": (raw.get("category", {}) or {}).get("label") or "other",
-            "priority": 20,
-            "active": True,
-        }
-
-    # === GREENHOUSE (genérico) ===========================================
-    if st == "greenhouse":
-        # Suporta dois formatos: lista v1 e v2
-        title = _basic_clean(raw.get("title"))
-        url = _basic_clean(raw.get("url") or raw.get("absolute_url"))
-        if not title or not url:
-            return None
-
-        # location pode ser string ou dict
-        city = state = country = ""
-        loc = raw.get("location")
-        if isinstance(loc, dict):
-            # v1/v2: (city, name, country)
-            city = _basic_clean(loc.get("name") or loc.get("city"))
-        elif isinstance(loc, str):
+
+# === GREENHOUSE (genérico) ===========================================
+def _normalize_greenhouse(raw: Dict[str, Any], default_company: str) -> Dict[str, Any] | None:
+    # Suporta dois formatos: lista v1 e v2
+    title = _basic_clean(raw.get("title"))
+    url = _basic_clean(raw.get("url") or raw.get("absolute_url"))
+    if not title or not url:
+        return None
+
+    # location pode ser string ou dict
+    city = state = country = ""
+    loc = raw.get("location")
+    if isinstance(loc, dict):
+        # v1/v2: (city, name, country)
+        city = _basic_clean(loc.get("name") or loc.get("city"))
+    elif isinstance(loc, str):
+        city, state, country = extract_city_state_country(loc)
+
+    company = _basic_clean(raw.get("company") or default_company)
+
+    return {
+        "source": "greenhouse",
+        "url": url,
+        "title": title,
+        "company": company,
+        "description": _basic_clean(raw.get("content") or raw.get("description")),
+        "city": city,
+        "state": state,
+        "country": country,
+        "salary": "",
+        "category": _basic_clean(raw.get("department") or raw.get("category") or "other"),
+        "active": True,
+    }
+
+
+# === MCHIRE (HTML/links) =============================================
+def _normalize_mchire(raw: Dict[str, Any], default_company: str) -> Dict[str, Any] | None:
+    title = _basic_clean(raw.get("title") or "McDonald's Job")
+    url = _basic_clean(raw.get("url"))
+    if not url:
+        return None
+    return {
+        "source": "mchire",
+        "url": url,
+        "title": title,
+        "company": _basic_clean(raw.get("company") or default_company or "McDonald's"),
+        "description": _basic_clean(raw.get("description")),
+        "city": _basic_clean(raw.get("city")),
+        "state": _basic_clean(raw.get("state")),
+        "country": _basic_clean(raw.get("country") or "US"),
+        "salary": _basic_clean(raw.get("salary")),
+        "category": _basic_clean(raw.get("category") or "restaurant"),
+        "active": True,
+    }
+
+
+# === WORKDAY (já vem tratado no scraper) =============================
+def _normalize_workday(raw: Dict[str, Any], default_company: str) -> Dict[str, Any] | None:
+    title = _basic_clean(raw.get("title"))
+    url = _basic_clean(raw.get("url"))
+    if not title or not url:
+        return None
+    city = _basic_clean(raw.get("city"))
+    state = _basic_clean(raw.get("state"))
+    country = _basic_clean(raw.get("country"))
+    if not (city or state or country):
+        # tenta extrair de um location cru, se existir
+        loc = _basic_clean(raw.get("location"))
+        if loc:
             city, state, country = extract_city_state_country(loc)
+    return {
+        "source": "workday",
+        "url": url,
+        "title": title,
+        "company": _basic_clean(raw.get("company") or default_company),
+        "description": _basic_clean(raw.get("description")),
+        "city": city,
+        "state": state,
+        "country": country,
+        "salary": _basic_clean(raw.get("salary")),
+        "category": _basic_clean(raw.get("category") or "other"),
+        "active": True,
+    }
 
-        company = _basic_clean(raw.get("company") or default_company)
-
-        return {
-            "source": "greenhouse",
-            "url": url,
-            "title": title,
-            "company": company,
-            "description": _basic_clean(raw.get("content") or raw.get("description")),
-            "city": city,
-            "state": state,
-            "country": country,
-            "salary": "",
-            "category": _basic_clean(raw.get("department") or raw.get("category") or "other"),
-            "priority": 50,
-            "active": True,
-        }
-
-    # === MCHIRE (HTML/links) =============================================
-    if st == "mchire":
-        title = _basic_clean(raw.get("title") or "McDonald's Job")
-        url = _basic_clean(raw.get("url"))
-        if not url:
-            return None
-        return {
-            "source": "mchire",
-            "url": url,
-            "title": title,
-            "company": _basic_clean(raw.get("company") or default_company or "McDonald's"),
-            "description": _basic_clean(raw.get("description")),
-            "city": _basic_clean(raw.get("city")),
-            "state": _basic_clean(raw.get("state")),
-            "country": _basic_clean(raw.get("country") or "US"),
-            "salary": _basic_clean(raw.get("salary")),
-            "category": _basic_clean(raw.get("category") or "restaurant"),
-            "priority": 5090,
-            "active": True,
-        }
-
-    # === WORKDAY (já vem tratado no scraper) =============================
-    if st == "workday":
-        title = _basic_clean(raw.get("title"))
-        url = _basic_clean(raw.get("url"))
-        if not title or not url:
-            return None
-        city = _basic_clean(raw.get("city"))
-        state = _basic_clean(raw.get("state"))
-        country = _basic_clean(raw.get("country"))
-        if not (city or state or country):
-            # tenta extrair de um location cru, se existir
-            loc = _basic_clean(raw.get("location"))
-            if loc:
-                city, state, country = extract_city_state_country(loc)
-        return {
-            "source": "workday",
-            "url": url,
-            "title": title,
-            "company": _basic_clean(raw.get("company") or default_company),
-            "description": _basic_clean(raw.get("description")),
-            "city": city,
-            "state": state,
-            "country": country,
-            "salary": _basic_clean(raw.get("salary")),
-            "category": _basic_clean(raw.get("category") or "other"),
-            "priority": 40,
-            "active": True,
-        }
-
-    # === fallback genérico ===============================================
+
+# === fallback genérico ===============================================
+def _normalize_generic(raw: Dict[str, Any], default_company: str, source: str) -> Dict[str, Any] | None:
     title = _basic_clean(raw.get("title"))
     url = _basic_clean(raw.get("url"))
     if not title or not url:
@@ -155,7 +155,7 @@ def normalize_job(
     loc = _basic_clean(raw.get("location") or "")
     city, state, country = extract_city_state_country(loc) if loc else ("", "", "")
     return {
-        "source": st or "unknown",
+        "source": source or "unknown",
         "url": url,
         "title": title,
         "company": _basic_clean(raw.get("company") or default_company),
@@ -165,13 +165,115 @@ def normalize_job(
         "country": country,
         "salary": _basic_clean(raw.get("salary")),
         "category": _basic_clean(raw.get("category") or "other"),
-        "priority": 10,
         "active": True,
     }
 
 
-# normalize.py
-from typing import Dict, Any
+HANDLERS: Dict[str, Handler] = {
+    "adzuna": _normalize_adzuna,
+    "greenhouse": _normalize_greenhouse,
+    "mchire": _normalize_mchire,
+    "workday": _normalize_workday,
+}
+
+
+def get_handler(source_type: str | None) -> Handler:
+    """Handler do tipo de fonte (resolvido uma vez por lote); tipos desconhecidos usam o genérico."""
+    st = (source_type or "").lower()
+    handler = HANDLERS.get(st)
+    if handler is not None:
+        return handler
+    return lambda raw, default_company: _normalize_generic(raw, default_company, st)
+
+
+def _score(job: Dict[str, Any]) -> Dict[str, Any]:
+    job["priority"] = compute_priority(job.get("title"), job.get("company"), job.get("source"))
+    return job
+
+
+def normalize_job(
+    raw: Dict[str, Any],
+    *,
+    source_type: str | None = None,
+    default_company: str = "",
+) -> Dict[str, Any] | None:
+    """
+    Converte o dict 'raw' de cada scraper para um formato unificado:
+    {
+      source, url, title, company, description,
+      city, state, country, salary, category, priority, active
+    }
+    """
+    job = get_handler(source_type)(raw, default_company)
+    return _score(job) if job else None
+
+
+# chaves brutas que podem trazer a localização original (fallback do filtro EUA)
+FALLBACK_LOC_KEYS = ("location", "locations", "city", "state", "country")
+
+
+def _fallback_loc(raw: Dict[str, Any]) -> str:
+    for k in FALLBACK_LOC_KEYS:
+        v = raw.get(k)
+        if isinstance(v, str) and v.strip():
+            return v
+    return ""
+
+
+def is_us_job(norm: Dict[str, Any], fallback_loc: str = "") -> bool:
+    """
+    Heurística para EUA:
+    - Se country já é US/USA/United States → aprova.
+    - Senão, verifica city/state/strings no fallback.
+    """
+    country = (norm.get("country") or "").replace(".", "").strip().upper()
+    if country in ("US", "USA", "UNITED STATES"):
+        return True
+
+    city = (norm.get("city") or "").strip()
+    state = (norm.get("state") or "").strip()
+    fb = fallback_loc or ", ".join([city, state, country]).strip(", ")
+    return looks_like_us_city_state(city, state, country, fb)
+
+
+def normalize_batch(
+    raws: Iterable[Dict[str, Any]],
+    source_type: str | None,
+    default_company: str = "",
+    *,
+    us_only: bool = True,
+    name: str = "",
+) -> Iterator[Dict[str, Any]]:
+    """
+    Normaliza + filtra EUA + aplica defaults numa única passada, gerando vagas
+    prontas para upsert_jobs (campos de JOB_COLUMNS, com content_hash).
+
+    O handler da fonte é resolvido uma vez para o lote todo, e o dict criado pelo
+    handler é o mesmo que sai no final (defaults aplicados no próprio dict).
+    Itens com erro são logados e pulados.
+    """
+    handler = get_handler(source_type)
+    label = name or source_type or "normalize"
+    for raw in raws:
+        try:
+            job = handler(raw, default_company)
+            if not job or not job.get("url") or not job.get("title"):
+                # url e title são obrigatórios
+                continue
+            if us_only and not is_us_job(job, fallback_loc=_fallback_loc(raw)):
+                continue
+            _fill_defaults(_score(job))
+        except Exception as e:
+            print(f"[{label}] erro ao normalizar item: {e}")
+            continue
+        yield job
+
+
+# campos que definem o "conteúdo" da vaga (mudou algum => a vaga mudou)
+HASH_FIELDS = (
+    "title", "company", "description", "city", "state", "country",
+    "salary", "category", "priority", "source",
+)
 
 DEFAULTS: Dict[str, Any] = {
     "description": "Candidate-se para saber mais detalhes.",
@@ -181,15 +283,35 @@ DEFAULTS: Dict[str, Any] = {
     "state": "Não informado",
     "country": "USA",
     "category": "other",
-    "priority": 10,
+    "priority": DEFAULT_PRIORITY,
     "active": True,
     "source": "unknown",
 }
 
-def apply_defaults(job: Dict[str, Any]) -> Dict[str, Any]:
-    """Preenche campos vazios com valores padrão (sem inventar url/title)."""
-    j = dict(job)
+def _fill_defaults(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Versão in-place de apply_defaults (o dict já é nosso: veio do handler)."""
     for k, v in DEFAULTS.items():
-        if j.get(k) is None or (isinstance(j.get(k), str) and j.get(k).strip() == ""):
-            j[k] = v
-    return j
+        cur = job.get(k)
+        if cur is None or (isinstance(cur, str) and cur.strip() == ""):
+            job[k] = v
+    # gravado em maiúsculas (o banco filtra por country = ?, sem UPPER)
+    job["country"] = job["country"].strip().upper()
+    if job["country"] in ("US", "USA", "UNITED STATES"):
+        # estados dos EUA como sigla ("Florida" -> "FL"): /jobs?state= usa um índice só
+        job["state"] = state_name_to_abbr(job["state"].strip()) or job["state"]
+    # coordenadas da cidade (gazetteer offline) para /jobs/near; fora do content_hash
+    # porque derivam de city/state/country
+    job["lat"], job["lon"] = geocode(job["city"], job["state"], job["country"]) or (None, None)
+    job["content_hash"] = compute_content_hash(job)
+    return job
+
+
+def apply_defaults(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Preenche campos vazios com valores padrão (sem inventar url/title) e calcula content_hash."""
+    return _fill_defaults(dict(job))
+
+
+def compute_content_hash(job: Dict[str, Any]) -> str:
+    """Hash estável dos campos de conteúdo; usado pelo upsert para pular vagas sem mudança."""
+    payload = json.dumps([job.get(k) for k in HASH_FIELDS], ensure_ascii=False, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
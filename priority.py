@@ -1,4 +1,26 @@
 # priority.py
+"""
+Pontuação (priority) das vagas: uma tabela de regras compilada uma vez.
+
+- SOURCE_BASE: pontuação base por tipo de fonte (o `source` gravado pelo
+  normalize: mchire, ihg, adzuna...). Fontes fora da tabela usam DEFAULT_PRIORITY.
+- RULES: (campo, termos, pontuação). Um termo casa como substring (minúsculas)
+  de title ou company.
+- priority = max(base da fonte, maior regra que casou).
+
+Os termos de cada faixa (mesma pontuação e campo) viram uma única regex, e as
+faixas são testadas da maior pontuação para a menor, parando na primeira que
+casa ou quando não dá mais para passar da base da fonte: uma busca por faixa,
+em vez de um `in` por termo.
+
+Mudou a tabela? `python priority.py rescore` recalcula a tabela jobs inteira
+num único UPDATE.
+"""
+from __future__ import annotations
+
+import re
+import sys
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
 
 # termos que queremos jogar pra cima
 EB3_KEYWORDS = [
@@ -19,25 +41,110 @@ EB3_KEYWORDS = [
     "fast food",
 ]
 
+Rule = Tuple[str, Sequence[str], int]  # (campo: "title" | "company", termos, pontuação)
+
+RULES: List[Rule] = [
+    # McDonald's sempre no topo
+    ("company", ["mcdonald"], 5090),
+    # hotelaria
+    ("company", ["hotel", "resort", "marriott", "hilton", "ihg"], 4000),
+    # palavras EB-3 clássicas
+    ("title", EB3_KEYWORDS, 3500),
+    # food / catering
+    ("title", ["food", "kitchen"], 3000),
+]
+
+DEFAULT_PRIORITY = 10
+
+# antes espalhadas pelos handlers do normalize e pelos scrapers
+SOURCE_BASE: Dict[str, int] = {
+    "mchire": 5090,
+    "ihg": 4000,
+    "hilton-html": 4000,
+    "walmart": 2000,
+    "icims": 1500,
+    "greenhouse": 50,
+    "workday": 40,
+    "jobbank_gc_ca": 30,
+    "adzuna": 20,
+}
+
+FIELDS = ("title", "company")
+
+
+class PriorityEngine:
+    """Tabela de regras compilada: score(title, company, source) -> priority."""
+
+    def __init__(self, rules: Iterable[Rule], source_base: Dict[str, int], default: int = DEFAULT_PRIORITY):
+        self.source_base = {k.lower(): v for k, v in source_base.items()}
+        self.default = default
+        # (pontuação, campo) -> termos; regras com a mesma pontuação e campo viram uma regex só
+        tiers: Dict[Tuple[int, str], List[str]] = {}
+        for field, terms, score in rules:
+            if field not in FIELDS:
+                raise ValueError(f"campo de regra desconhecido: {field!r}")
+            tiers.setdefault((score, field), []).extend(t.lower() for t in terms)
+        self._tiers: List[Tuple[int, str, re.Pattern]] = [
+            (score, field, re.compile("|".join(map(re.escape, sorted(set(terms), key=len, reverse=True)))))
+            for (score, field), terms in sorted(tiers.items(), key=lambda kv: kv[0][0], reverse=True)
+            if terms
+        ]
+
+    def score(self, title: Optional[str], company: Optional[str], source: Optional[str]) -> int:
+        best = self.source_base.get((source or "").lower(), self.default)
+        texts = {"title": (title or "").lower(), "company": (company or "").lower()}
+        # da maior pontuação para a menor: a primeira faixa que casa é o máximo
+        for score, field, pattern in self._tiers:
+            if score <= best:
+                break
+            if pattern.search(texts[field]):
+                return score
+        return best
+
+
+ENGINE = PriorityEngine(RULES, SOURCE_BASE)
+
+
 def compute_priority(title: str, company: str, source: str) -> int:
-    t = (title or "").lower()
-    c = (company or "").lower()
-    s = (source or "").lower()
+    return ENGINE.score(title, company, source)
+
+
+def rescore(engine: PriorityEngine = ENGINE) -> int:
+    """
+    Recalcula priority (e content_hash, que inclui priority) de todas as vagas
+    num único UPDATE set-based. Retorna quantas linhas mudaram.
+    """
+    from db import bump_data_version, write_conn
+    from normalize import HASH_FIELDS, compute_content_hash
 
-    # 1) McDonald's / mchire sempre no topo
-    if "mcdonald" in c or s == "mchire":
-        return 5090
+    def content_hash(*values):
+        return compute_content_hash(dict(zip(HASH_FIELDS, values)))
 
-    # 2) hotelaria
-    if "hotel" in c or "resort" in c or "marriott" in c or "hilton" in c or "ihg" in c:
-        return 4000
+    # a priority nova entra no hash no lugar da antiga
+    hash_args = ", ".join("p.new_priority" if f == "priority" else f"jobs.{f}" for f in HASH_FIELDS)
+    with write_conn() as conn:
+        conn.create_function("jobbot_priority", 3, engine.score, deterministic=True)
+        conn.create_function("jobbot_content_hash", len(HASH_FIELDS), content_hash, deterministic=True)
+        with conn:
+            cur = conn.execute(f"""
+                UPDATE jobs
+                SET priority = p.new_priority,
+                    content_hash = jobbot_content_hash({hash_args})
+                FROM (
+                    SELECT id, jobbot_priority(title, company, source) AS new_priority FROM jobs
+                ) AS p
+                WHERE jobs.id = p.id AND jobs.priority IS NOT p.new_priority
+            """)
+            changed = cur.rowcount
+    if changed:
+        bump_data_version()
+    return changed
 
-    # 3) palavras EB-3 clássicas
-    if any(k in t for k in EB3_KEYWORDS):
-        return 3500
 
-    # 4) food / catering
-    if "food" in t or "kitchen" in t:
-        return 3000
+if __name__ == "__main__":
+    if sys.argv[1:] != ["rescore"]:
+        sys.exit("uso: python priority.py rescore")
+    from db import init_db
 
-    return 10
+    init_db()
+    print(f"🎯 priority recalculada: {rescore()} vagas alteradas")
@@ -1,19 +1,168 @@
 # scrapers/adzuna.py
 from __future__ import annotations
+import json
+import math
 import os
-import time
-from typing import List, Dict, Any, Iterable
-import requests
+import threading
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import List, Dict, Any, Iterable, Iterator, Optional
 
+from scrapers import http_client
+from utils.ratelimit import TokenBucket
+from utils.state import load_state, update_state
 
-ADZUNA_BASE = "https://api.adzuna.com/v1/api/jobs/us/search/{page}"
+
+# ADZUNA_BASE_URL permite apontar para um servidor fake local (testes)
+ADZUNA_BASE = os.getenv("ADZUNA_BASE_URL", "https://api.adzuna.com/v1/api/jobs/us/search/{page}")
 UA = "Mozilla/5.0 (JobBot Adzuna Collector)"
 
+# Cotas do plano (padrão Adzuna: 25 req/minuto, 250 req/dia) e quantas execuções por dia dividem a cota diária
+ADZUNA_PER_MINUTE = int(os.getenv("ADZUNA_PER_MINUTE", "25"))
+ADZUNA_PER_DAY = int(os.getenv("ADZUNA_PER_DAY", "250"))
+ADZUNA_RUNS_PER_DAY = int(os.getenv("ADZUNA_RUNS_PER_DAY", "1"))
+# termos consultados ao mesmo tempo dentro de um fetch_adzuna_bulk
+ADZUNA_CONCURRENCY = int(os.getenv("ADZUNA_CONCURRENCY", "4"))
+
+QUOTA_STATE = "adzuna_quota"
+REPORT_DIR = Path("logs")
+
 
 def _env_keys() -> tuple[str | None, str | None]:
     return os.getenv("ADZUNA_APP_ID"), os.getenv("ADZUNA_APP_KEY")
 
 
+class AdzunaQuota:
+    """
+    Cota do Adzuna da execução atual, compartilhada por todas as buscas do processo.
+
+    - Token bucket garante no máximo `per_minute` requisições em qualquer minuto.
+    - Orçamento da execução = cota que resta hoje / execuções que ainda faltam hoje,
+      então o que uma execução não usa fica para as seguintes.
+    - Termos cortados por falta de cota vão primeiro na próxima execução.
+    - Uso persistido em .jobbot_state/adzuna_quota.json.
+    """
+
+    def __init__(self, per_minute: int, per_day: int, runs_per_day: int):
+        self.per_minute = per_minute
+        self.per_day = per_day
+        self.bucket = TokenBucket.per_window(per_minute, 60.0)
+        self.day = date.today().isoformat()
+        self.started_at = datetime.now()
+
+        state = load_state(QUOTA_STATE)
+        today = (state.get("days") or {}).get(self.day) or {}
+        self.used_before = int(today.get("used", 0))
+        self.runs_before = int(today.get("runs", 0))
+        runs_left = max(1, runs_per_day - self.runs_before)
+        self.budget = max(0, (per_day - self.used_before) // runs_left)
+        self.starved_last_run: List[str] = list(state.get("starved_terms") or [])
+
+        self.used = 0
+        self.per_term: Dict[str, int] = {}
+        # requisições evitadas: páginas além do `count` e paginação encerrada por ids repetidos
+        self.saved: Dict[str, int] = {"count": 0, "overlap": 0}
+        self.starved: set[str] = set()
+        self._lock = threading.Lock()
+
+    def order_terms(self, terms: List[str]) -> List[str]:
+        """Termos que ficaram sem cota na execução anterior vêm primeiro."""
+        starved = set(self.starved_last_run)
+        return [t for t in terms if t in starved] + [t for t in terms if t not in starved]
+
+    def acquire(self, term: str) -> bool:
+        """Reserva uma requisição (espera o token bucket). False se o orçamento acabou."""
+        with self._lock:
+            if self.used >= self.budget:
+                self.starved.add(term)
+                return False
+            self.used += 1
+            self.per_term[term] = self.per_term.get(term, 0) + 1
+        self.bucket.acquire()
+        return True
+
+    def note_saved(self, reason: str, n: int) -> None:
+        if n > 0:
+            with self._lock:
+                self.saved[reason] = self.saved.get(reason, 0) + n
+
+    def flush(self) -> None:
+        """Grava o uso de hoje (idempotente: pode ser chamado várias vezes na execução)."""
+        def mutate(state: Dict[str, Any]) -> None:
+            days = state.setdefault("days", {})
+            days[self.day] = {"used": self.used_before + self.used, "runs": self.runs_before + 1}
+            cutoff = (date.today() - timedelta(days=7)).isoformat()
+            for d in [d for d in days if d < cutoff]:
+                del days[d]
+            state["starved_terms"] = sorted(self.starved)
+        update_state(QUOTA_STATE, mutate)
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "started_at": self.started_at.isoformat(timespec="seconds"),
+            "finished_at": datetime.now().isoformat(timespec="seconds"),
+            "per_minute_limit": self.per_minute,
+            "per_day_limit": self.per_day,
+            "used_today_before_run": self.used_before,
+            "run_budget": self.budget,
+            "run_used": self.used,
+            "used_today": self.used_before + self.used,
+            "requests_per_term": dict(sorted(self.per_term.items())),
+            "requests_saved": dict(self.saved),
+            "starved_terms": sorted(self.starved),
+        }
+
+
+_quota: Optional[AdzunaQuota] = None
+_quota_lock = threading.Lock()
+
+
+def get_quota() -> AdzunaQuota:
+    global _quota
+    if _quota is None:
+        with _quota_lock:
+            if _quota is None:
+                _quota = AdzunaQuota(ADZUNA_PER_MINUTE, ADZUNA_PER_DAY, ADZUNA_RUNS_PER_DAY)
+    return _quota
+
+
+def write_quota_report() -> Optional[Path]:
+    """Grava logs/adzuna_quota_<data>.json com o uso de cota desta execução."""
+    if _quota is None:
+        return None
+    _quota.flush()
+    report = _quota.report()
+    REPORT_DIR.mkdir(parents=True, exist_ok=True)
+    path = REPORT_DIR / f"adzuna_quota_{_quota.started_at:%Y-%m-%d_%H-%M-%S}.json"
+    path.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(
+        f"📊 Adzuna: {report['run_used']}/{report['run_budget']} req nesta execução, "
+        f"{report['used_today']}/{report['per_day_limit']} hoje; sem cota: {len(report['starved_terms'])} termos; "
+        f"economizadas: {report['requests_saved']['count']} (count) + {report['requests_saved']['overlap']} (repetidas)"
+    )
+    return path
+
+
+def _result_id(r: Dict[str, Any]) -> Any:
+    return r.get("id") or r.get("adref") or r.get("redirect_url")
+
+
+class SeenIds:
+    """Conjunto thread-safe de ids já vistos, compartilhado entre termos de uma mesma coleta."""
+
+    def __init__(self) -> None:
+        self._ids: set[Any] = set()
+        self._lock = threading.Lock()
+
+    def add_all(self, results: Iterable[Dict[str, Any]]) -> int:
+        """Registra os ids e retorna quantos eram novos."""
+        ids = [_result_id(r) for r in results]
+        with self._lock:
+            before = len(self._ids)
+            self._ids.update(ids)
+            return len(self._ids) - before
+
+
 def _request(
     page: int,
     *,
@@ -21,8 +170,6 @@ def _request(
     where: str | None = None,
     results_per_page: int = 50,
     max_days_old: int = 60,
-    retries: int = 2,
-    backoff_sec: float = 0.8,
 ) -> Dict[str, Any] | None:
     app_id, app_key = _env_keys()
     if not app_id or not app_key:
@@ -41,17 +188,14 @@ def _request(
     if where:
         params["where"] = where
 
-    for attempt in range(retries + 1):
-        try:
-            resp = requests.get(url, params=params, timeout=25, headers={"User-Agent": UA})
-            resp.raise_for_status()
-            return resp.json()
-        except Exception as e:
-            if attempt >= retries:
-                print(f"[adzuna] erro final na page {page} ({what=}): {e}")
-                return None
-            time.sleep(backoff_sec * (attempt + 1))
-    return None
+    # retry/backoff ficam no http_client (429/5xx, respeitando Retry-After)
+    try:
+        resp = http_client.get(url, params=params, timeout=25, headers={"User-Agent": UA})
+        resp.raise_for_status()
+        return resp.json()
+    except Exception as e:
+        print(f"[adzuna] erro final na page {page} ({what=}): {e}")
+        return None
 
 
 def fetch_adzuna(
@@ -61,37 +205,91 @@ def fetch_adzuna(
     pages: int = 4,
     results_per_page: int = 50,
     max_days_old: int = 60,
+    seen: Optional[SeenIds] = None,
 ) -> List[Dict[str, Any]]:
     """
     Busca direta no mercado US do Adzuna.
     Retorna lista 'raw' no formato da API do Adzuna.
+    Cada página consome uma requisição da cota (get_quota); sem cota, para.
+    Paginação encerra cedo quando:
+    - o `count` da página 1 indica que não há mais páginas;
+    - uma página só traz ids já vistos (`seen`, compartilhado entre termos no bulk).
     """
+    if not all(_env_keys()):
+        print("[adzuna] faltando ADZUNA_APP_ID/ADZUNA_APP_KEY no ambiente")
+        return []
+
+    quota = get_quota()
+    seen = seen if seen is not None else SeenIds()
+    per_page = min(max(results_per_page, 1), 50)
+    last = max(1, pages)
     out: List[Dict[str, Any]] = []
-    for p in range(1, max(1, pages) + 1):
+    p = 1
+    while p <= last:
+        if not quota.acquire(what):
+            break
         data = _request(
             p,
             what=what,
             where=where,
-            results_per_page=results_per_page,
+            results_per_page=per_page,
             max_days_old=max_days_old,
         )
         if not data:
+            p += 1
             continue
         results = data.get("results") or []
+        if p == 1 and data.get("count") is not None:
+            needed = max(1, math.ceil(int(data["count"]) / per_page))
+            if needed < last:
+                quota.note_saved("count", last - needed)
+                last = needed
         out.extend(results)
+        if results and seen.add_all(results) == 0:
+            # página inteira repetida: o restante do termo provavelmente também é
+            quota.note_saved("overlap", last - p)
+            break
+        p += 1
     return out
 
 
-def _dedup_by_id(items: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
-    seen: set[Any] = set()
-    out: List[Dict[str, Any]] = []
-    for r in items:
-        rid = r.get("id") or r.get("adref") or r.get("redirect_url")
-        if rid in seen:
-            continue
-        seen.add(rid)
-        out.append(r)
-    return out
+def iter_adzuna_bulk(
+    terms: List[str],
+    *,
+    where: str | None = None,
+    pages: int = 4,
+    results_per_page: int = 50,
+    max_days_old: int = 60,
+    concurrency: int = ADZUNA_CONCURRENCY,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Executa várias consultas (what) em paralelo, limitadas pela cota do Adzuna,
+    e gera os resultados deduplicados por id conforme cada termo termina.
+    Os termos compartilham o conjunto de ids vistos, então termos sobrepostos
+    ("cook", "line cook") param de paginar quando só encontram repetidos.
+    """
+    quota = get_quota()
+    ordered = quota.order_terms(terms)
+    seen = SeenIds()
+    emitted: set[Any] = set()
+    fetch = lambda t: fetch_adzuna(
+        what=t,
+        where=where,
+        pages=pages,
+        results_per_page=results_per_page,
+        max_days_old=max_days_old,
+        seen=seen,
+    )
+    try:
+        for _term, results in http_client.map_in_flight(fetch, ordered, max_in_flight=concurrency):
+            for r in results:
+                rid = _result_id(r)
+                if rid in emitted:
+                    continue
+                emitted.add(rid)
+                yield r
+    finally:
+        quota.flush()
 
 
 def fetch_adzuna_bulk(
@@ -101,21 +299,14 @@ def fetch_adzuna_bulk(
     pages: int = 4,
     results_per_page: int = 50,
     max_days_old: int = 60,
-    jitter_sec: float = 0.2,
+    concurrency: int = ADZUNA_CONCURRENCY,
 ) -> List[Dict[str, Any]]:
-    """
-    Executa várias consultas (what) e consolida + deduplica.
-    """
-    acc: List[Dict[str, Any]] = []
-    for t in terms:
-        chunk = fetch_adzuna(
-            what=t,
-            where=where,
-            pages=pages,
-            results_per_page=results_per_page,
-            max_days_old=max_days_old,
-        )
-        acc.extend(chunk)
-        if jitter_sec:
-            time.sleep(jitter_sec)
-    return _dedup_by_id(acc)
+    """Lista consolidada e deduplicada de iter_adzuna_bulk."""
+    return list(iter_adzuna_bulk(
+        terms,
+        where=where,
+        pages=pages,
+        results_per_page=results_per_page,
+        max_days_old=max_days_old,
+        concurrency=concurrency,
+    ))
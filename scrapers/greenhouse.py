@@ -1,11 +1,11 @@
 # scrapers/greenhouse.py
-import requests
+from scrapers import http_client
 
 
 def fetch_greenhouse(slug: str, company: str | None = None):
     url = f"https://boards-api.greenhouse.io/v1/boards/{slug}/jobs"
     try:
-        resp = requests.get(url, timeout=15)
+        resp = http_client.get(url, timeout=15)
         resp.raise_for_status()
     except Exception as e:
         print(f"[greenhouse] erro ao buscar {slug}: {e}")
@@ -36,7 +36,6 @@ def fetch_greenhouse(slug: str, company: str | None = None):
             "salary": "",
             "url": apply_url,
             "category": "other",
-            "priority": 10,
             "active": True,
         })
     return out
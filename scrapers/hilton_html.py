@@ -1,17 +1,21 @@
 # scrapers/hilton_html.py
-import requests
-from bs4 import BeautifulSoup
+from scrapers.http_cache import fetch_cached
+from scrapers.parsing import make_soup
+
+# mude quando o parse mudar: invalida o resultado parseado guardado no cache HTTP
+PARSE_VERSION = 1
 
 
 def fetch_hilton_html(url: str):
     try:
-        resp = requests.get(url, timeout=15, headers={"User-Agent": "Mozilla/5.0"})
-        resp.raise_for_status()
+        return fetch_cached(url, lambda html: _parse_hilton(html, url), parser=f"{__name__}:{PARSE_VERSION}", headers={"User-Agent": "Mozilla/5.0"}, timeout=15)
     except Exception as e:
         print(f"[hilton] erro ao buscar {url}: {e}")
         return []
 
-    soup = BeautifulSoup(resp.text, "html.parser")
+
+def _parse_hilton(html: str, url: str):
+    soup = make_soup(html)
     title_el = soup.find("h1") or soup.find("h2")
     title = title_el.get_text(strip=True) if title_el else "Hilton Job"
 
@@ -38,7 +42,6 @@ def fetch_hilton_html(url: str):
             "salary": "",
             "url": url,
             "category": "hotel",
-            "priority": 4000,
             "active": True,
         }
     ]
@@ -0,0 +1,194 @@
+# scrapers/http_cache.py
+"""
+Cache HTTP em disco para páginas de detalhe (IHG, Hilton, Walmart, iCIMS, Wendy's).
+
+- SQLite em JOBBOT_STATE_DIR/http_cache.sqlite3, chave = URL.
+- Guarda ETag/Last-Modified, hash do corpo e o resultado JÁ PARSEADO (JSON),
+  junto com a identificação do parser (`parser`, ex.: "scrapers.ihg:2").
+- Próxima execução manda If-None-Match/If-Modified-Since: 304 devolve o parse salvo;
+  200 com o mesmo hash de corpo também (não re-parseia).
+- Entrada gravada por outro parser (o scraper subiu o PARSE_VERSION) é ignorada:
+  GET completo e parse de novo.
+- Entradas mais velhas que o TTL são ignoradas e removidas; acima de
+  JOBBOT_HTTP_CACHE_MAX_MB as menos acessadas recentemente saem primeiro (LRU).
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+from scrapers import http_client
+from utils.state import STATE_DIR
+
+CACHE_PATH = Path(os.getenv("JOBBOT_HTTP_CACHE", str(STATE_DIR / "http_cache.sqlite3")))
+CACHE_TTL_SEC = float(os.getenv("JOBBOT_HTTP_CACHE_TTL", str(7 * 24 * 3600)))
+CACHE_MAX_BYTES = int(float(os.getenv("JOBBOT_HTTP_CACHE_MAX_MB", "50")) * 1024 * 1024)
+EVICT_EVERY = 200  # escritas entre duas passadas de limpeza
+
+DDL = """
+CREATE TABLE IF NOT EXISTS http_cache (
+    url TEXT PRIMARY KEY,
+    etag TEXT,
+    last_modified TEXT,
+    body_hash TEXT NOT NULL,
+    parsed TEXT NOT NULL,
+    parser TEXT,
+    fetched_at REAL NOT NULL,
+    last_access REAL NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_http_cache_last_access ON http_cache(last_access);
+"""
+
+_conn: Optional[sqlite3.Connection] = None
+_lock = threading.Lock()
+_writes = 0
+_stats: Dict[str, int] = {"not_modified": 0, "same_body": 0, "parsed": 0}
+
+
+def _db() -> sqlite3.Connection:
+    """Conexão única do processo (acesso serializado por _lock)."""
+    global _conn
+    if _conn is None:
+        CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(CACHE_PATH), check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL;")
+        conn.execute("PRAGMA synchronous=NORMAL;")
+        conn.executescript(DDL)
+        cols = {row[1] for row in conn.execute("PRAGMA table_info(http_cache);")}
+        if "parser" not in cols:
+            # cache de antes da coluna: parser NULL não bate com nenhum, tudo é re-parseado
+            conn.execute("ALTER TABLE http_cache ADD COLUMN parser TEXT;")
+        _conn = conn
+        _evict(conn)
+    return _conn
+
+
+def _evict(conn: sqlite3.Connection) -> None:
+    """Remove entradas vencidas (TTL) e, se passar do limite de tamanho, as menos acessadas."""
+    conn.execute("DELETE FROM http_cache WHERE fetched_at < ?", (time.time() - CACHE_TTL_SEC,))
+    total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM http_cache").fetchone()[0]
+    if total > CACHE_MAX_BYTES:
+        # libera até 90% do limite para não limpar a cada escrita
+        excess = total - int(CACHE_MAX_BYTES * 0.9)
+        cur = conn.execute("SELECT url, size FROM http_cache ORDER BY last_access")
+        victims = []
+        for url, size in cur:
+            victims.append((url,))
+            excess -= size
+            if excess <= 0:
+                break
+        conn.executemany("DELETE FROM http_cache WHERE url = ?", victims)
+    conn.commit()
+
+
+def _lookup(url: str, parser: str, ttl: float) -> Optional[tuple]:
+    with _lock:
+        conn = _db()
+        row = conn.execute(
+            "SELECT etag, last_modified, body_hash, parsed, fetched_at, parser FROM http_cache WHERE url = ?",
+            (url,),
+        ).fetchone()
+    if row and (time.time() - row[4] > ttl or row[5] != parser):
+        return None
+    return row
+
+
+def _touch(url: str) -> None:
+    """Revalidada com 304: conta como buscada agora (reinicia o TTL)."""
+    now = time.time()
+    with _lock:
+        conn = _db()
+        conn.execute("UPDATE http_cache SET fetched_at = ?, last_access = ? WHERE url = ?", (now, now, url))
+        conn.commit()
+
+
+def _store(
+    url: str, parser: str, etag: Optional[str], last_modified: Optional[str], body_hash: str, parsed: str
+) -> None:
+    global _writes
+    now = time.time()
+    with _lock:
+        conn = _db()
+        conn.execute(
+            """
+            INSERT INTO http_cache (url, etag, last_modified, body_hash, parsed, parser, fetched_at, last_access, size)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(url) DO UPDATE SET
+                etag = excluded.etag,
+                last_modified = excluded.last_modified,
+                body_hash = excluded.body_hash,
+                parsed = excluded.parsed,
+                parser = excluded.parser,
+                fetched_at = excluded.fetched_at,
+                last_access = excluded.last_access,
+                size = excluded.size
+            """,
+            (url, etag, last_modified, body_hash, parsed, parser, now, now, len(url) + len(parsed)),
+        )
+        conn.commit()
+        _writes += 1
+        if _writes % EVICT_EVERY == 0:
+            _evict(conn)
+
+
+def _count(key: str) -> None:
+    with _lock:
+        _stats[key] += 1
+
+
+def fetch_cached(
+    url: str,
+    parse: Callable[[str], Any],
+    *,
+    parser: str,
+    headers: Optional[Dict[str, str]] = None,
+    timeout: float = http_client.DEFAULT_TIMEOUT,
+    ttl: float = CACHE_TTL_SEC,
+) -> Any:
+    """
+    GET condicional de `url`, devolvendo parse(html).
+    O resultado de parse precisa ser serializável em JSON (é o que fica no cache).
+    parser identifica o parse (ex.: f"{__name__}:{PARSE_VERSION}"); o resultado
+    guardado só é reaproveitado se o parser for o mesmo.
+    Erros HTTP/de rede são propagados (raise_for_status), como num GET normal.
+    """
+    cached = _lookup(url, parser, ttl)
+    req_headers = dict(headers or {})
+    if cached:
+        if cached[0]:
+            req_headers["If-None-Match"] = cached[0]
+        if cached[1]:
+            req_headers["If-Modified-Since"] = cached[1]
+
+    resp = http_client.get(url, timeout=timeout, headers=req_headers)
+    if cached and resp.status_code == 304:
+        _touch(url)
+        _count("not_modified")
+        return json.loads(cached[3])
+    resp.raise_for_status()
+
+    body_hash = hashlib.sha1(resp.content).hexdigest()
+    etag = resp.headers.get("ETag")
+    last_modified = resp.headers.get("Last-Modified")
+    if cached and cached[2] == body_hash:
+        # corpo idêntico: só atualiza validadores/datas, sem re-parsear
+        _store(url, parser, etag, last_modified, body_hash, cached[3])
+        _count("same_body")
+        return json.loads(cached[3])
+
+    result = parse(resp.text)
+    _store(url, parser, etag, last_modified, body_hash, json.dumps(result, ensure_ascii=False))
+    _count("parsed")
+    return result
+
+
+def cache_stats() -> Dict[str, int]:
+    """Contadores desta execução: 304, corpo igual (parse evitado) e páginas parseadas."""
+    return dict(_stats)
@@ -0,0 +1,111 @@
+# scrapers/http_client.py
+"""
+Cliente HTTP compartilhado pelos scrapers.
+
+- Uma única requests.Session (keep-alive: conexões TCP/TLS reaproveitadas).
+- Pool por host limitado a PER_HOST_CONNECTIONS (pool_block=True: acima disso a
+  requisição espera uma conexão livre, em vez de abrir outra).
+- Retry/backoff unificado (mesma política que o scraper do Wendy's usava),
+  respeitando Retry-After em 429/503.
+- map_in_flight(): várias requisições em andamento ao mesmo tempo (paginação),
+  com janela limitada (backpressure para quem consome em streaming).
+"""
+from __future__ import annotations
+
+import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Tuple, TypeVar
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+PER_HOST_CONNECTIONS = int(os.getenv("JOBBOT_HTTP_PER_HOST", "4"))
+DEFAULT_TIMEOUT = 25
+USER_AGENT = "Mozilla/5.0 (compatible; JobBot/1.0; +https://jobs-bank)"
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def _retry() -> Retry:
+    return Retry(
+        total=3,
+        backoff_factor=1.0,
+        status_forcelist=(429, 500, 502, 503, 504),
+        # POST entra porque os endpoints de busca (Workday) são consultas idempotentes
+        allowed_methods=frozenset(["GET", "HEAD", "POST"]),
+        respect_retry_after_header=True,
+        raise_on_status=False,  # devolve a última resposta; o chamador decide (raise_for_status)
+    )
+
+
+def get_session() -> requests.Session:
+    """Session compartilhada (criada na primeira chamada)."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    max_retries=_retry(),
+                    pool_connections=32,               # hosts diferentes mantidos no pool
+                    pool_maxsize=PER_HOST_CONNECTIONS,  # conexões simultâneas por host
+                    pool_block=True,
+                )
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                session.headers.update({"User-Agent": USER_AGENT})
+                _session = session
+    return _session
+
+
+def request(method: str, url: str, *, timeout: float = DEFAULT_TIMEOUT, **kwargs: Any) -> requests.Response:
+    return get_session().request(method, url, timeout=timeout, **kwargs)
+
+
+def get(url: str, **kwargs: Any) -> requests.Response:
+    return request("GET", url, **kwargs)
+
+
+def post(url: str, **kwargs: Any) -> requests.Response:
+    return request("POST", url, **kwargs)
+
+
+def map_in_flight(
+    fn: Callable[[T], R],
+    items: Iterable[T],
+    *,
+    max_in_flight: int = PER_HOST_CONNECTIONS,
+) -> Iterator[Tuple[T, R]]:
+    """
+    Executa fn(item) com até max_in_flight chamadas simultâneas e gera
+    (item, resultado) na ordem em que terminam. Exceções de fn são propagadas.
+
+    Os itens são submetidos aos poucos (janela de max_in_flight): se o consumidor
+    demora, novas chamadas esperam, e resultados não se acumulam em memória.
+    """
+    limit = max(1, max_in_flight)
+    pending_items = iter(items)
+    pending: Dict[Future, T] = {}
+
+    with ThreadPoolExecutor(max_workers=limit, thread_name_prefix="http") as pool:
+        def fill() -> None:
+            while len(pending) < limit:
+                try:
+                    item = next(pending_items)
+                except StopIteration:
+                    return
+                pending[pool.submit(fn, item)] = item
+
+        fill()
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            finished = [(pending.pop(fut), fut) for fut in done]
+            fill()
+            for item, fut in finished:
+                yield item, fut.result()
@@ -1,6 +1,9 @@
 # scrapers/ihg.py
-import requests
-from bs4 import BeautifulSoup
+from scrapers.http_cache import fetch_cached
+from scrapers.parsing import make_soup
+
+# mude quando o parse mudar: invalida o resultado parseado guardado no cache HTTP
+PARSE_VERSION = 1
 
 
 def fetch_ihg(url: str):
@@ -13,8 +16,7 @@ def fetch_ihg(url: str):
         "Accept-Language": "en-US,en;q=0.9",
     }
     try:
-        resp = requests.get(url, timeout=20, headers=headers)
-        resp.raise_for_status()
+        return fetch_cached(url, lambda html: _parse_ihg(html, url), parser=f"{__name__}:{PARSE_VERSION}", headers=headers, timeout=20)
     except Exception as e:
         print(f"[ihg] erro ao buscar {url}: {e}")
         # mesmo assim, devolve uma vaga genérica, pra não perder a fonte
@@ -31,12 +33,13 @@ def fetch_ihg(url: str):
                 "salary": "",
                 "url": url,
                 "category": "hotel",
-                "priority": 4000,
                 "active": True,
             }
         ]
 
-    soup = BeautifulSoup(resp.text, "html.parser")
+
+def _parse_ihg(html: str, url: str):
+    soup = make_soup(html)
     title = soup.find("h1")
     job_title = title.get_text(strip=True) if title else "IHG Job"
 
@@ -63,7 +66,6 @@ def fetch_ihg(url: str):
             "salary": "",
             "url": url,
             "category": "hotel",
-            "priority": 4000,
             "active": True,
         }
     ]
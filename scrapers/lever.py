@@ -2,7 +2,7 @@
 from __future__ import annotations
 from typing import Iterable, Optional, Union
 
-import requests
+from scrapers import http_client
 
 
 def _normalize_keywords(values: Optional[Iterable[str]]) -> list[str]:
@@ -30,7 +30,7 @@ def fetch_lever(
     for slug in slugs:
         url = f"https://api.lever.co/v0/postings/{slug}?mode=json"
         try:
-            resp = requests.get(url, timeout=20)
+            resp = http_client.get(url, timeout=20)
             if resp.status_code == 404:
                 print(f"[lever] slug não encontrado: {slug}")
                 continue
@@ -77,7 +77,6 @@ def fetch_lever(
                 "salary": "",
                 "url": hosted,
                 "category": "other",
-                "priority": 10,
                 "active": True,
             })
     return out
@@ -149,12 +149,14 @@
 from __future__ import annotations
 from typing import List, Dict
 import re
-import requests
-from bs4 import BeautifulSoup
+
+from scrapers import http_client
+from scrapers.parsing import anchors, make_soup
 
 HEADERS = {
     "User-Agent": "Mozilla/5.0 (JobBot; +https://example.com/bot)"
 }
+JOB_HREF_RE = re.compile(r"/Job\?job_id=|/jobs/\w", re.I)
 
 def _from_anchor(a) -> Dict:
     href = a.get("href") or ""
@@ -179,26 +181,21 @@ def _from_anchor(a) -> Dict:
         "country": "US",
         "salary": "",
         "category": "restaurant",
-        "priority": 5090,
     }
 
-def _scrape_html(url: str) -> List[Dict]:
-    resp = requests.get(url, timeout=25, headers=HEADERS)
-    resp.raise_for_status()
-    soup = BeautifulSoup(resp.text, "html.parser")
 
+def _jobs_from_html(html: str) -> List[Dict]:
     jobs: List[Dict] = []
 
-    # 1) Links clássicos
-    for a in soup.find_all("a", href=True):
-        href = a["href"]
-        if "Job?job_id=" in href:
-            item = _from_anchor(a)
-            if item:
-                jobs.append(item)
+    # 1) Links clássicos (só as âncoras são montadas)
+    for a in anchors(html, "Job?job_id="):
+        item = _from_anchor(a)
+        if item:
+            jobs.append(item)
 
     # 2) Alguns templates usam /jobs/<slug> com data-attrs. Captura cartões também.
     if not jobs:
+        soup = make_soup(html)
         for card in soup.select("[data-job-id] a[href], a[href*='/jobs/']"):
             item = _from_anchor(card)
             if item:
@@ -206,23 +203,27 @@ def _scrape_html(url: str) -> List[Dict]:
 
     return jobs
 
+
+def _scrape_html(url: str) -> List[Dict]:
+    resp = http_client.get(url, timeout=25, headers=HEADERS)
+    resp.raise_for_status()
+    return _jobs_from_html(resp.text)
+
+
 def _fallback_united_states() -> List[Dict]:
     """
     Fallback para listagem agregada de vagas nos EUA (página de landing que já traz anchors).
     """
     url = "https://jobs.mchire.com/jobs?location_name=United%20States&location_type=4"
     try:
-        resp = requests.get(url, timeout=25, headers=HEADERS)
+        resp = http_client.get(url, timeout=25, headers=HEADERS)
         resp.raise_for_status()
-        soup = BeautifulSoup(resp.text, "html.parser")
         jobs: List[Dict] = []
-        for a in soup.find_all("a", href=True):
-            href = a["href"]
-            # Anchors típicos de detalhe de vaga
-            if re.search(r"/Job\?job_id=|/jobs/\w", href, re.I):
-                item = _from_anchor(a)
-                if item:
-                    jobs.append(item)
+        # Anchors típicos de detalhe de vaga
+        for a in anchors(resp.text, JOB_HREF_RE):
+            item = _from_anchor(a)
+            if item:
+                jobs.append(item)
         return jobs
     except Exception as e:
         print(f"[McHire/fallback US] falhou: {e}")
@@ -0,0 +1,35 @@
+# scrapers/parsing.py
+"""
+Parsing de HTML compartilhado pelos scrapers.
+
+- make_soup(): usa lxml (parser em C) quando instalado; senão cai para o
+  "html.parser" puro Python, sem quebrar nada.
+- anchors(): para páginas de listagem, monta só os <a> de interesse
+  (SoupStrainer), em vez da árvore inteira.
+"""
+from __future__ import annotations
+
+from typing import List, Optional, Pattern, Union
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+try:
+    import lxml  # noqa: F401
+    PARSER = "lxml"
+except ImportError:
+    PARSER = "html.parser"
+
+
+def make_soup(html: str, *, only: Optional[SoupStrainer] = None) -> BeautifulSoup:
+    return BeautifulSoup(html, PARSER, parse_only=only)
+
+
+def anchors(html: str, href: Union[str, Pattern[str]]) -> List:
+    """
+    <a href> na ordem do documento cujo href contém `href` (str) ou casa com
+    a regex (re.search).
+    """
+    if isinstance(href, str):
+        fragment = href
+        href = lambda h: bool(h) and fragment in h  # noqa: E731
+    return make_soup(html, only=SoupStrainer("a", href=href)).find_all("a")
@@ -1,17 +1,21 @@
 # scrapers/walmart.py
-import requests
-from bs4 import BeautifulSoup
+from scrapers.http_cache import fetch_cached
+from scrapers.parsing import make_soup
+
+# mude quando o parse mudar: invalida o resultado parseado guardado no cache HTTP
+PARSE_VERSION = 1
 
 
 def fetch_walmart(url: str):
     try:
-        resp = requests.get(url, timeout=15, headers={"User-Agent": "Mozilla/5.0"})
-        resp.raise_for_status()
+        return fetch_cached(url, lambda html: _parse_walmart(html, url), parser=f"{__name__}:{PARSE_VERSION}", headers={"User-Agent": "Mozilla/5.0"}, timeout=15)
     except Exception as e:
         print(f"[walmart] erro ao buscar {url}: {e}")
         return []
 
-    soup = BeautifulSoup(resp.text, "html.parser")
+
+def _parse_walmart(html: str, url: str):
+    soup = make_soup(html)
     title_el = soup.find("h1")
     title = title_el.get_text(strip=True) if title_el else "Walmart Job"
 
@@ -33,7 +37,6 @@ def fetch_walmart(url: str):
             "salary": "",
             "url": url,
             "category": "retail",
-            "priority": 2000,
             "active": True,
         }
     ]
@@ -3,10 +3,9 @@ import time
 from typing import Optional
 from urllib.parse import urlencode, urljoin, urlparse, urlunparse, parse_qsl
 
-import requests
-from bs4 import BeautifulSoup
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
+from scrapers import http_client
+from scrapers.http_cache import fetch_cached
+from scrapers.parsing import anchors, make_soup
 
 
 BASE_URL = "https://wendys-careers.com"
@@ -14,6 +13,9 @@ JOB_PATH_FRAGMENT = "/job-search/posting/"
 DEFAULT_PAGES = 3
 USER_AGENT = "Mozilla/5.0 (compatible; JobBot/1.0; +https://jobs-bank)"
 ACCEPT_HEADER = "text/html,application/xhtml+xml"
+HEADERS = {"User-Agent": USER_AGENT, "Accept": ACCEPT_HEADER}
+# mude quando o parse mudar: invalida o resultado parseado guardado no cache HTTP
+PARSE_VERSION = 1
 
 
 def _build_page_url(listing_url: str, page: int) -> str:
@@ -27,15 +29,16 @@ def _build_page_url(listing_url: str, page: int) -> str:
     return urlunparse(parsed._replace(query=new_query))
 
 
-def _normalize_job(session: requests.Session, job_url: str) -> Optional[dict]:
+def _normalize_job(job_url: str) -> Optional[dict]:
     try:
-        resp = session.get(job_url, timeout=25)
-        resp.raise_for_status()
+        return fetch_cached(job_url, lambda html: _parse_job(html, job_url), parser=f"{__name__}:{PARSE_VERSION}", headers=HEADERS, timeout=25)
     except Exception as exc:
         print(f"[wendys] erro buscando vaga {job_url}: {exc}")
         return None
 
-    soup = BeautifulSoup(resp.text, "html.parser")
+
+def _parse_job(html: str, job_url: str) -> dict:
+    soup = make_soup(html)
 
     title_el = soup.find("h1") or soup.find("title")
     title = title_el.get_text(strip=True) if title_el else "Wendy's Job"
@@ -63,20 +66,21 @@ def _normalize_job(session: requests.Session, job_url: str) -> Optional[dict]:
     }
 
 
-def _collect_links_from_listing(session: requests.Session, listing_url: str) -> set[str]:
+def _collect_links_from_listing(listing_url: str) -> set[str]:
     try:
-        resp = session.get(listing_url, timeout=25)
+        resp = http_client.get(listing_url, timeout=25, headers=HEADERS)
         resp.raise_for_status()
     except Exception as exc:
         print(f"[wendys] erro listando {listing_url}: {exc}")
         return set()
 
-    soup = BeautifulSoup(resp.text, "html.parser")
+    return _links_from_html(resp.text)
+
+
+def _links_from_html(html: str) -> set[str]:
     links: set[str] = set()
-    for anchor in soup.find_all("a", href=True):
+    for anchor in anchors(html, JOB_PATH_FRAGMENT):
         href = anchor["href"]
-        if JOB_PATH_FRAGMENT not in href:
-            continue
         # evita links para âncoras internas
         if href.startswith("#"):
             continue
@@ -92,20 +96,8 @@ def fetch_wendys(url: str, pages: Optional[int] = None, max_jobs: Optional[int]
     to collect detail pages. If a direct job posting URL is provided, it returns
     that single job.
     """
-    session = requests.Session()
-    retry = Retry(
-        total=3,
-        backoff_factor=1.0,
-        status_forcelist=(429, 500, 502, 503, 504),
-        allowed_methods=frozenset(["GET"]),
-    )
-    adapter = HTTPAdapter(max_retries=retry)
-    session.mount("https://", adapter)
-    session.mount("http://", adapter)
-    session.headers.update({"User-Agent": USER_AGENT, "Accept": ACCEPT_HEADER})
-
     if JOB_PATH_FRAGMENT in url:
-        job = _normalize_job(session, url)
+        job = _normalize_job(url)
         return [job] if job else []
 
     parsed = urlparse(url)
@@ -128,16 +120,16 @@ def fetch_wendys(url: str, pages: Optional[int] = None, max_jobs: Optional[int]
 
     for page in range(1, pages_to_scan + 1):
         page_url = _build_page_url(base_listing_url or url, page)
-        job_links = _collect_links_from_listing(session, page_url)
+        job_links = _collect_links_from_listing(page_url)
         if not job_links and page == 1:
             # se a URL já for uma página específica (ex: ...?spage=3), tenta usar diretamente
-            job_links = _collect_links_from_listing(session, url)
+            job_links = _collect_links_from_listing(url)
 
         for job_url in job_links:
             if job_url in seen_links:
                 continue
             seen_links.add(job_url)
-            job = _normalize_job(session, job_url)
+            job = _normalize_job(job_url)
             if job:
                 jobs.append(job)
                 if max_jobs and len(jobs) >= max_jobs:
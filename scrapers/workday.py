@@ -1,14 +1,31 @@
 # scrapers/workday.py
-import time
+import os
 import random
-import requests
-from typing import List, Dict, Optional
+from typing import Any, Iterator, List, Dict, Optional
+
+from scrapers import http_client
+from utils.state import load_state, update_state
 
 UA_LIST = [
     "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120 Safari/537.36",
     "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120 Safari/537.36",
 ]
 
+# páginas simultâneas por tenant depois que o `total` da primeira página é conhecido
+WORKDAY_CONCURRENCY = int(os.getenv("JOBBOT_WORKDAY_CONCURRENCY", "4"))
+# limite de segurança quando a API não informa `total` (paginação sequencial)
+FALLBACK_MAX_PAGES = 40
+# estado persistente: tenant -> método (GET/POST) que funcionou na última execução
+METHOD_STATE = "workday_methods"
+
+
+class IncompleteListing(RuntimeError):
+    """
+    O tenant não foi lido inteiro (páginas que falharam, teto `pages`, fallback
+    HTML). Levantada no fim, depois de gerar tudo o que veio: as vagas são
+    gravadas, mas o pipeline não desativa as que "sumiram" desse tenant.
+    """
+
 def _headers_json(ref: str):
     return {
         "User-Agent": random.choice(UA_LIST),
@@ -19,125 +36,191 @@ def _headers_json(ref: str):
         "Connection": "keep-alive",
     }
 
-def fetch_workday(tenant_host: str, tenant: str, site: str, limit: int = 50, pages: int = 40) -> List[Dict]:
+def _item_to_raw(it: Dict[str, Any], base: str, tenant: str) -> Dict:
+    title = it.get("title") or it.get("displayTitle") or it.get("jobPostingTitle")
+    loc = it.get("locationsText") or it.get("location") or ""
+    url = it.get("externalPath") or it.get("jobPostingUrl") or ""
+    if url and url.startswith("/"):
+        url = base + url
+    return {
+        "title": title,
+        "company": tenant.capitalize(),
+        "description": "",
+        "city": "", "state": "", "country": "",
+        "salary": "",
+        "url": url,
+        "category": it.get("primaryCategory") or it.get("jobFamily") or "other",
+        "active": True,
+        "source": "workday",
+        "raw_location": loc,
+    }
+
+def _fetch_page(method: str, api: str, ref: str, limit: int, offset: int) -> Optional[Dict[str, Any]]:
+    """Uma página da API de jobs; None se falhar ou não vier JSON 200."""
+    try:
+        if method == "GET":
+            r = http_client.get(f"{api}?limit={limit}&offset={offset}",
+                                headers=_headers_json(ref), timeout=25)
+        else:
+            payload = {"limit": limit, "offset": offset, "searchText": ""}
+            r = http_client.post(api, json=payload, headers=_headers_json(ref), timeout=25)
+    except Exception:
+        return None
+    if r.status_code == 200 and "application/json" in r.headers.get("content-type", ""):
+        try:
+            return r.json()
+        except ValueError:
+            return None
+    return None
+
+def _page_items(data: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    if not data:
+        return []
+    return data.get("jobPostings") or data.get("items") or []
+
+def _iter_api(
+    method: str,
+    api: str,
+    ref: str,
+    base: str,
+    tenant: str,
+    limit: int,
+    max_jobs: Optional[int],
+    concurrency: int,
+) -> Iterator[List[Dict]]:
     """
-    Ex.: tenant_host='marriott.wd5.myworkdayjobs.com', tenant='marriott', site='MarriottCareers'
-    Tenta:
-      1) GET /wday/cxs/{tenant}/{site}/jobs?limit=&offset=
-      2) POST /wday/cxs/{tenant}/{site}/jobs  {limit, offset, searchText:""}
-    Cai para fallback HTML básico se necessário.
+    Gera as páginas (já convertidas em raw) conforme chegam.
+    Página 1 em sequência; se ela trouxer `total`, as demais páginas (até o total)
+    são buscadas em paralelo. Sem `total`, pagina em sequência até vir vazio.
+    Página que falha é tentada de novo uma vez; se ainda faltar página (ou o teto
+    max_jobs cortar a listagem), levanta IncompleteListing no fim.
     """
-    base = f"https://{tenant_host}"
-    api_get = f"{base}/wday/cxs/{tenant}/{site}/jobs"
-    api_post = api_get  # mesmo path, método POST
-    ref = f"{base}/{site}"
+    first = _fetch_page(method, api, ref, limit, 0)
+    items = _page_items(first)
+    if not items:
+        return
+    yield [_item_to_raw(it, base, tenant) for it in items]
 
-    out: List[Dict] = []
+    total = int(first.get("total") or 0)
+    if total:
+        stop = min(total, max_jobs) if max_jobs else total
+        failed: List[int] = []
+        fetch = lambda offset: _fetch_page(method, api, ref, limit, offset)
+        for offset, data in http_client.map_in_flight(fetch, range(limit, stop, limit), max_in_flight=concurrency):
+            if data is None:
+                failed.append(offset)
+            elif _page_items(data):
+                yield [_item_to_raw(it, base, tenant) for it in _page_items(data)]
+        # segunda (e última) tentativa, em sequência, das páginas que falharam
+        missing = 0
+        for offset in sorted(failed):
+            data = _fetch_page(method, api, ref, limit, offset)
+            if data is None:
+                missing += 1
+            elif _page_items(data):
+                yield [_item_to_raw(it, base, tenant) for it in _page_items(data)]
+        if missing:
+            print(f"[Workday] {tenant}: {missing} de {len(range(0, stop, limit))} páginas falharam")
+            raise IncompleteListing(f"{tenant}: {missing} páginas faltando")
+        if stop < total:
+            raise IncompleteListing(f"{tenant}: teto de {max_jobs} vagas, total {total}")
+        return
 
-    # 1) GET
-    for page in range(pages):
-        offset = page * limit
-        try:
-            r = requests.get(f"{api_get}?limit={limit}&offset={offset}",
-                             headers=_headers_json(ref), timeout=25)
-            if r.status_code == 200 and "application/json" in r.headers.get("content-type", ""):
-                data = r.json()
-                items = data.get("jobPostings") or data.get("items") or []
-                if not items:
-                    break
-                for it in items:
-                    title = it.get("title") or it.get("displayTitle") or it.get("jobPostingTitle")
-                    loc = it.get("locationsText") or it.get("location") or ""
-                    url = it.get("externalPath") or it.get("jobPostingUrl") or ""
-                    if url and url.startswith("/"):
-                        url = base + url
-                    out.append({
-                        "title": title,
-                        "company": tenant.capitalize(),
-                        "description": "",
-                        "city": "", "state": "", "country": "",
-                        "salary": "",
-                        "url": url,
-                        "category": it.get("primaryCategory") or it.get("jobFamily") or "other",
-                        "priority": 1000,
-                        "active": True,
-                        "source": "workday",
-                        "raw_location": loc,
-                    })
-            else:
-                break
-        except Exception:
-            break
-
-    if out:
-        return out
-
-    # 2) POST
-    for page in range(pages):
-        offset = page * limit
-        try:
-            payload = {"limit": limit, "offset": offset, "searchText": ""}
-            r = requests.post(api_post, json=payload, headers=_headers_json(ref), timeout=25)
-            if r.status_code == 200 and "application/json" in r.headers.get("content-type", ""):
-                data = r.json()
-                items = data.get("jobPostings") or data.get("items") or []
-                if not items:
-                    break
-                for it in items:
-                    title = it.get("title") or it.get("displayTitle") or it.get("jobPostingTitle")
-                    loc = it.get("locationsText") or it.get("location") or ""
-                    url = it.get("externalPath") or it.get("jobPostingUrl") or ""
-                    if url and url.startswith("/"):
-                        url = base + url
-                    out.append({
-                        "title": title,
-                        "company": tenant.capitalize(),
-                        "description": "",
-                        "city": "", "state": "", "country": "",
-                        "salary": "",
-                        "url": url,
-                        "category": it.get("primaryCategory") or it.get("jobFamily") or "other",
-                        "priority": 1000,
-                        "active": True,
-                        "source": "workday",
-                        "raw_location": loc,
-                    })
-            else:
-                break
-        except Exception:
-            break
-
-    if out:
-        return out
-
-    # 3) Fallback HTML: pega cards básicos (mínimo: URL)
+    stop = max_jobs or FALLBACK_MAX_PAGES * limit
+    for offset in range(limit, stop, limit):
+        data = _fetch_page(method, api, ref, limit, offset)
+        if data is None:
+            data = _fetch_page(method, api, ref, limit, offset)
+        if data is None:
+            print(f"[Workday] {tenant}: página offset={offset} falhou")
+            raise IncompleteListing(f"{tenant}: paginação interrompida em offset={offset}")
+        page_items = _page_items(data)
+        if not page_items:
+            return
+        yield [_item_to_raw(it, base, tenant) for it in page_items]
+    raise IncompleteListing(f"{tenant}: teto de {stop} vagas sem `total`")
+
+def _iter_html_fallback(base: str, ref: str, tenant: str) -> Iterator[Dict]:
+    """Fallback HTML: pega cards básicos (mínimo: URL)."""
     try:
-        r = requests.get(ref, headers=_headers_json(ref), timeout=25)
+        r = http_client.get(ref, headers=_headers_json(ref), timeout=25)
         r.raise_for_status()
         html = r.text
-        import re
-        # matches de hrefs que apontam para /{site}/job/...
-        links = re.findall(r'href="(/[^"]+job[^"]+)"', html, flags=re.I)
-        seen = set()
-        for u in links:
-            if u in seen:
-                continue
-            seen.add(u)
-            full = base + u
-            out.append({
-                "title": None,
-                "company": tenant.capitalize(),
-                "description": "",
-                "city": "", "state": "", "country": "",
-                "salary": "",
-                "url": full,
-                "category": "other",
-                "priority": 800,
-                "active": True,
-                "source": "workday",
-                "raw_location": "",
-            })
     except Exception:
-        pass
+        return
+    import re
+    # matches de hrefs que apontam para /{site}/job/...
+    links = re.findall(r'href="(/[^"]+job[^"]+)"', html, flags=re.I)
+    seen = set()
+    for u in links:
+        if u in seen:
+            continue
+        seen.add(u)
+        full = base + u
+        yield {
+            "title": None,
+            "company": tenant.capitalize(),
+            "description": "",
+            "city": "", "state": "", "country": "",
+            "salary": "",
+            "url": full,
+            "category": "other",
+            "active": True,
+            "source": "workday",
+            "raw_location": "",
+        }
+
+def iter_workday(
+    tenant_host: str,
+    tenant: str,
+    site: str,
+    limit: int = 50,
+    pages: Optional[int] = None,
+    concurrency: int = WORKDAY_CONCURRENCY,
+) -> Iterator[Dict]:
+    """
+    Versão em streaming de fetch_workday: gera as vagas página a página, sem
+    acumular o tenant inteiro em memória. Levanta IncompleteListing no fim se
+    não conseguiu ler o tenant inteiro.
+    """
+    base = f"https://{tenant_host}"
+    api = f"{base}/wday/cxs/{tenant}/{site}/jobs"
+    ref = f"{base}/{site}"
+    key = f"{tenant_host}/{site}"
+    max_jobs = pages * limit if pages else None
+
+    remembered = load_state(METHOD_STATE).get(key)
+    methods = ["POST", "GET"] if remembered == "POST" else ["GET", "POST"]
+
+    for method in methods:
+        got_any = False
+        for page in _iter_api(method, api, ref, base, tenant, limit, max_jobs, concurrency):
+            if not got_any:
+                got_any = True
+                if method != remembered:
+                    update_state(METHOD_STATE, lambda state: state.__setitem__(key, method))
+            yield from page
+        if got_any:
+            return
 
-    return out
+    yield from _iter_html_fallback(base, ref, tenant)
+    # o HTML só traz os cards da primeira página
+    raise IncompleteListing(f"{tenant}: só fallback HTML")
+
+def fetch_workday(
+    tenant_host: str,
+    tenant: str,
+    site: str,
+    limit: int = 50,
+    pages: Optional[int] = None,
+    concurrency: int = WORKDAY_CONCURRENCY,
+) -> List[Dict]:
+    """
+    Ex.: tenant_host='marriott.wd5.myworkdayjobs.com', tenant='marriott', site='MarriottCareers'
+    Tenta a API /wday/cxs/{tenant}/{site}/jobs via GET (?limit=&offset=) ou POST
+    ({limit, offset, searchText:""}), começando pelo método que funcionou da última vez
+    para esse tenant. Lê o `total` da primeira página e busca o resto em paralelo
+    (até `concurrency` páginas por vez). `pages` é só um teto opcional.
+    Cai para fallback HTML básico se necessário. Ver iter_workday (streaming).
+    """
+    return list(iter_workday(tenant_host, tenant, site, limit=limit, pages=pages, concurrency=concurrency))
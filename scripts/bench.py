@@ -0,0 +1,587 @@
+"""
+Micro-benchmarks do JobBot. Rodar da raiz do projeto:
+
+    python scripts/bench.py count [--rows 5000] [--repeat 300]
+    python scripts/bench.py search --rows 100000 --repeat 50
+    python scripts/bench.py parse [--fixtures DIR] [--repeat 50]
+    python scripts/bench.py geo [--jobs-json jobs.json] [--repeat 50]
+    python scripts/bench.py normalize [--rows 20000] [--repeat 5]
+    python scripts/bench.py dedup [--rows 50000]
+    python scripts/bench.py priority [--rows 100000] [--repeat 5]
+    python scripts/bench.py plan [--rows 5000] [--repeat 20]
+    python scripts/bench.py near [--rows 200000] [--repeat 50]
+
+Cada benchmark usa um banco temporário (não toca no jobs.db).
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import db  # noqa: E402
+
+
+def _timeit(fn: Callable[[], object], repeat: int) -> List[float]:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def _report(label: str, samples: List[float]) -> None:
+    ordered = sorted(samples)
+    p95 = ordered[int(len(ordered) * 0.95) - 1]
+    print(
+        f"{label:<32} mean {statistics.mean(samples) * 1e3:8.3f} ms | "
+        f"p50 {statistics.median(samples) * 1e3:8.3f} ms | p95 {p95 * 1e3:8.3f} ms"
+    )
+
+
+def _use_temp_db(tmp: str) -> None:
+    db.DB_PATH = Path(tmp) / "bench.db"
+    db.init_db()
+
+
+def _synthetic_jobs(n: int) -> List[Dict[str, object]]:
+    return [
+        {
+            "url": f"https://example.com/job/{i}",
+            "title": f"Housekeeper {i}",
+            "company": "Bench Hotels",
+            "description": "Clean rooms and public areas. " * 10,
+            "city": "Orlando",
+            "state": "FL",
+            "country": "US" if i % 5 else "CA",
+            "salary": "",
+            "category": "hotel",
+            "priority": (10, 20, 40, 4000)[i % 4],
+            "active": 1,
+            "source": "bench",
+        }
+        for i in range(n)
+    ]
+
+
+TITLE_WORDS = [
+    "housekeeper", "room attendant", "line cook", "prep cook", "dishwasher", "janitor",
+    "laundry attendant", "warehouse associate", "porter", "server", "busser", "cashier",
+    "maintenance mechanic", "groundskeeper", "front desk agent", "caregiver",
+]
+COMPANIES = ["Marriott", "Hilton", "Hyatt", "Aramark", "Sodexo", "Compass Group", "Walmart", "McDonald's"]
+CITIES = [("Orlando", "FL"), ("Miami", "FL"), ("Houston", "TX"), ("Dallas", "TX"), ("Denver", "CO"),
+          ("Phoenix", "AZ"), ("Chicago", "IL"), ("Atlanta", "GA"), ("Seattle", "WA"), ("Boston", "MA")]
+FILLER = ("clean rooms restock supplies guest service team shift weekend schedule benefits "
+          "training safety kitchen food hotel resort floor inventory").split()
+
+
+def _varied_jobs(n: int, seed: int = 7) -> List[Dict[str, object]]:
+    rnd = random.Random(seed)
+    jobs = []
+    for i in range(n):
+        city, state = rnd.choice(CITIES)
+        # ~0,1% de títulos raros, para medir buscas seletivas
+        title = "Sommelier" if rnd.random() < 0.001 else rnd.choice(TITLE_WORDS).title()
+        jobs.append({
+            "url": f"https://example.com/job/{i}",
+            "title": f"{title} - {rnd.choice(['Full Time', 'Part Time', 'Seasonal'])}",
+            "company": rnd.choice(COMPANIES),
+            "description": " ".join(rnd.choice(FILLER) for _ in range(60)),
+            "city": city,
+            "state": state,
+            "country": "US",
+            "salary": "",
+            "category": "other",
+            "priority": rnd.choice((10, 20, 40, 4000)),
+            "active": 1,
+            "source": "bench",
+        })
+    return jobs
+
+
+def bench_count(args: argparse.Namespace) -> None:
+    """Latência do handler de /jobs/count: antes (init_db completo por request) x depois."""
+    with tempfile.TemporaryDirectory() as tmp:
+        _use_temp_db(tmp)
+        db.upsert_jobs(_synthetic_jobs(args.rows))
+        db.refresh_job_stats()
+
+        def before() -> None:
+            db.init_db(force=True)
+            db.get_jobs_count(only_active=True)
+
+        def scan() -> None:
+            with db.read_conn() as conn:
+                conn.execute("SELECT COUNT(*) FROM jobs WHERE active = 1 AND canonical_id IS NULL").fetchone()
+
+        def after() -> None:
+            db.get_jobs_count(only_active=True)
+
+        _report("/jobs/count antes (init_db)", _timeit(before, args.repeat))
+        _report("/jobs/count COUNT(*) em jobs", _timeit(scan, args.repeat))
+        _report("/jobs/count depois (job_stats)", _timeit(after, args.repeat))
+        _report("/jobs/stats (job_stats)", _timeit(db.get_job_stats, args.repeat))
+
+
+def bench_search(args: argparse.Namespace) -> None:
+    """FTS5 (/jobs/search) x LIKE '%q%' (estilo eb3-jobs-mvp) em N linhas sintéticas."""
+    queries = ["housekeeper", "line cook", "orlando", "dishwasher miami", "sommelier", "sommelier denver"]
+    with tempfile.TemporaryDirectory() as tmp:
+        _use_temp_db(tmp)
+        start = time.perf_counter()
+        db.upsert_jobs(_varied_jobs(args.rows), batch_size=2000)
+        print(f"carga de {args.rows} linhas (com triggers FTS): {time.perf_counter() - start:.1f}s")
+
+        def like(q: str) -> list:
+            pattern = f"%{q.lower()}%"
+            with db.read_conn() as conn:
+                return conn.execute("""
+                    SELECT url, title, company, city, priority FROM jobs
+                    WHERE active = 1 AND (lower(title) LIKE ? OR lower(city) LIKE ?)
+                    ORDER BY priority DESC, created_at DESC
+                    LIMIT 20
+                """, (pattern, pattern)).fetchall()
+
+        def fts(q: str) -> list:
+            return db.search_jobs(q, limit=20, fields=["url", "title", "company", "city", "priority"])
+
+        for q in queries:
+            _report(f"LIKE  {q!r}", _timeit(lambda: like(q), args.repeat))
+            _report(f"FTS5  {q!r}", _timeit(lambda: fts(q), args.repeat))
+
+
+def _noise(rnd: random.Random, blocks: int) -> str:
+    """Marcação de “casca” de página (menus, rodapé, scripts) que os scrapers ignoram."""
+    parts = []
+    for i in range(blocks):
+        words = " ".join(rnd.choice(FILLER) for _ in range(12))
+        parts.append(
+            f'<div class="nav-item n{i}"><ul><li><a href="/menu/{i}">{words}</a></li>'
+            f'<li><span class="x">{words}</span></li></ul><p>{words}</p></div>'
+        )
+    parts.append("<script>var cfg = {" + ",".join(f'"k{i}": {i}' for i in range(200)) + "};</script>")
+    return "\n".join(parts)
+
+
+def _synthetic_pages(seed: int = 11) -> Dict[str, str]:
+    """HTML sintético no formato que cada scraper espera (quando não há fixtures salvas)."""
+    rnd = random.Random(seed)
+    shell = lambda body: f"<html><head><title>t</title></head><body>{_noise(rnd, 300)}{body}{_noise(rnd, 100)}</body></html>"  # noqa: E731
+    jobbank = "".join(
+        f'<article><a href="/jobsearch/jobposting/{40000000 + i}?source=searchresults" class="resultJobItem">'
+        f'<h3><span class="flag">New</span> {rnd.choice(TITLE_WORDS)}</h3>'
+        f'<ul><li class="date">October 16, 2025</li><li class="business">ACME {i} Inc.</li>'
+        f'<li class="location">Location Toronto (ON)</li><li class="salary">Salary: $18.00 hourly</li></ul></a></article>'
+        for i in range(25)
+    )
+    detail = (
+        '<h1>Room Attendant</h1><div class="job-location">Orlando, FL</div>'
+        '<span class="job-location">Orlando, FL</span><span data-ph-at-id="job-location">Orlando, FL</span>'
+        '<div class="iCIMS_JobHeaderGroup">Bakersfield, CA</div>'
+        f'<div class="job-description iCIMS_JobContent">{" ".join(rnd.choice(FILLER) for _ in range(400))}</div>'
+    )
+    return {
+        "jobbank": shell(jobbank),
+        "mchire": shell("".join(f'<a href="/Job?job_id={i}">Crew Member {i}</a>' for i in range(40))),
+        "wendys_listing": shell("".join(f'<a href="/job-search/posting/{i}">Crew {i}</a>' for i in range(30))),
+        "detail": shell(detail),
+    }
+
+
+def bench_parse(args: argparse.Namespace) -> None:
+    """
+    Tempo de parse por página de cada scraper: árvore completa com html.parser (antes)
+    x caminho atual (lxml + SoupStrainer nas listagens).
+    Com --fixtures DIR, usa DIR/<nome>.html (jobbank, mchire, wendys_listing, wendys_job,
+    ihg, hilton, walmart, icims) quando existir; senão, HTML sintético.
+    """
+    from bs4 import BeautifulSoup
+
+    import main_canada
+    from scrapers import hilton_html, icims, ihg, mchire, walmart, wendys
+    from scrapers.parsing import PARSER
+
+    url = "https://example.com/job/1"
+    parsers = {
+        "jobbank": ("jobbank", main_canada.parse_jobbank_html),
+        "mchire": ("mchire", mchire._jobs_from_html),
+        "wendys_listing": ("wendys_listing", wendys._links_from_html),
+        "wendys_job": ("detail", lambda html: wendys._parse_job(html, url)),
+        "ihg": ("detail", lambda html: ihg._parse_ihg(html, url)),
+        "hilton": ("detail", lambda html: hilton_html._parse_hilton(html, url)),
+        "walmart": ("detail", lambda html: walmart._parse_walmart(html, url)),
+        "icims": ("detail", lambda html: icims._parse_icims(html, url)),
+    }
+    synthetic = _synthetic_pages()
+    fixtures = Path(args.fixtures) if args.fixtures else None
+    print(f"parser atual: {PARSER}")
+    for name, (kind, parse) in parsers.items():
+        path = fixtures / f"{name}.html" if fixtures else None
+        if path and path.exists():
+            html, origin = path.read_text(encoding="utf-8", errors="replace"), "fixture"
+        else:
+            html, origin = synthetic[kind], "sintético"
+        label = f"{name} ({origin}, {len(html) // 1024} KB)"
+        _report(f"{label} antes", _timeit(lambda: BeautifulSoup(html, "html.parser"), args.repeat))
+        _report(f"{label} depois", _timeit(lambda: parse(html), args.repeat))
+
+
+def _job_locations(path: Path) -> List[str]:
+    """Strings de localização como o pipeline as vê: city sozinho e city/state/country juntos."""
+    import json
+
+    data = json.loads(path.read_text(encoding="utf-8"))
+    items = data.get("items", []) if isinstance(data, dict) else data
+    locations = []
+    for job in items:
+        locations.append(job.get("city") or "")
+        locations.append(", ".join(x for x in (job.get("city"), job.get("state"), job.get("country")) if x))
+    return locations
+
+
+def bench_geo(args: argparse.Namespace) -> None:
+    """utils.geo sobre as localizações do jobs.json: regex pré-compilada sem cache x com lru_cache."""
+    from utils import geo
+
+    locations = _job_locations(Path(args.jobs_json))
+    funcs = [geo.pick_us_piece, geo.looks_like_us_piece, geo.extract_city_state_country]
+    print(f"{len(locations)} localizações ({len(set(locations))} distintas)")
+
+    def uncached() -> None:
+        for loc in locations:
+            for fn in funcs:
+                fn.__wrapped__(loc)
+
+    def cached() -> None:
+        for loc in locations:
+            for fn in funcs:
+                fn(loc)
+
+    _report("geo sem cache (1 passada)", _timeit(uncached, args.repeat))
+    _report("geo com cache (1 passada)", _timeit(cached, args.repeat))
+
+
+def _adzuna_payloads(n: int, seed: int = 3) -> List[Dict[str, object]]:
+    rnd = random.Random(seed)
+    out = []
+    for i in range(n):
+        city, state = rnd.choice(CITIES)
+        out.append({
+            "id": str(i),
+            "title": rnd.choice(TITLE_WORDS).title(),
+            "redirect_url": f"https://www.adzuna.com/land/ad/{i}",
+            "description": " ".join(rnd.choice(FILLER) for _ in range(40)),
+            "company": {"display_name": rnd.choice(COMPANIES)},
+            "location": {"area": ["US", state, city], "display_name": f"{city}, {state}"},
+            "category": {"label": "Hospitality & Catering Jobs"},
+        })
+    return out
+
+
+def _greenhouse_payloads(n: int, seed: int = 5) -> List[Dict[str, object]]:
+    rnd = random.Random(seed)
+    out = []
+    for i in range(n):
+        city, state = rnd.choice(CITIES)
+        # ~1/3 fora dos EUA, para o filtro ter trabalho de verdade
+        location = rnd.choice([f"{city}, {state}", f"{city}, {state}, United States", "Berlin, Germany"])
+        out.append({
+            "id": i,
+            "title": rnd.choice(TITLE_WORDS).title(),
+            "absolute_url": f"https://boards.greenhouse.io/bench/jobs/{i}",
+            "location": location,
+            "content": " ".join(rnd.choice(FILLER) for _ in range(40)),
+            "department": "Operations",
+        })
+    return out
+
+
+def bench_normalize(args: argparse.Namespace) -> None:
+    """Vagas/s: três passadas (normalize_job, is_us_job, apply_defaults) x normalize_batch."""
+    import normalize
+
+    for source_type, raws in (("adzuna", _adzuna_payloads(args.rows)), ("greenhouse", _greenhouse_payloads(args.rows))):
+        def three_passes() -> None:
+            normed = [(normalize.normalize_job(r, source_type=source_type), r) for r in raws]
+            us = [n for n, r in normed if n and normalize.is_us_job(n, normalize._fallback_loc(r))]
+            [normalize.apply_defaults(n) for n in us]
+
+        def batch() -> None:
+            list(normalize.normalize_batch(raws, source_type))
+
+        for label, fn in (("3 passadas", three_passes), ("normalize_batch", batch)):
+            samples = _timeit(fn, args.repeat)
+            rate = args.rows / (sum(samples) / len(samples))
+            _report(f"{source_type} {label}", samples)
+            print(f"{'':<32} {rate:,.0f} vagas/s")
+
+
+def _cross_source_jobs(n: int, dup_rate: float = 0.2, seed: int = 13) -> List[Dict[str, object]]:
+    """Vagas "workday" e cópias "adzuna" de ~dup_rate delas (URL, company e pontuação diferentes)."""
+    rnd = random.Random(seed)
+    jobs = []
+    for i in range(n):
+        city, state = rnd.choice(CITIES)
+        job = {
+            "url": f"https://tenant.wd5.myworkdayjobs.com/job/{i}",
+            "title": f"{rnd.choice(TITLE_WORDS).title()} {rnd.choice(['I', 'II', 'Lead', 'Night'])}",
+            "company": rnd.choice(COMPANIES),
+            "description": " ".join(rnd.choice(FILLER) for _ in range(80)) + f" ref {i}",
+            "city": city,
+            "state": state,
+            "country": "US",
+            "salary": "",
+            "category": "other",
+            "priority": 40,
+            "active": 1,
+            "source": "workday",
+        }
+        jobs.append(job)
+        if rnd.random() < dup_rate:
+            copy = dict(job)
+            copy.update({
+                "url": f"https://www.adzuna.com/land/ad/{i}",
+                "company": f"{job['company']} International, Inc.",
+                "description": job["description"].replace(" ", "  ").upper()[:2000],
+                "source": "adzuna",
+                "priority": 20,
+            })
+            jobs.append(copy)
+    return jobs
+
+
+def bench_dedup(args: argparse.Namespace) -> None:
+    """MinHash/LSH: indexação inicial, refresh incremental e acerto das ligações."""
+    import dedup
+
+    with tempfile.TemporaryDirectory() as tmp:
+        _use_temp_db(tmp)
+        jobs = _cross_source_jobs(args.rows)
+        planted = sum(1 for j in jobs if j["source"] == "adzuna")
+        db.upsert_jobs(jobs, batch_size=2000)
+
+        start = time.perf_counter()
+        stats = dedup.refresh_duplicates()
+        elapsed = time.perf_counter() - start
+        print(f"{len(jobs)} vagas: indexação inicial {elapsed:.1f}s ({elapsed / len(jobs) * 1e3:.3f} ms/vaga)")
+
+        with db.read_conn() as conn:
+            pairs = conn.execute("""
+                SELECT d.url, c.url FROM jobs d JOIN jobs c ON c.id = d.canonical_id
+            """).fetchall()
+        wrong = sum(1 for dup, canon in pairs if dup.rsplit("/", 1)[-1] != canon.rsplit("/", 1)[-1])
+        print(f"duplicatas ligadas: {stats['duplicates']} de {planted} cópias plantadas ({wrong} erradas)")
+
+        # vaga-modelo em várias cidades: só a cópia da MESMA cidade é duplicata, e
+        # description placeholder nunca liga
+        template = " ".join(FILLER) + " apply today"
+        templated = []
+        for city, state in CITIES:
+            for source, desc in (("mchire", template), ("adzuna", template), ("ihg", "Job description not available."),
+                                 ("walmart", "Job description not available.")):
+                templated.append({
+                    "url": f"https://{source}.example/shift-manager/{city}", "title": "Shift Manager",
+                    "company": "McDonald's", "description": desc, "city": city, "state": state,
+                    "country": "US", "source": source, "active": 1,
+                })
+        db.upsert_jobs(templated)
+        dedup.refresh_duplicates()
+        with db.read_conn() as conn:
+            links = conn.execute("""
+                SELECT d.city = c.city FROM jobs d JOIN jobs c ON c.id = d.canonical_id
+                WHERE d.title = 'Shift Manager'
+            """).fetchall()
+        same_city = sum(1 for (same,) in links if same)
+        print(f"vaga-modelo em {len(CITIES)} cidades: {same_city} ligadas na mesma cidade "
+              f"(esperado {len(CITIES)}), {len(links) - same_city} entre cidades diferentes")
+
+        fresh = [dict(j, url=j["url"] + "-new", title=j["title"] + " Trainee")
+                 for j in _cross_source_jobs(1000, seed=99)]
+        db.upsert_jobs(fresh)
+        start = time.perf_counter()
+        stats = dedup.refresh_duplicates()
+        print(f"refresh incremental ({stats['indexed']} vagas novas): {time.perf_counter() - start:.2f}s")
+
+
+def _legacy_priority(title: str, company: str, source: str) -> int:
+    """compute_priority antigo (um `in` por termo), para comparação."""
+    from priority import EB3_KEYWORDS
+
+    t, c, s = (title or "").lower(), (company or "").lower(), (source or "").lower()
+    if "mcdonald" in c or s == "mchire":
+        return 5090
+    if "hotel" in c or "resort" in c or "marriott" in c or "hilton" in c or "ihg" in c:
+        return 4000
+    if any(k in t for k in EB3_KEYWORDS):
+        return 3500
+    if "food" in t or "kitchen" in t:
+        return 3000
+    return 10
+
+
+def bench_priority(args: argparse.Namespace) -> None:
+    """Regras compiladas vs. compute_priority antigo; depois o rescore set-based no banco."""
+    import priority
+
+    rnd = random.Random(17)
+    extra = ["Assistant", "Manager", "Driver", "Nurse", "Sales", "Kitchen", "Food Runner", "Software Engineer"]
+    rows = [
+        (f"{rnd.choice(TITLE_WORDS + extra).title()} {rnd.choice(['I', 'II', '- Night Shift', '(Seasonal)'])}",
+         rnd.choice(COMPANIES + ["Acme Logistics", "Grand Resort & Spa"]),
+         "bench")
+        for _ in range(args.rows)
+    ]
+    mismatches = sum(1 for r in rows if priority.compute_priority(*r) != _legacy_priority(*r))
+    print(f"{args.rows} títulos, divergências vs. regras antigas: {mismatches}")
+    for label, fn in (("in por termo (antigo)", _legacy_priority), ("PriorityEngine", priority.compute_priority)):
+        samples = _timeit(lambda: [fn(*r) for r in rows], args.repeat)
+        _report(label, samples)
+        print(f"{'':<32} {args.rows / (sum(samples) / len(samples)):,.0f} títulos/s")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        _use_temp_db(tmp)
+        db.upsert_jobs(_varied_jobs(args.rows), batch_size=2000)
+        start = time.perf_counter()
+        changed = priority.rescore()
+        print(f"rescore: {changed} de {args.rows} linhas alteradas em {time.perf_counter() - start:.2f}s")
+        start = time.perf_counter()
+        changed = priority.rescore()
+        print(f"rescore sem mudança de regra: {changed} linhas em {time.perf_counter() - start:.2f}s")
+
+
+PLAN_FILTERS = {
+    "state": "fl",
+    "city": "Orlando",
+    "category": "other",
+    "source": "bench",
+    "company": "hilton",
+    "min_priority": 40,
+    "updated_since": "2020-01-01",
+}
+
+
+def bench_plan(args: argparse.Namespace) -> None:
+    """
+    EXPLAIN QUERY PLAN de /jobs para cada combinação de filtros (com e sem
+    country/cursor). Falha (exit 1) se alguma fizer SCAN em jobs, ou se tiver
+    filtro de igualdade e o índice escolhido não restringir nenhum deles (isto
+    é, percorrer todas as vagas ativas). Também mede cada filtro sozinho.
+    """
+    import itertools
+
+    with tempfile.TemporaryDirectory() as tmp:
+        _use_temp_db(tmp)
+        db.upsert_jobs(_varied_jobs(args.rows), batch_size=2000)
+        _, cursor = db.get_active_jobs_page(limit=10)
+
+        names = list(PLAN_FILTERS)
+        combos = [c for n in range(len(names) + 1) for c in itertools.combinations(names, n)]
+        checked, scans = 0, []
+        with db.read_conn() as conn:
+            for combo in combos:
+                for country, cur in itertools.product((None, "US"), (None, cursor)):
+                    sql, params = db._active_jobs_page_sql(
+                        limit=50, cursor=cur, country=country, filters={k: PLAN_FILTERS[k] for k in combo},
+                    )
+                    plan = [row["detail"] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
+                    checked += 1
+                    equality = [c for c in combo if c in db.TEXT_FILTERS] + (["country"] if country else [])
+                    scanned = any(detail.startswith("SCAN jobs") for detail in plan)
+                    unindexed = equality and not any(f"({c}=?" in d for c in equality for d in plan)
+                    if scanned or unindexed:
+                        scans.append((combo, country, bool(cur), plan))
+
+        print(f"{checked} consultas verificadas, {len(scans)} sem índice para os filtros")
+        for combo, country, has_cursor, plan in scans[:20]:
+            print(f"  {'+'.join(combo) or '(sem filtro)'} country={country} cursor={has_cursor}: {' | '.join(plan)}")
+
+        for name in names:
+            filters = {name: PLAN_FILTERS[name]}
+            _report(f"/jobs?{name}=…&limit=50", _timeit(lambda: db.get_active_jobs_page(limit=50, filters=filters), args.repeat))
+        if scans:
+            sys.exit(1)
+
+
+NEAR_CENTERS = [
+    ("Orlando, FL", "Orlando", "FL", 80),
+    ("New York, NY", "New York", "NY", 80),
+    ("Toronto, ON", "Toronto", "ON", 50),
+    ("Bozeman, MT", "Bozeman", "MT", 50),
+]
+
+
+def _geo_jobs(n: int, seed: int = 23) -> List[Dict[str, object]]:
+    """Vagas em cidades do gazetteer, sorteadas com peso pela população (centros grandes ficam densos)."""
+    import gzip
+    from utils.gazetteer import GAZETTEER_PATH
+
+    with gzip.open(GAZETTEER_PATH, "rt", encoding="utf-8") as fh:
+        places = [line.rstrip("\n").split("\t") for line in fh]
+    rnd = random.Random(seed)
+    picks = rnd.choices(places, weights=[int(p[5]) for p in places], k=n)
+    jobs = _varied_jobs(n, seed=seed)
+    for job, (country, state, city, lat, lon, _pop) in zip(jobs, picks):
+        job.update(city=city, state=state, country=country, lat=float(lat), lon=float(lon))
+    return jobs
+
+
+def bench_near(args: argparse.Namespace) -> None:
+    """/jobs/near: latência por centro (denso e esparso) e conferência contra força bruta."""
+    from utils.gazetteer import geocode, haversine_km
+
+    with tempfile.TemporaryDirectory() as tmp:
+        _use_temp_db(tmp)
+        jobs = _geo_jobs(args.rows)
+        start = time.perf_counter()
+        db.upsert_jobs(jobs, batch_size=2000)
+        print(f"carga de {args.rows} vagas (com triggers FTS + R*Tree): {time.perf_counter() - start:.1f}s")
+
+        for label, city, state, radius in NEAR_CENTERS:
+            lat, lon = geocode(city, state)
+            inside = sum(1 for j in jobs if haversine_km(lat, lon, j["lat"], j["lon"]) <= radius)
+            samples = _timeit(lambda: db.get_jobs_near(lat, lon, radius_km=radius, limit=50), args.repeat)
+            _report(f"{label} {radius} km ({inside} vagas)", samples)
+
+            # força bruta: as 50 distâncias mais próximas têm que bater (empates podem trocar de id)
+            got = [item["distance_km"] for item in db.get_jobs_near(lat, lon, radius_km=radius, limit=50)]
+            expected = sorted(round(haversine_km(lat, lon, j["lat"], j["lon"]), 1) for j in jobs)
+            expected = [d for d in expected if d <= radius][:50]
+            if got != expected:
+                print(f"   ⚠️ difere da força bruta: {got[:5]}... vs {expected[:5]}...")
+
+
+BENCHES = {
+    "count": bench_count,
+    "search": bench_search,
+    "parse": bench_parse,
+    "geo": bench_geo,
+    "normalize": bench_normalize,
+    "dedup": bench_dedup,
+    "priority": bench_priority,
+    "plan": bench_plan,
+    "near": bench_near,
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("bench", choices=sorted(BENCHES))
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=300)
+    parser.add_argument("--fixtures", help="diretório com HTML salvo (bench parse)")
+    parser.add_argument("--jobs-json", default="jobs.json", help="snapshot com localizações (bench geo)")
+    args = parser.parse_args()
+    BENCHES[args.bench](args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Gera utils/gazetteer_us_ca.tsv.gz (cidades dos EUA e do Canadá com lat/lon) a
+partir de um dump de cidades do GeoNames (https://download.geonames.org/export/dump/,
+CC BY 4.0), ex.: cities1000.zip ou cities1000.txt. Rodar da raiz do projeto:
+
+    python scripts/build_gazetteer.py cities1000.zip [--min-population 1000]
+
+Formato de saída (TSV gzip, uma cidade por linha, mais populosas primeiro):
+    country  state  name  lat  lon  population
+com state = sigla do estado/província (FL, ON, QC...).
+"""
+from __future__ import annotations
+
+import argparse
+import gzip
+import io
+import sys
+import zipfile
+from pathlib import Path
+from typing import Iterator, List, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from utils.gazetteer import CA_ADMIN1_TO_ABBR, GAZETTEER_PATH  # noqa: E402
+
+COUNTRIES = ("US", "CA")
+
+# colunas do dump do GeoNames (geoname table)
+COL_NAME, COL_LAT, COL_LON, COL_CLASS, COL_COUNTRY, COL_ADMIN1, COL_POPULATION = 1, 4, 5, 6, 8, 10, 14
+
+
+def _lines(path: Path) -> Iterator[str]:
+    if path.suffix == ".zip":
+        with zipfile.ZipFile(path) as zf:
+            name = next(n for n in zf.namelist() if n.endswith(".txt"))
+            with zf.open(name) as fh:
+                yield from io.TextIOWrapper(fh, encoding="utf-8")
+    else:
+        with open(path, encoding="utf-8") as fh:
+            yield from fh
+
+
+def read_cities(path: Path, min_population: int) -> List[Tuple[str, str, str, float, float, int]]:
+    rows = []
+    for line in _lines(path):
+        cols = line.rstrip("\n").split("\t")
+        if len(cols) < 15 or cols[COL_COUNTRY] not in COUNTRIES or cols[COL_CLASS] != "P":
+            continue
+        population = int(cols[COL_POPULATION] or 0)
+        if population < min_population:
+            continue
+        country, admin1 = cols[COL_COUNTRY], cols[COL_ADMIN1]
+        state = CA_ADMIN1_TO_ABBR.get(admin1, "") if country == "CA" else admin1
+        if not state:
+            continue
+        rows.append((country, state, cols[COL_NAME], float(cols[COL_LAT]), float(cols[COL_LON]), population))
+    rows.sort(key=lambda r: -r[5])
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("dump", type=Path, help="citiesN.zip/.txt do GeoNames")
+    parser.add_argument("--min-population", type=int, default=1000)
+    parser.add_argument("--out", type=Path, default=GAZETTEER_PATH)
+    args = parser.parse_args()
+
+    rows = read_cities(args.dump, args.min_population)
+    # mtime=0: o arquivo gerado só muda se os dados mudarem
+    with open(args.out, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb", mtime=0) as gz:
+        for country, state, name, lat, lon, population in rows:
+            gz.write(f"{country}\t{state}\t{name}\t{lat:.4f}\t{lon:.4f}\t{population}\n".encode("utf-8"))
+    print(f"{len(rows)} cidades -> {args.out} ({args.out.stat().st_size / 1024:.0f} KB)")
+
+
+if __name__ == "__main__":
+    main()
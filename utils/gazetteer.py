@@ -0,0 +1,118 @@
+# utils/gazetteer.py
+"""
+Geocodificação offline: cidade/estado/país -> (lat, lon), usando o arquivo
+gazetteer_us_ca.tsv.gz (cidades dos EUA e do Canadá com 1000+ habitantes, dados
+do GeoNames, CC BY 4.0; gerado por scripts/build_gazetteer.py).
+
+O arquivo é carregado uma vez (na primeira chamada) em dicts em memória; nomes
+são comparados sem acento, pontuação ou maiúsculas, com "St."/"Ft."/"Mt."
+expandidos. Com cidades homônimas no mesmo estado (ou sem estado), vale a mais
+populosa.
+"""
+from __future__ import annotations
+
+import gzip
+import math
+import re
+import unicodedata
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from utils.geo import CACHE_SIZE, state_name_to_abbr
+
+GAZETTEER_PATH = Path(__file__).with_name("gazetteer_us_ca.tsv.gz")
+
+# códigos admin1 do GeoNames para o Canadá -> sigla da província
+CA_ADMIN1_TO_ABBR = {
+    "01": "AB", "02": "BC", "03": "MB", "04": "NB", "05": "NL", "07": "NS", "08": "ON",
+    "09": "PE", "10": "QC", "11": "SK", "12": "YT", "13": "NT", "14": "NU",
+}
+
+CA_PROVINCE_NAME_TO_ABBR = {
+    "alberta": "AB", "british columbia": "BC", "manitoba": "MB", "new brunswick": "NB",
+    "newfoundland and labrador": "NL", "newfoundland": "NL", "nova scotia": "NS", "ontario": "ON",
+    "prince edward island": "PE", "quebec": "QC", "saskatchewan": "SK", "yukon": "YT",
+    "northwest territories": "NT", "nunavut": "NU",
+}
+
+COUNTRY_CODES = {
+    "US": "US", "USA": "US", "UNITED STATES": "US", "UNITED STATES OF AMERICA": "US",
+    "CA": "CA", "CAN": "CA", "CANADA": "CA",
+}
+
+NAME_ABBREVIATIONS = {"st": "saint", "ste": "sainte", "ft": "fort", "mt": "mount"}
+# nomes usados nas vagas que diferem do nome no GeoNames (já em name_key)
+CITY_ALIASES = {"new york": "new york city", "nyc": "new york city"}
+NON_WORD_RE = re.compile(r"[^a-z0-9]+")
+
+EARTH_RADIUS_KM = 6371.0088
+
+Coords = Tuple[float, float]
+
+
+def name_key(name: str) -> str:
+    """'St. Jérôme' -> 'saint jerome' (chave de comparação de nomes de cidade)."""
+    ascii_name = unicodedata.normalize("NFKD", name).encode("ascii", "ignore").decode("ascii")
+    words = NON_WORD_RE.sub(" ", ascii_name.lower()).split()
+    key = " ".join(NAME_ABBREVIATIONS.get(w, w) for w in words)
+    return CITY_ALIASES.get(key, key)
+
+
+@lru_cache(maxsize=1)
+def _load() -> Tuple[Dict[Tuple[str, str, str], Coords], Dict[Tuple[str, str], Coords]]:
+    """(país, estado, nome) -> coords e (país, nome) -> coords; país "" = EUA ou Canadá."""
+    by_state: Dict[Tuple[str, str, str], Coords] = {}
+    by_country: Dict[Tuple[str, str], Coords] = {}
+    with gzip.open(GAZETTEER_PATH, "rt", encoding="utf-8") as fh:
+        # linhas em ordem de população (desc): setdefault fica com a mais populosa
+        for line in fh:
+            country, state, name, lat, lon, _population = line.rstrip("\n").split("\t")
+            coords = (float(lat), float(lon))
+            key = name_key(name)
+            by_state.setdefault((country, state, key), coords)
+            by_country.setdefault((country, key), coords)
+            by_country.setdefault(("", key), coords)
+    return by_state, by_country
+
+
+def _state_abbr(state: str, country: str) -> str:
+    state = state.strip()
+    if len(state) == 2:
+        return state.upper()
+    if country == "CA":
+        return CA_PROVINCE_NAME_TO_ABBR.get(name_key(state), "")
+    return state_name_to_abbr(state)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def geocode(city: Optional[str], state: Optional[str] = "", country: Optional[str] = "") -> Optional[Coords]:
+    """
+    (lat, lon) da cidade, ou None se não estiver no gazetteer.
+    country: US/USA/United States ou CA/Canada (vazio: EUA ou Canadá).
+    state: sigla ou nome; vazio usa a cidade mais populosa com esse nome.
+    """
+    key = name_key(city or "")
+    if not key:
+        return None
+    code = COUNTRY_CODES.get((country or "").strip().upper())
+    if (country or "").strip() and code is None:
+        return None  # outro país
+    by_state, by_country = _load()
+    abbrs = [(cc, _state_abbr(state or "", cc)) for cc in ((code,) if code else ("US", "CA"))]
+    if not any(abbr for _, abbr in abbrs):
+        # sem estado (ou placeholder como "Não informado"): a mais populosa do país
+        return by_country.get((code or "", key))
+    # estado informado e a cidade não existe nele: não chuta outro estado
+    for cc, abbr in abbrs:
+        coords = by_state.get((cc, abbr, key)) if abbr else None
+        if coords:
+            return coords
+    return None
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp, dl = p2 - p1, math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
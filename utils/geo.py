@@ -1,5 +1,6 @@
 from __future__ import annotations
 import re
+from functools import lru_cache
 from typing import Tuple, Optional
 
 US_STATE_ABBR = {
@@ -19,43 +20,55 @@ US_STATE_NAMES = {
 
 COUNTRY_TOKENS_US = {"us","usa","u.s.","u.s.a","united states","united states of america","u s","u s a"}
 
+STATE_NAME_TO_ABBR = {
+    "alabama":"AL","alaska":"AK","arizona":"AZ","arkansas":"AR","california":"CA","colorado":"CO","connecticut":"CT",
+    "delaware":"DE","florida":"FL","georgia":"GA","hawaii":"HI","idaho":"ID","illinois":"IL","indiana":"IN","iowa":"IA",
+    "kansas":"KS","kentucky":"KY","louisiana":"LA","maine":"ME","maryland":"MD","massachusetts":"MA","michigan":"MI",
+    "minnesota":"MN","mississippi":"MS","missouri":"MO","montana":"MT","nebraska":"NE","nevada":"NV","new hampshire":"NH",
+    "new jersey":"NJ","new mexico":"NM","new york":"NY","north carolina":"NC","north dakota":"ND","ohio":"OH",
+    "oklahoma":"OK","oregon":"OR","pennsylvania":"PA","rhode island":"RI","south carolina":"SC","south dakota":"SD",
+    "tennessee":"TN","texas":"TX","utah":"UT","vermont":"VT","virginia":"VA","washington":"WA","west virginia":"WV",
+    "wisconsin":"WI","wyoming":"WY","district of columbia":"DC","washington dc":"DC","washington, dc":"DC"
+}
+
 SEP_RE = re.compile(r"\s*[;,/]\s+")
 
+# Uma única alternação com todos os tokens de país e nomes de estado: mesma semântica
+# de substring do antigo `tok in low` em laço, numa só passada do motor de regex.
+US_TOKEN_RE = re.compile("|".join(
+    re.escape(tok) for tok in sorted(COUNTRY_TOKENS_US | US_STATE_NAMES, key=len, reverse=True)
+))
+COUNTRY_TOKEN_RE = re.compile("|".join(re.escape(tok) for tok in sorted(COUNTRY_TOKENS_US, key=len, reverse=True)))
+ABBR_RE = re.compile(r"\b([A-Z]{2})\b")
+CITY_ABBR_RE = re.compile(r"\b([A-Za-z .'-]+)[,\s-]+([A-Z]{2})\b")
+
+# Muitas vagas repetem a mesma localização ("Orlando, FL"): parse memoizado.
+CACHE_SIZE = 4096
+
+
+@lru_cache(maxsize=CACHE_SIZE)
 def looks_like_us_piece(piece: str) -> bool:
     s = (piece or "").strip()
     if not s:
         return False
-    low = s.lower()
 
-    # menção explícita ao país
-    for tok in COUNTRY_TOKENS_US:
-        if tok in low:
-            return True
-
-    # "Remote (US)"
-    if "remote" in low and (" us" in low or "usa" in low or "united states" in low or " u.s" in low):
+    # menção explícita ao país ou nome de estado (inclui "Remote (US)")
+    if US_TOKEN_RE.search(s.lower()):
         return True
 
-    # nome de estado
-    for name in US_STATE_NAMES:
-        if name in low:
-            return True
-
     # vírgula e abreviação de estado no final
-    tokens = [t.strip() for t in s.split(",")]
-    if tokens:
-        last = tokens[-1].upper()
-        m = re.search(r"\b([A-Z]{2})\b", last)
-        if m and m.group(1) in US_STATE_ABBR:
-            return True
+    m = ABBR_RE.search(s.rsplit(",", 1)[-1].strip().upper())
+    if m and m.group(1) in US_STATE_ABBR:
+        return True
 
     # "City ST" ou "City - ST"
-    m2 = re.search(r"\b([A-Za-z .'-]+)[,\s-]+([A-Z]{2})\b", s)
+    m2 = CITY_ABBR_RE.search(s)
     if m2 and m2.group(2).upper() in US_STATE_ABBR:
         return True
 
     return False
 
+@lru_cache(maxsize=CACHE_SIZE)
 def pick_us_piece(location: str) -> str:
     loc = (location or "").strip()
     if not loc:
@@ -67,18 +80,9 @@ def pick_us_piece(location: str) -> str:
     return ""
 
 def state_name_to_abbr(name: str) -> str:
-    mapping = {
-        "alabama":"AL","alaska":"AK","arizona":"AZ","arkansas":"AR","california":"CA","colorado":"CO","connecticut":"CT",
-        "delaware":"DE","florida":"FL","georgia":"GA","hawaii":"HI","idaho":"ID","illinois":"IL","indiana":"IN","iowa":"IA",
-        "kansas":"KS","kentucky":"KY","louisiana":"LA","maine":"ME","maryland":"MD","massachusetts":"MA","michigan":"MI",
-        "minnesota":"MN","mississippi":"MS","missouri":"MO","montana":"MT","nebraska":"NE","nevada":"NV","new hampshire":"NH",
-        "new jersey":"NJ","new mexico":"NM","new york":"NY","north carolina":"NC","north dakota":"ND","ohio":"OH",
-        "oklahoma":"OK","oregon":"OR","pennsylvania":"PA","rhode island":"RI","south carolina":"SC","south dakota":"SD",
-        "tennessee":"TN","texas":"TX","utah":"UT","vermont":"VT","virginia":"VA","washington":"WA","west virginia":"WV",
-        "wisconsin":"WI","wyoming":"WY","district of columbia":"DC","washington dc":"DC","washington, dc":"DC"
-    }
-    return mapping.get(name.lower(), "")
+    return STATE_NAME_TO_ABBR.get(name.lower(), "")
 
+@lru_cache(maxsize=CACHE_SIZE)
 def extract_city_state_country(piece: str) -> Tuple[str, str, str]:
     s = (piece or "").strip()
     if not s:
@@ -89,23 +93,19 @@ def extract_city_state_country(piece: str) -> Tuple[str, str, str]:
 
     if parts:
         last = parts[-1]
-        if any(tok in last.lower() for tok in COUNTRY_TOKENS_US):
+        if COUNTRY_TOKEN_RE.search(last.lower()):
             country = "US"
             parts = parts[:-1]
 
     if parts:
         tail = parts[-1]
-        m = re.search(r"\b([A-Z]{2})\b", tail.upper())
+        m = ABBR_RE.search(tail.upper())
         if m and m.group(1) in US_STATE_ABBR:
             state = m.group(1)
             parts = parts[:-1]
-        else:
-            low_tail = tail.lower()
-            for name in US_STATE_NAMES:
-                if name == low_tail:
-                    state = state_name_to_abbr(name)
-                    parts = parts[:-1]
-                    break
+        elif tail.lower() in US_STATE_NAMES:
+            state = state_name_to_abbr(tail)
+            parts = parts[:-1]
 
     if parts:
         city = ", ".join(parts)
@@ -0,0 +1,84 @@
+# utils/ratelimit.py
+from __future__ import annotations
+
+import threading
+import time
+from typing import Optional
+
+
+class TokenBucket:
+    """
+    Token bucket thread-safe: até `capacity` tokens, repostos a `rate` tokens/segundo.
+    Em qualquer janela de T segundos passam no máximo capacity + rate * T chamadas.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = max(1.0, capacity)
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """Bloqueia até haver um token (ou até `timeout`); retorna False se esgotar o tempo."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate if self.rate > 0 else 1.0
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            time.sleep(wait)
+
+    @classmethod
+    def per_window(cls, limit: int, window_sec: float) -> "TokenBucket":
+        """Bucket que nunca passa de `limit` chamadas em qualquer janela de `window_sec`."""
+        capacity = max(1, limit // 5)
+        return cls(rate=max(limit - capacity, 1) / window_sec, capacity=capacity)
+
+
+class AdaptiveDelay:
+    """
+    Intervalo mínimo entre inícios de requisição, compartilhado entre threads, que
+    se ajusta à resposta do servidor:
+    - 429/503 (ou retries por esses status): dobra o intervalo;
+    - latência acima de `slow_sec`: aumenta 25%;
+    - resposta rápida: reduz 10%, até `min_delay`.
+    """
+
+    def __init__(self, initial: float = 0.5, min_delay: float = 0.1, max_delay: float = 10.0, slow_sec: float = 2.0):
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.slow_sec = slow_sec
+        self.delay = min(max(initial, min_delay), max_delay)
+        self._next_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self) -> None:
+        """Reserva o próximo horário livre e dorme até ele."""
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_at)
+            self._next_at = start + self.delay
+        if start > now:
+            time.sleep(start - now)
+
+    def observe(self, latency: float, throttled: bool = False) -> None:
+        with self._lock:
+            if throttled:
+                self.delay = min(self.max_delay, self.delay * 2)
+            elif latency > self.slow_sec:
+                self.delay = min(self.max_delay, self.delay * 1.25)
+            else:
+                self.delay = max(self.min_delay, self.delay * 0.9)
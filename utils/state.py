@@ -0,0 +1,50 @@
+# utils/state.py
+"""
+Estado persistente entre execuções dos pipelines: um JSON por nome em
+JOBBOT_STATE_DIR (padrão .jobbot_state/). Ex.: método que funciona em cada
+tenant Workday, uso de cota do Adzuna.
+"""
+from __future__ import annotations
+
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict
+
+STATE_DIR = Path(os.getenv("JOBBOT_STATE_DIR", ".jobbot_state"))
+
+_lock = threading.Lock()
+
+
+def _path(name: str) -> Path:
+    return STATE_DIR / f"{name}.json"
+
+
+def load_state(name: str) -> Dict[str, Any]:
+    """Lê o estado salvo (dict vazio se não existir ou estiver corrompido)."""
+    try:
+        with _path(name).open(encoding="utf-8") as fh:
+            data = json.load(fh)
+        return data if isinstance(data, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+def save_state(name: str, data: Dict[str, Any]) -> None:
+    """Grava de forma atômica (arquivo temporário + rename)."""
+    path = _path(name)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".json.tmp")
+    with tmp.open("w", encoding="utf-8") as fh:
+        json.dump(data, fh, ensure_ascii=False, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def update_state(name: str, mutate: Callable[[Dict[str, Any]], None]) -> Dict[str, Any]:
+    """Lê, aplica mutate(estado) e grava, tudo sob lock (seguro entre threads)."""
+    with _lock:
+        data = load_state(name)
+        mutate(data)
+        save_state(name, data)
+        return data